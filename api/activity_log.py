@@ -0,0 +1,240 @@
+"""Append-only activity feed, one log per user.
+
+Each user's events are NDJSON lines in size-rotated segment files named
+after the sequence number of their first event:
+
+    <directory>/<user_id>/00000000000000000001.ndjson
+
+append() only queues the event; a background writer batches whatever is
+queued into one locked write per user, so request handlers never wait on
+the disk. Reads start from the newest segment and walk backwards, and a
+cursor is found by binary search within one segment, so a page costs the
+same however many events the log holds.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from bisect import bisect_left
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
+log = logging.getLogger("foresight.activity")
+
+SEGMENT_SUFFIX = ".ndjson"
+READ_BLOCK = 64 * 1024
+
+
+class ActivityLog:
+    """Per-user append-only event log with a background writer.
+
+    Events get consecutive sequence numbers per user, starting at 1; the
+    writer takes a file lock on the user's directory while appending, so
+    several processes can share one log directory.
+    """
+
+    def __init__(self, directory, segment_size=4 * 1024 * 1024, batch_size=1000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._outstanding = 0  # events queued or being written
+        self._done = threading.Condition()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats = {"appended": 0, "written": 0, "dropped": 0, "rotations": 0}
+
+    def append(self, user_id, event):
+        """Queue event (a JSON-serializable dict) for user_id; returns immediately.
+
+        The event is stamped with "ts" now; "seq" is assigned when it is written.
+        """
+        self._ensure_worker()
+        event = dict(event, ts=datetime.now().isoformat(timespec="seconds"))
+        with self._done:
+            self._outstanding += 1
+            self._stats["appended"] += 1
+        self._queue.put((user_id, event))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is on disk; returns False on timeout."""
+        with self._done:
+            return self._done.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def read(self, user_id, limit=20, before=None):
+        """Up to limit of user_id's events, newest first, with seq < before if given.
+
+        Returns (events, cursor): pass cursor as before for the next page;
+        it is None once the oldest event has been returned.
+        """
+        segments = self._segments(user_id)
+        if before is not None:
+            # Only segments whose first event is older than the cursor can hold the page
+            segments = segments[:bisect_left(segments, before)]
+        events = []
+        for first_seq in reversed(segments):
+            path = self._segment_path(user_id, first_seq)
+            try:
+                with open(path, "rb") as f:
+                    end = os.fstat(f.fileno()).st_size
+                    if before is not None:
+                        end = _offset_of(f, end, before)
+                    for line in _reverse_lines(f, end):
+                        event = _parse(line)
+                        if event is not None:
+                            events.append(event)
+                            if len(events) == limit:
+                                return events, (event["seq"] if event["seq"] > 1 else None)
+            except FileNotFoundError:
+                continue
+        return events, None
+
+    def stats(self):
+        with self._done:
+            return dict(self._stats, outstanding=self._outstanding)
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="activity-log", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            by_user = {}
+            for user_id, event in batch:
+                by_user.setdefault(user_id, []).append(event)
+            for user_id, events in by_user.items():
+                try:
+                    self._write(user_id, events)
+                    self._count("written", len(events))
+                except Exception as e:
+                    log.error("Failed to write %d activity events for %s: %s", len(events), user_id, e)
+                    self._count("dropped", len(events))
+            with self._done:
+                self._outstanding -= len(batch)
+                self._done.notify_all()
+
+    def _write(self, user_id, events):
+        user_dir = os.path.join(self.directory, user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        with open(os.path.join(user_dir, ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            segments = self._segments(user_id)
+            first_seq = segments[-1] if segments else 1
+            path = self._segment_path(user_id, first_seq)
+            size, next_seq, torn = _tail(path, first_seq)
+            # A line cut short by a crash is terminated so the next one starts clean
+            chunk = [b"\n"] if torn else []
+            for event in events:
+                line = json.dumps(dict(event, seq=next_seq), separators=(",", ":")).encode() + b"\n"
+                if size and size + len(line) > self.segment_size:
+                    _append(path, chunk)
+                    path, size, chunk = self._segment_path(user_id, next_seq), 0, []
+                    self._count("rotations")
+                chunk.append(line)
+                size += len(line)
+                next_seq += 1
+            _append(path, chunk)
+
+    def _segments(self, user_id):
+        """First sequence numbers of user_id's segments, oldest first."""
+        try:
+            names = os.listdir(os.path.join(self.directory, user_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in names if name.endswith(SEGMENT_SUFFIX))
+
+    def _segment_path(self, user_id, first_seq):
+        return os.path.join(self.directory, user_id, f"{first_seq:020d}{SEGMENT_SUFFIX}")
+
+    def _count(self, name, amount=1):
+        with self._done:
+            self._stats[name] += amount
+
+
+def _append(path, lines):
+    if lines:
+        with open(path, "ab") as f:
+            f.write(b"".join(lines))
+
+
+def _tail(path, first_seq):
+    """(size, next seq, ends mid-line) for the segment at path."""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            torn = False
+            if size:
+                f.seek(size - 1)
+                torn = f.read(1) != b"\n"
+            for line in _reverse_lines(f, size):
+                event = _parse(line)
+                if event is not None:
+                    return size, event["seq"] + 1, torn
+            return size, first_seq, torn
+    except FileNotFoundError:
+        return 0, first_seq, False
+
+
+def _parse(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None  # a torn or partially written line
+
+
+def _reverse_lines(f, end):
+    """Lines of f before byte end, last first (the last may be cut short by a writer)."""
+    position = end
+    pending = b""
+    while position > 0:
+        start = max(0, position - READ_BLOCK)
+        f.seek(start)
+        pending = f.read(position - start) + pending
+        position = start
+        lines = pending.split(b"\n")
+        # lines[0] may continue in the block before; the last piece has no newline yet
+        pending = lines[0]
+        for line in reversed(lines[1:]):
+            if line:
+                yield line
+    if pending:
+        yield pending
+
+
+def _offset_of(f, size, seq):
+    """Byte offset of the first line in f whose event has seq >= seq (size if none)."""
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line_start = _line_start_at_or_after(f, mid)
+        event = None
+        f.seek(line_start)
+        while event is None and f.tell() < size:
+            event = _parse(f.readline())
+        if event is None or event["seq"] >= seq:
+            hi = mid
+        else:
+            lo = mid + 1
+    return _line_start_at_or_after(f, lo)
+
+
+def _line_start_at_or_after(f, offset):
+    if offset == 0:
+        return 0
+    f.seek(offset - 1)
+    f.readline()
+    return f.tell()
@@ -0,0 +1,132 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+# Alert types whose trigger condition is a single threshold comparison
+PRICE_TYPES = ("price-above", "price-below")
+PERCENTAGE_TYPES = ("percentage-gain", "percentage-loss", "percentage-change")
+INDEXED_TYPES = PRICE_TYPES + PERCENTAGE_TYPES
+
+
+def index_entry(alert):
+    """Return (symbol, alertType, threshold) for an indexable active alert, else None."""
+    alert_type = alert.get("alertType")
+    if alert.get("status") != "active" or alert_type not in INDEXED_TYPES:
+        return None
+    field = "threshold" if alert_type in PRICE_TYPES else "percentage"
+    try:
+        return alert["symbol"], alert_type, float(alert[field])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class AlertIndex:
+    """Per-symbol sorted threshold arrays for price and percentage alerts.
+
+    Each (symbol, alertType) pair keeps a list of (threshold, alert_id) sorted
+    by threshold, so the alerts crossed by a new price or change percent form
+    a prefix or suffix found with one binary search.
+    """
+
+    def __init__(self):
+        self._books = {}  # symbol -> {alertType: [(threshold, alert_id), ...]}
+        self._entries = {}  # alert_id -> (symbol, alertType, threshold)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, alert_id):
+        return alert_id in self._entries
+
+    def rebuild(self, alerts):
+        """Replace the index contents with the given alerts."""
+        with self._lock:
+            self._books.clear()
+            self._entries.clear()
+            for alert in alerts:
+                self._add_locked(alert["id"], index_entry(alert))
+
+    def upsert(self, alert):
+        """Index alert, replacing any previous entry; non-indexable alerts are dropped."""
+        entry = index_entry(alert)
+        with self._lock:
+            if self._entries.get(alert["id"]) == entry:
+                return
+            self._remove_locked(alert["id"])
+            self._add_locked(alert["id"], entry)
+
+    def remove(self, alert_id):
+        with self._lock:
+            self._remove_locked(alert_id)
+
+    def sync(self, active_alerts):
+        """Bring the index in line with the store's active alerts.
+
+        Cheap when nothing changed; picks up writes made by other processes.
+        """
+        seen = set()
+        for alert in active_alerts:
+            seen.add(alert["id"])
+            self.upsert(alert)
+        with self._lock:
+            for alert_id in [alert_id for alert_id in self._entries if alert_id not in seen]:
+                self._remove_locked(alert_id)
+
+    def match(self, symbol, price, change_percent):
+        """Return the ids of every indexed alert on symbol crossed by price/change."""
+        with self._lock:
+            book = self._books.get(symbol)
+            if not book:
+                return []
+            crossed = []
+            # price >= threshold
+            crossed += _prefix(book.get("price-above"), price)
+            # price <= threshold
+            crossed += _suffix(book.get("price-below"), price)
+            # change >= percentage
+            crossed += _prefix(book.get("percentage-gain"), change_percent)
+            # change <= -percentage
+            crossed += _prefix(book.get("percentage-loss"), -change_percent)
+            # |change| >= percentage
+            crossed += _prefix(book.get("percentage-change"), abs(change_percent))
+            return crossed
+
+    def _add_locked(self, alert_id, entry):
+        if entry is None:
+            return
+        symbol, alert_type, threshold = entry
+        insort(self._books.setdefault(symbol, {}).setdefault(alert_type, []), (threshold, alert_id))
+        self._entries[alert_id] = entry
+
+    def _remove_locked(self, alert_id):
+        entry = self._entries.pop(alert_id, None)
+        if entry is None:
+            return
+        symbol, alert_type, threshold = entry
+        book = self._books[symbol]
+        thresholds = book[alert_type]
+        del thresholds[bisect_left(thresholds, (threshold, alert_id))]
+        if not thresholds:
+            del book[alert_type]
+            if not book:
+                del self._books[symbol]
+
+
+def _prefix(thresholds, value):
+    """Ids whose threshold is <= value."""
+    if not thresholds:
+        return []
+    end = bisect_right(thresholds, (value, _MAX_ID))
+    return [alert_id for _, alert_id in thresholds[:end]]
+
+
+def _suffix(thresholds, value):
+    """Ids whose threshold is >= value."""
+    if not thresholds:
+        return []
+    start = bisect_left(thresholds, (value, ""))
+    return [alert_id for _, alert_id in thresholds[start:]]
+
+
+# Sorts after every real alert id, so (value, _MAX_ID) bounds all ties at value
+_MAX_ID = "\U0010ffff"
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dtime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo("America/New_York")
+except Exception:  # pragma: no cover - missing tzdata
+    MARKET_TZ = None
+
+log = logging.getLogger("foresight.scheduler")
+
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+
+
+def is_market_open(now=None):
+    """True during regular NYSE/Nasdaq hours (Mon-Fri 9:30-16:00 New York time).
+
+    Exchange holidays are not taken into account.
+    """
+    now = now or datetime.now(MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+class AlertScheduler:
+    """Runs alert evaluation cycles in the background at a fixed interval.
+
+    A ticker thread hands each cycle to a single-worker pool, so request
+    threads are never blocked. If the previous cycle is still running when the
+    next one is due, the new one is skipped rather than queued. When a lock
+    file is configured, only the process holding it runs cycles, which keeps
+    multiple gunicorn workers from evaluating the same alerts; the others keep
+    trying to take the lock over in case the leader exits.
+    """
+
+    def __init__(self, run_cycle, interval=60, market_hours_only=True, lock_file=None):
+        self.run_cycle = run_cycle
+        self.interval = interval
+        self.market_hours_only = market_hours_only
+        self.lock_file = lock_file
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-cycle")
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_handle = None
+        self._busy = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._state = {
+            "running": False,
+            "leader": False,
+            "cycles": 0,
+            "skippedOverlaps": 0,
+            "skippedNotLeader": 0,
+            "skippedMarketClosed": 0,
+            "failures": 0,
+            "lastRunAt": None,
+            "lastRunDurationMs": None,
+            "lastLagMs": None,
+            "lastAlerts": None,
+            "lastThroughputPerSec": None,
+            "lastError": None,
+            "nextRunAt": None,
+        }
+
+    def start(self):
+        """Start the ticker thread."""
+        if self._thread is not None:
+            return
+        self._update(running=True)
+        self._thread = threading.Thread(target=self._tick, name="alert-scheduler", daemon=True)
+        self._thread.start()
+        log.info("⏰ Alert scheduler started (every %ss, market hours only: %s)", self.interval, self.market_hours_only)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=True)
+        self._update(running=False)
+
+    def status(self):
+        with self._state_lock:
+            status = dict(self._state)
+        status.update({
+            "intervalSeconds": self.interval,
+            "marketHoursOnly": self.market_hours_only,
+            "marketOpen": is_market_open(),
+            "cycleInProgress": self._busy.locked(),
+        })
+        return status
+
+    def _tick(self):
+        due = time.monotonic()
+        while not self._stop.is_set():
+            delay = max(0.0, due - time.monotonic())
+            self._update(nextRunAt=(datetime.now() + timedelta(seconds=delay)).isoformat())
+            if self._stop.wait(delay):
+                break
+            lag = time.monotonic() - due
+            due += self.interval
+            if due < time.monotonic():
+                # We fell behind by more than one interval; realign instead of bursting
+                due = time.monotonic() + self.interval
+
+            if not self._acquire_leadership():
+                self._bump("skippedNotLeader")
+                continue
+            if self.market_hours_only and not is_market_open():
+                self._bump("skippedMarketClosed")
+                continue
+            if not self._busy.acquire(blocking=False):
+                self._bump("skippedOverlaps")
+                continue
+            self._executor.submit(self._run, lag)
+
+    def _run(self, lag):
+        started = time.perf_counter()
+        try:
+            result = self.run_cycle()
+        except Exception as e:
+            log.error("❌ Alert cycle failed: %s", e)
+            self._bump("failures")
+            self._update(lastError=str(e))
+            result = {}
+        finally:
+            self._busy.release()
+        duration = time.perf_counter() - started
+        alerts = result.get("stats", {}).get("alerts")
+        with self._state_lock:
+            self._state["cycles"] += 1
+            self._state.update({
+                "lastRunAt": datetime.now().isoformat(),
+                "lastRunDurationMs": round(duration * 1000, 2),
+                "lastLagMs": round(lag * 1000, 2),
+                "lastAlerts": alerts,
+                "lastThroughputPerSec": round(alerts / duration, 2) if alerts and duration > 0 else None,
+            })
+
+    def _acquire_leadership(self):
+        if self._lock_handle is not None or not self.lock_file or fcntl is None:
+            self._update(leader=True)
+            return True
+        handle = open(self.lock_file, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_handle = handle
+        self._update(leader=True)
+        log.info("⏰ Alert scheduler took the scheduler lock; this process now runs alert cycles")
+        return True
+
+    def _update(self, **fields):
+        with self._state_lock:
+            self._state.update(fields)
+
+    def _bump(self, counter):
+        with self._state_lock:
+            self._state[counter] += 1
+
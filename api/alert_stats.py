@@ -0,0 +1,146 @@
+import heapq
+import threading
+from collections import Counter
+
+
+class _UserStats:
+    def __init__(self, version):
+        self.version = version
+        self.statuses = Counter()
+        self.days = Counter()  # "YYYY-MM-DD" -> alerts last triggered that day
+        self.triggered = 0  # alerts with a lastTriggered
+        self.recent = []  # min-heap of (lastTriggered, alert_id)
+        self.recent_alerts = {}  # alert_id -> summary of a heap entry
+        self.entries = {}  # alert_id -> (status, lastTriggered)
+
+
+class AlertStats:
+    """Dashboard aggregates per user, maintained as alerts are written.
+
+    For each user this keeps a count of alerts per status, the number of
+    alerts last triggered on each day, and a min-heap of the recent_size
+    most recent triggers, so a summary costs the same however many alerts
+    the user has. A user's stats are built from the store the first time
+    they are needed and are tagged with the store's alerts version; they
+    are rebuilt if the store has moved past them (a write from another
+    process).
+    """
+
+    def __init__(self, recent_size=50):
+        self.recent_size = recent_size
+        self._users = {}  # user_id -> _UserStats
+        self._writes = Counter()  # user_id -> upserts and removes seen, tracked or not
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def upsert(self, user_id, alert):
+        """Count alert (new or changed) for user_id, if that user is being tracked."""
+        with self._lock:
+            self._writes[user_id] += 1
+            user = self._users.get(user_id)
+            if user is not None:
+                self._discard(user, alert["id"])
+                self._add(user, alert)
+
+    def remove(self, user_id, alert_id):
+        with self._lock:
+            self._writes[user_id] += 1
+            user = self._users.get(user_id)
+            if user is not None:
+                self._discard(user, alert_id)
+
+    def advance(self, user_id, previous, version):
+        """Record a write that moved the store from previous to version.
+
+        Call it after the write's alerts were passed to upsert/remove. The
+        stats only follow if they were at previous; otherwise another write
+        (from another process, or racing in this one) came in between and
+        the next summary rebuilds them.
+        """
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None and user.version == previous:
+                user.version = version
+
+    def summary(self, user_id, version, day, load, recent=5):
+        """Return (count per status, alerts triggered on day, newest triggers).
+
+        load() must list all of the user's alerts at version; it is only
+        called to rebuild: when the user isn't tracked yet, the store has
+        moved past the stats, or deletions left too few triggers in the heap.
+        """
+        with self._lock:
+            user = self._users.get(user_id)
+            if (user is not None and user.version == version
+                    and len(user.recent) >= min(recent, user.triggered)):
+                return self._summarize(user, day, recent)
+            writes = self._writes[user_id]
+        user = _UserStats(version)
+        for alert in load():
+            self._add(user, alert)
+        with self._lock:
+            if self._writes[user_id] != writes:
+                # A local write landed during load() and may be missing from it; its
+                # advance() must not vouch for these stats, so rebuild next time
+                user.version = None
+            self._users[user_id] = user
+            self.rebuilds += 1
+            return self._summarize(user, day, recent)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "alerts": sum(len(user.entries) for user in self._users.values()),
+                "rebuilds": self.rebuilds,
+            }
+
+    def _summarize(self, user, day, recent):
+        newest = heapq.nlargest(recent, user.recent)
+        return dict(user.statuses), user.days[day], [user.recent_alerts[alert_id] for _, alert_id in newest]
+
+    def _add(self, user, alert):
+        status = alert.get("status")
+        last_triggered = alert.get("lastTriggered")
+        user.entries[alert["id"]] = (status, last_triggered)
+        user.statuses[status] += 1
+        if not last_triggered:
+            return
+        user.days[last_triggered[:10]] += 1
+        # The heap always holds the newest len(heap) triggers. While it holds
+        # every trigger anything may join; after that only newer ones can.
+        complete = len(user.recent) == user.triggered
+        user.triggered += 1
+        entry = (last_triggered, alert["id"])
+        if not complete and (not user.recent or entry < user.recent[0]):
+            return
+        heapq.heappush(user.recent, entry)
+        user.recent_alerts[alert["id"]] = {
+            "id": alert["id"],
+            "symbol": alert.get("symbol"),
+            "lastTriggered": last_triggered,
+            "triggeredPrice": alert.get("triggeredPrice"),
+        }
+        if len(user.recent) > self.recent_size:
+            _, evicted = heapq.heappop(user.recent)
+            del user.recent_alerts[evicted]
+
+    def _discard(self, user, alert_id):
+        entry = user.entries.pop(alert_id, None)
+        if entry is None:
+            return
+        status, last_triggered = entry
+        _decrement(user.statuses, status)
+        if not last_triggered:
+            return
+        _decrement(user.days, last_triggered[:10])
+        user.triggered -= 1
+        if user.recent_alerts.pop(alert_id, None) is not None:
+            user.recent.remove((last_triggered, alert_id))
+            heapq.heapify(user.recent)
+
+
+def _decrement(counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
@@ -0,0 +1,269 @@
+"""Async (ASGI) serving mode for the Foresight API.
+
+The upstream-heavy read routes (/api/stocks, /api/stock/<symbol> and the
+portfolio dashboards) are served by a Quart app that awaits Finnhub through
+httpx, so a single process can hold hundreds of requests open while quotes
+are in flight. It also serves /api/stream/stocks, so a client that hangs up
+ends its stream (a WSGI generator never learns of the disconnect). Every other route falls through to the Flask app in
+index.py, mounted with a2wsgi on a pool of ASGI_WSGI_WORKERS threads. Both
+apps share one set of caches, storage and rate limiters, and return the
+same JSON.
+
+Run with:  uvicorn asgi:app --app-dir api --port 5000
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from quart import Quart, Response, g, jsonify, request
+
+import index
+from auth import AuthError
+from http_cache import COMPRESS_MIN_SIZE, choose_encoding, compress, is_not_modified, make_etag
+from index import (
+    DEFAULT_SYMBOLS,
+    FETCH_DEADLINE,
+    FINNHUB_API_KEY,
+    PRICE_STREAM_HEARTBEAT,
+    PROFILE_CACHE_TTL,
+    QUOTE_CACHE_TTL,
+    UpstreamError,
+    build_stock_record,
+    build_stock_records,
+    collect_stock_data,
+    market_leaders_overview,
+    portfolio_overview,
+    portfolio_quotes,
+    price_hub,
+    quote_cache,
+    request_identity,
+    requires_user,
+    route_label,
+    valuation_cache,
+)
+from metrics import record_request
+from portfolio_engine import PortfolioBook
+from rate_limiter import INTERACTIVE
+from upstream import AsyncUpstreamClient, finnhub
+
+log = logging.getLogger("foresight.asgi")
+
+# Threads serving the Flask routes; each open /api/stream/stocks connection holds one
+ASGI_WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", "32"))
+
+async_finnhub = AsyncUpstreamClient(finnhub)
+
+async_app = Quart(__name__, static_folder=None)
+
+
+@async_app.before_request
+async def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@async_app.before_request
+async def identify_user():
+    try:
+        identity = request_identity(request)
+    except AuthError as e:
+        return jsonify({"error": str(e)}), 401
+    if identity is None:
+        return jsonify({"error": "Invalid user or portfolio id"}), 400
+    g.user_id, g.portfolio_id = identity
+    if g.user_id is None and requires_user(request):
+        return jsonify({"error": "Authentication required"}), 401
+
+
+@async_app.after_request
+async def allow_cors(response):
+    # Same default as flask_cors on the Flask app: any origin may read
+    response.headers.setdefault("Access-Control-Allow-Origin", "*")
+    return response
+
+
+@async_app.after_request
+async def record_timing(response):
+    started = g.get("request_started")
+    if started is not None:
+        record_request(request.method, route_label(request), response.status_code, time.perf_counter() - started)
+    return response
+
+
+@async_app.after_request
+async def compress_response(response):
+    encoding = choose_encoding(request, response)
+    if encoding is None:
+        return response
+    response.vary.add("Accept-Encoding")
+    data = await response.get_data()
+    if len(data) >= COMPRESS_MIN_SIZE:
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+@async_app.after_serving
+async def close_clients():
+    await async_finnhub.aclose()
+
+
+async def fetch_quote(symbol, priority=INTERACTIVE, expires=None):
+    """Fetches the current quote for symbol from Finnhub."""
+    response = await async_finnhub.get("/quote", params={"symbol": symbol, "token": FINNHUB_API_KEY}, priority=priority, expires=expires)
+    if response.status_code == 429:
+        raise UpstreamError("Finnhub rate limit exceeded, try again shortly")
+    response.raise_for_status()
+    quote_data = response.json()
+    if "error" in quote_data:
+        raise UpstreamError(quote_data["error"])
+    return quote_data
+
+
+async def fetch_profile(symbol, priority=INTERACTIVE, expires=None):
+    """Fetches the company profile for symbol from Finnhub."""
+    response = await async_finnhub.get("/stock/profile2", params={"symbol": symbol, "token": FINNHUB_API_KEY}, priority=priority, expires=expires)
+    response.raise_for_status()
+    return response.json()
+
+
+async def load_quote(symbol, priority=INTERACTIVE, expires=None):
+    return await quote_cache.get_or_load_async(("quote", symbol), lambda: fetch_quote(symbol, priority, expires), ttl=QUOTE_CACHE_TTL)
+
+
+async def load_profile(symbol, priority=INTERACTIVE, expires=None):
+    return await quote_cache.get_or_load_async(("profile", symbol), lambda: fetch_profile(symbol, priority, expires), ttl=PROFILE_CACHE_TTL)
+
+
+async def get_stock_data_many(symbols, deadline=None, priority=INTERACTIVE):
+    """Async index.get_stock_data_many: every quote and profile is awaited concurrently."""
+    symbols = list(dict.fromkeys(symbols))
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+
+    if index.USE_MOCK_DATA:
+        return {symbol: {"mock": True} for symbol in symbols}
+    if not FINNHUB_API_KEY:
+        return {symbol: {"error": "Finnhub API key not configured"} for symbol in symbols}
+
+    # Fetches still waiting for a rate-limit token at the deadline are withdrawn
+    expires = time.monotonic() + deadline
+    quote_tasks = {symbol: asyncio.ensure_future(load_quote(symbol, priority, expires)) for symbol in symbols}
+    profile_tasks = {symbol: asyncio.ensure_future(load_profile(symbol, priority, expires)) for symbol in symbols}
+    tasks = list(quote_tasks.values()) + list(profile_tasks.values())
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        # Late results still land in the quote cache; just don't leak their errors
+        task.add_done_callback(_discard_result)
+
+    return collect_stock_data(symbols, quote_tasks, profile_tasks, deadline)
+
+
+async def get_portfolio_valuation(user_id, portfolio_id):
+    async def value_portfolio():
+        portfolio = await asyncio.to_thread(index.load_portfolio, user_id, portfolio_id)
+        book = PortfolioBook(portfolio["holdings"])
+        return book.value(portfolio_quotes(book.symbols, await get_stock_data_many(book.symbols)))
+    return await valuation_cache.get_or_load_async((user_id, portfolio_id), value_portfolio)
+
+
+@async_app.route('/api/stocks', methods=['GET'])
+async def get_stocks():
+    """Get stock data for multiple symbols."""
+    symbols = request.args.get('symbols', DEFAULT_SYMBOLS).split(',')
+    symbols = [symbol.strip().upper() for symbol in symbols]
+    return jsonify(build_stock_records(symbols, await get_stock_data_many(symbols)))
+
+
+@async_app.route('/api/stock/<symbol>', methods=['GET'])
+async def get_stock(symbol):
+    """Get data for a single stock symbol."""
+    symbol = symbol.upper()
+    if index.STOCK_MAX_STALENESS > 0:
+        # Stale-while-revalidate answers from memory; only a cold symbol waits on a thread
+        return jsonify(await asyncio.to_thread(index.stock_record, symbol))
+    all_stock_data = await get_stock_data_many([symbol])
+    return jsonify(build_stock_record(symbol, all_stock_data[symbol]))
+
+
+@async_app.route('/api/stream/stocks', methods=['GET'])
+async def stream_stocks():
+    """Stream stock records for the requested symbols as server-sent events."""
+    symbols = request.args.get('symbols', DEFAULT_SYMBOLS).split(',')
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols))
+    # Subscribing may fetch snapshots for symbols nobody is watching yet
+    subscription = await asyncio.to_thread(price_hub.subscribe, symbols)
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    subscription.on_push = lambda: loop.call_soon_threadsafe(ready.set)
+
+    async def events():
+        # Quart cancels this generator when the client disconnects
+        try:
+            while True:
+                ready.clear()
+                records = subscription.next(timeout=0)
+                if not records:
+                    try:
+                        await asyncio.wait_for(ready.wait(), PRICE_STREAM_HEARTBEAT)
+                    except asyncio.TimeoutError:
+                        yield b": keep-alive\n\n"
+                    continue
+                for record in records:
+                    yield f"event: stock\ndata: {json.dumps(record)}\n\n".encode()
+        finally:
+            price_hub.unsubscribe(subscription)
+
+    response = Response(events(), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.timeout = None  # RESPONSE_TIMEOUT would cut the stream off
+    return response
+
+
+@async_app.route('/api/dashboard/portfolio', methods=['GET'])
+async def get_portfolio_data():
+    """Get portfolio overview data."""
+    try:
+        return await json_with_etag(portfolio_overview(await get_portfolio_valuation(g.user_id, g.portfolio_id)))
+    except Exception as e:
+        log.error("❌ Error getting portfolio data: %s", e)
+        return jsonify(portfolio_overview(None))
+
+
+@async_app.route('/api/dashboard/market-leaders', methods=['GET'])
+async def get_market_leaders():
+    """Get top gainers and losers from user's portfolio."""
+    try:
+        return await json_with_etag(market_leaders_overview(await get_portfolio_valuation(g.user_id, g.portfolio_id)))
+    except Exception as e:
+        log.error("❌ Error getting market leaders: %s", e)
+        return jsonify(market_leaders_overview(None))
+
+
+async def json_with_etag(data):
+    """index.json_with_etag for a built body: hash it and answer a matching If-None-Match with 304."""
+    response = jsonify(data)
+    etag = make_etag(await response.get_data())
+    if is_not_modified(request, etag):
+        response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _discard_result(task):
+    if not task.cancelled():
+        task.exception()
+
+
+flask_app = WSGIMiddleware(index.app, workers=ASGI_WSGI_WORKERS)
+_async_routes = async_app.url_map.bind("localhost")
+
+
+async def app(scope, receive, send):
+    """Route to the async app when it has a matching route, otherwise to Flask."""
+    if scope["type"] == "http" and not _async_routes.test(scope["path"], scope["method"]):
+        await flask_app(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
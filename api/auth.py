@@ -0,0 +1,62 @@
+"""Supabase access-token verification.
+
+The frontend signs in with Supabase Auth and sends the session's access
+token as "Authorization: Bearer <jwt>". Tokens are HS256 JWTs signed with
+the project's JWT secret; the user id is the "sub" claim.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+
+class AuthError(Exception):
+    """Raised when a bearer token is missing, malformed, expired or not ours."""
+
+
+def bearer_token(req):
+    """The token from an "Authorization: Bearer ..." header, or None."""
+    scheme, _, token = req.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def verify_token(token, secret, audience="authenticated", leeway=30):
+    """Check token's HS256 signature, expiry and audience; returns its claims."""
+    try:
+        header_part, payload_part, signature_part = token.split(".")
+        header = json.loads(_b64decode(header_part))
+        claims = json.loads(_b64decode(payload_part))
+        signature = _b64decode(signature_part)
+    except ValueError:
+        raise AuthError("Malformed access token") from None
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise AuthError("Malformed access token")
+    if header.get("alg") != "HS256":
+        raise AuthError("Unsupported token algorithm")
+
+    expected = hmac.new(secret.encode(), f"{header_part}.{payload_part}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise AuthError("Invalid token signature")
+
+    now = time.time()
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)) or exp + leeway < now:
+        raise AuthError("Access token expired")
+    nbf = claims.get("nbf")
+    if isinstance(nbf, (int, float)) and nbf - leeway > now:
+        raise AuthError("Access token not yet valid")
+    if audience is not None:
+        aud = claims.get("aud")
+        if audience != aud and not (isinstance(aud, list) and audience in aud):
+            raise AuthError("Access token has the wrong audience")
+    if not isinstance(claims.get("sub"), str) or not claims["sub"]:
+        raise AuthError("Access token has no subject")
+    return claims
+
+
+def _b64decode(part):
+    # JWTs drop base64 padding; binascii.Error is a ValueError
+    return base64.urlsafe_b64decode(part + "=" * (-len(part) % 4))
@@ -0,0 +1,65 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency until it has had time to recover.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    allow() refuses calls for ``reset_timeout`` seconds. Then a single trial
+    call is let through (half-open): success closes the circuit, failure
+    opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go ahead; the caller must then record its outcome."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN  # this caller is the trial
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.opened,
+                "rejected": self.rejected,
+            }
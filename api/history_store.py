@@ -0,0 +1,180 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from timeseries import TimeSeries
+from upstream import alphavantage
+
+log = logging.getLogger("foresight.history")
+
+# Alpha Vantage's compact output covers this many of the latest trading days
+COMPACT_BARS = 100
+
+# Symbols become file names, so only allow ticker characters
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-]{1,15}$")
+
+# One row per trading day, stored oldest first
+BAR_DTYPE = np.dtype([
+    ("date", "datetime64[D]"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "i8"),
+])
+
+
+def parse_alpha_vantage_daily(series):
+    """Convert an Alpha Vantage "Time Series (Daily)" mapping into sorted bars.
+
+    The payload is keyed by ISO date in no guaranteed order, so the bars are
+    sorted by date here rather than trusting dict order.
+    """
+    bars = np.empty(len(series), dtype=BAR_DTYPE)
+    for i, (day, values) in enumerate(series.items()):
+        bars[i] = (
+            np.datetime64(day, "D"),
+            float(values["1. open"]),
+            float(values["2. high"]),
+            float(values["3. low"]),
+            float(values["4. close"]),
+            int(float(values["5. volume"])),
+        )
+    return bars[np.argsort(bars["date"], kind="stable")]
+
+
+def fetch_alpha_vantage_daily(symbol, apikey, full=False, expires=None):
+    """Fetch daily bars for symbol from Alpha Vantage.
+
+    The compact output only covers the last 100 trading days, which is all an
+    incremental update needs; full=True fetches the whole history. With
+    expires (a time.monotonic() value), raises DeadlineExceeded rather than
+    wait past it for a rate-limit slot.
+    """
+    response = alphavantage.get("/query", params={
+        "function": "TIME_SERIES_DAILY",
+        "symbol": symbol,
+        "outputsize": "full" if full else "compact",
+        "apikey": apikey,
+    }, expires=expires)
+    response.raise_for_status()
+    data = response.json()
+    if "Time Series (Daily)" not in data:
+        # Errors and rate-limit notices come back as 200s with a message instead
+        message = data.get("Error Message") or data.get("Note") or data.get("Information") or data
+        raise ValueError(f"Alpha Vantage returned no daily series for {symbol}: {message}")
+    return parse_alpha_vantage_daily(data["Time Series (Daily)"])
+
+
+class HistoryStore:
+    """Daily OHLCV bars kept on disk as one .npy file per symbol.
+
+    Reads memory-map the file, so range queries only touch the pages they
+    slice and never hit the network. Writes append the bars newer than the
+    last stored date and atomically replace the file, so readers in other
+    processes (the CLI and the API share the directory) always see a
+    complete series.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def bars(self, symbol, start=None, end=None):
+        """Bars for symbol with start <= date <= end (either bound optional)."""
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        bars = np.load(path, mmap_mode="r")
+        lo = 0 if start is None else np.searchsorted(bars["date"], np.datetime64(start, "D"), side="left")
+        hi = len(bars) if end is None else np.searchsorted(bars["date"], np.datetime64(end, "D"), side="right")
+        return bars[lo:hi]
+
+    def series(self, symbol, start=None, end=None):
+        """Closing prices for symbol as a TimeSeries."""
+        return TimeSeries.from_bars(self.bars(symbol, start, end))
+
+    def last_date(self, symbol):
+        bars = self.bars(symbol)
+        return bars["date"][-1] if len(bars) else None
+
+    def symbols(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".npy")] for name in os.listdir(self.directory) if name.endswith(".npy"))
+
+    def age(self, symbol):
+        """Seconds since symbol was last ingested or checked, or None if never."""
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return None
+        return time.time() - os.path.getmtime(path)
+
+    def ingest(self, symbol, bars):
+        """Append the bars newer than the last stored date; returns how many were added."""
+        with self._lock_for(symbol):
+            existing = self.bars(symbol)
+            if len(existing):
+                bars = bars[bars["date"] > existing["date"][-1]]
+            if not len(bars):
+                self._touch(symbol)
+                return 0
+            merged = np.concatenate([np.asarray(existing), bars.astype(BAR_DTYPE)])
+            self._write(symbol, merged)
+            return len(bars)
+
+    def refresh(self, symbol, fetch, max_age):
+        """Bring symbol up to date unless it was refreshed in the last max_age seconds.
+
+        fetch(full) returns sorted bars. The full history is requested when
+        the symbol is new or its stored bars end further back than the compact
+        output reaches, and again if a compact fetch turns out not to overlap
+        the stored bars, so no trading days are skipped. Returns the number
+        of new bars.
+        """
+        age = self.age(symbol)
+        if age is not None and age < max_age:
+            return 0
+        last = self.last_date(symbol)
+        # Weekdays overcount trading days (holidays), so this errs towards full
+        full = last is None or bool(np.busday_count(last + 1, np.datetime64("today", "D") + 1) >= COMPACT_BARS)
+        bars = fetch(full=full)
+        if not full and len(bars) and bars["date"][0] > last:
+            bars = fetch(full=True)
+        added = self.ingest(symbol, bars)
+        log.info("📚 History for %s: %d new bars (last %s)", symbol, added, self.last_date(symbol))
+        return added
+
+    def _path(self, symbol):
+        symbol = symbol.upper()
+        if not SYMBOL_PATTERN.match(symbol) or symbol.startswith("."):
+            raise ValueError(f"Invalid symbol: {symbol}")
+        return os.path.join(self.directory, f"{symbol}.npy")
+
+    def _lock_for(self, symbol):
+        with self._locks_lock:
+            return self._locks.setdefault(symbol.upper(), threading.Lock())
+
+    def _touch(self, symbol):
+        path = self._path(symbol)
+        if os.path.exists(path):
+            os.utime(path)
+
+    def _write(self, symbol, bars):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(symbol)
+        # A temp file of our own, so concurrent writers never share one
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, bars)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,43 @@
+"""ETag and response-compression helpers shared by the Flask and ASGI apps."""
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli  # optional: gzip is used when it isn't installed
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Server preference when the client accepts several
+ENCODINGS = (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def make_etag(*parts):
+    """Opaque ETag value for a response derived from parts (None if any part is unknown)."""
+    if any(part is None for part in parts):
+        return None
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def is_not_modified(req, etag):
+    """True if the request's If-None-Match already names etag."""
+    return etag is not None and req.if_none_match.contains_weak(etag)
+
+
+def choose_encoding(req, response):
+    """Content-Encoding to apply to a finished JSON response, or None."""
+    if (response.status_code != 200 or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers):
+        return None
+    return req.accept_encodings.best_match(ENCODINGS)
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
@@ -1,80 +1,353 @@
+import base64
 import os
 import requests
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
+import json
+import logging
+import math
 import random
+import threading
+import time
 from datetime import datetime, timedelta
-import json
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 
 load_dotenv()
 
+from ttl_cache import StaleWhileRevalidate, TTLCache
+from activity_log import ActivityLog
+from alert_index import AlertIndex
+from alert_stats import AlertStats
+from alert_scheduler import MARKET_TZ, AlertScheduler
+from auth import AuthError, bearer_token, verify_token
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from history_store import HistoryStore, fetch_alpha_vantage_daily
+from http_cache import COMPRESS_MIN_SIZE, choose_encoding, compress, is_not_modified, make_etag
+from indicators import INDICATOR_FIELDS, INDICATOR_TYPES, IndicatorBook, validate_indicator_alert
+from metrics import Instrumented, record_request, render, storage_operation_duration
+from portfolio_engine import PortfolioBook
+from price_stream import FinnhubTradeFeed, MockTradeFeed, PriceHub
+from rate_limiter import BACKGROUND, INTERACTIVE, DeadlineExceeded
+from storage import ALERT_SORTS, DEFAULT_PORTFOLIO_ID, DEFAULT_USER_ID, alert_owner, is_valid_id, make_store
+from timeseries import TimeSeries, percent_change
+from upstream import REQUEST_ERRORS, finnhub, upstream_stats
+
 app = Flask(__name__)
 CORS(app)
 
+# Per-request detail (upstream payloads, computed metrics) is logged at DEBUG
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger("foresight")
+
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
+ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 USE_MOCK_DATA = os.getenv("USE_MOCK_DATA", "false").lower() == "true"
 
-# Alert storage (in production, use a proper database)
+# Symbols shown when /api/stocks or the price stream is called without ?symbols=
+DEFAULT_SYMBOLS = 'AAPL,GOOGL,TSLA,MSFT,NVDA,AMZN,META,NFLX'
+
+# Upstream quote cache: quotes go stale in seconds, company profiles in hours
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "15"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", str(6 * 60 * 60)))
+QUOTE_CACHE_SIZE = int(os.getenv("QUOTE_CACHE_SIZE", "2048"))
+
+quote_cache = TTLCache(maxsize=QUOTE_CACHE_SIZE, default_ttl=QUOTE_CACHE_TTL)
+
+# Dashboard endpoints share one valuation per (user, portfolio) for this many seconds
+PORTFOLIO_VALUATION_TTL = float(os.getenv("PORTFOLIO_VALUATION_TTL", "5"))
+PORTFOLIO_VALUATION_CACHE_SIZE = int(os.getenv("PORTFOLIO_VALUATION_CACHE_SIZE", "1024"))
+
+valuation_cache = TTLCache(maxsize=PORTFOLIO_VALUATION_CACHE_SIZE, default_ttl=PORTFOLIO_VALUATION_TTL)
+
+# Multi-symbol fan-out: bounded worker pool and a deadline for each batch
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "16"))
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "10"))
+
+fetch_pool = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="fetch")
+
+# /api/stock/<symbol> answers from the last good quote, up to STOCK_MAX_STALENESS
+# seconds old, while one background refresh runs (0 turns this off). The
+# circuit breaker stops those refreshes while Finnhub keeps failing.
+STOCK_MAX_STALENESS = float(os.getenv("STOCK_MAX_STALENESS", "300"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+finnhub_breaker = CircuitBreaker("Finnhub", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="refresh")
+stock_swr = StaleWhileRevalidate(
+    lambda symbol: fetch_stock_data(symbol),
+    fresh_for=QUOTE_CACHE_TTL,
+    max_stale=STOCK_MAX_STALENESS,
+    executor=refresh_pool,
+    breaker=finnhub_breaker
+)
+
+class UpstreamError(Exception):
+    """Raised when an upstream provider returns an error payload."""
+
+# Alert and portfolio storage: SQLite (WAL) by default, JSON files for dev.
+# Data is partitioned by user; STORAGE_SHARDS > 1 spreads users over several databases.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+DATABASE_PATH = os.getenv("DATABASE_PATH", "foresight.db")
+STORAGE_SHARDS = int(os.getenv("STORAGE_SHARDS", "1"))
+DATA_DIR = os.getenv("DATA_DIR", "data")
 ALERTS_FILE = "alerts.json"
 PORTFOLIO_FILE = "portfolio.json"
 
-def load_alerts():
-    """Load alerts from JSON file."""
+store = Instrumented(
+    make_store(STORAGE_BACKEND, ALERTS_FILE, PORTFOLIO_FILE, DATA_DIR, DATABASE_PATH, shards=STORAGE_SHARDS),
+    storage_operation_duration
+)
+
+# Callers are identified by their Supabase access token (Authorization: Bearer <jwt>).
+# SINGLE_USER_MODE lets requests without a token act as the default user, for local setups.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SINGLE_USER_MODE = os.getenv("SINGLE_USER_MODE", "false").lower() == "true"
+
+if not SUPABASE_JWT_SECRET and not SINGLE_USER_MODE:
+    log.warning("⚠️ Neither SUPABASE_JWT_SECRET nor SINGLE_USER_MODE is set; user endpoints will reject every request")
+
+# Background alert evaluation (off by default: serverless hosts can't run threads)
+ALERT_SCHEDULER_ENABLED = os.getenv("ALERT_SCHEDULER_ENABLED", "false").lower() == "true"
+ALERT_SCHEDULER_INTERVAL = float(os.getenv("ALERT_SCHEDULER_INTERVAL", "60"))
+ALERT_SCHEDULER_MARKET_HOURS_ONLY = os.getenv("ALERT_SCHEDULER_MARKET_HOURS_ONLY", "true").lower() == "true"
+ALERT_SCHEDULER_LOCK_FILE = os.getenv("ALERT_SCHEDULER_LOCK_FILE", "alert_scheduler.lock")
+
+# Daily OHLCV history on disk, shared with main.py; refreshed from Alpha Vantage when stale
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+HISTORY_MAX_AGE = float(os.getenv("HISTORY_MAX_AGE", str(6 * 60 * 60)))
+# Longest a request waits on the Alpha Vantage limiter (5 calls/min) before serving stored bars
+HISTORY_FETCH_DEADLINE = float(os.getenv("HISTORY_FETCH_DEADLINE", "10"))
+
+history = HistoryStore(HISTORY_DIR)
+
+# Server-sent price stream: "finnhub" (live trades) or "mock" (seeded replay)
+PRICE_STREAM_SOURCE = os.getenv("PRICE_STREAM_SOURCE", "mock" if USE_MOCK_DATA or not FINNHUB_API_KEY else "finnhub")
+PRICE_STREAM_MOCK_INTERVAL = float(os.getenv("PRICE_STREAM_MOCK_INTERVAL", "1"))
+PRICE_STREAM_MOCK_SEED = os.getenv("PRICE_STREAM_MOCK_SEED", "0")
+PRICE_STREAM_HEARTBEAT = float(os.getenv("PRICE_STREAM_HEARTBEAT", "15"))
+
+# Sorted threshold index over active alerts, kept in step with the alert endpoints
+alert_index = AlertIndex()
+alert_index.rebuild(store.list_alerts(None, status='active'))
+
+# Activity feed: append-only per-user event log, written by a background thread
+ACTIVITY_DIR = os.getenv("ACTIVITY_DIR", "activity")
+ACTIVITY_SEGMENT_SIZE = int(os.getenv("ACTIVITY_SEGMENT_SIZE", str(4 * 1024 * 1024)))
+ACTIVITY_PAGE_MAX = 200
+
+activity_log = ActivityLog(ACTIVITY_DIR, ACTIVITY_SEGMENT_SIZE)
+
+def record_activity(user_id, level, title, details=""):
+    """Add an event to the user's activity feed; level is success, info or warning."""
+    activity_log.append(user_id, {"type": level, "title": title, "details": details})
+
+# Dashboard alert counts, maintained incrementally; each user's are built from the store on first use
+alert_stats = AlertStats()
+
+def alerts_changed(user_id, change, upserted=(), removed=()):
+    """Reflect alerts just written to the store in the threshold index and dashboard stats.
+    
+    change is the (previous, new) alerts version the store returned for that write.
+    """
+    for alert in upserted:
+        alert_index.upsert(alert)
+        alert_stats.upsert(user_id, alert)
+    for alert_id in removed:
+        alert_index.remove(alert_id)
+        alert_stats.remove(user_id, alert_id)
+    if change is not None:
+        alert_stats.advance(user_id, *change)
+
+def refresh_history(symbol, expires=None):
+    """Brings the stored daily history for symbol up to date when Alpha Vantage is configured.
+    
+    Raises DeadlineExceeded if no rate-limit slot frees up before expires.
+    """
+    if ALPHA_VANTAGE_API_KEY and not USE_MOCK_DATA:
+        history.refresh(
+            symbol,
+            lambda full: fetch_alpha_vantage_daily(symbol, ALPHA_VANTAGE_API_KEY, full, expires),
+            HISTORY_MAX_AGE
+        )
+
+def session_volume(symbol, day):
+    """Shares traded in symbol on day, from its stored daily bar, or None until that bar is in.
+    
+    Finnhub quotes carry no volume; Alpha Vantage's daily series includes the latest session.
+    """
     try:
-        if os.path.exists(ALERTS_FILE):
-            with open(ALERTS_FILE, 'r') as f:
-                return json.load(f)
-        return []
+        bars = history.bars(symbol, day, day)
     except Exception as e:
-        print(f"Error loading alerts: {e}")
-        return []
+        log.error("❌ Error reading history for %s: %s", symbol, e)
+        return None
+    return int(bars["volume"][0]) if len(bars) else None
+
+# Incremental indicator state per symbol for the technical-indicator alert types
+indicators = IndicatorBook(seed=history.bars)
+
+def observe_indicators(symbol, metrics, expires):
+    """Feed symbol's latest quote to its indicator state; once per symbol per alert cycle.
+    
+    The stored history is refreshed first, waiting no later than expires
+    for Alpha Vantage, so a day that rolls over closes from its stored bar
+    and today's volume comes from the session's bar.
+    """
+    try:
+        refresh_history(symbol, expires)
+    except DeadlineExceeded:
+        log.warning("⏱️ No Alpha Vantage rate-limit slot for %s; using stored history", symbol)
+    except Exception as e:
+        log.error("❌ Error refreshing history for %s: %s", symbol, e)
+    today = datetime.now(MARKET_TZ).date()
+    try:
+        indicators.observe(
+            symbol, today, metrics["current_price"], session_volume(symbol, today),
+            previous_close=metrics["current_price"] - metrics["price_change"]
+        )
+    except Exception as e:
+        log.error("❌ Error updating indicators for %s: %s", symbol, e)
+
+# Routes that serve market data or operations rather than a user's data, open to anonymous callers
+PUBLIC_ENDPOINTS = {
+    'root', 'get_stocks', 'get_stock', 'get_stock_history', 'stream_stocks',
+    'process_alerts', 'get_alert_scheduler_status', 'get_metrics', 'health_check'
+}
+
+def request_identity(req):
+    """Resolve the calling (user_id, portfolio_id).
+    
+    The user is the "sub" of the verified Supabase access token. Requests
+    without a token are anonymous (user_id None), unless SINGLE_USER_MODE
+    makes them the default user, which owns the data created before the
+    API was multi-user. Raises AuthError for a token that doesn't verify;
+    returns None if either id is malformed.
+    """
+    token = bearer_token(req)
+    if token is not None:
+        if not SUPABASE_JWT_SECRET:
+            raise AuthError("Token authentication is not configured")
+        user_id = verify_token(token, SUPABASE_JWT_SECRET)["sub"]
+    else:
+        user_id = DEFAULT_USER_ID if SINGLE_USER_MODE else None
+    portfolio_id = req.headers.get('X-Portfolio-Id') or req.args.get('portfolioId') or DEFAULT_PORTFOLIO_ID
+    if (user_id is not None and not is_valid_id(user_id)) or not is_valid_id(portfolio_id):
+        return None
+    return user_id, portfolio_id
+
+def requires_user(req):
+    """Whether req must come from an identified user (CORS preflights never carry a token)."""
+    return req.method != 'OPTIONS' and req.endpoint not in PUBLIC_ENDPOINTS
+
+def route_label(req):
+    """The matched URL rule (e.g. /api/stock/<symbol>), so metrics don't get a label per symbol."""
+    return req.url_rule.rule if req.url_rule is not None else "unmatched"
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_timing(response):
+    started = g.get('request_started')
+    if started is not None:
+        record_request(request.method, route_label(request), response.status_code, time.perf_counter() - started)
+    return response
+
+@app.before_request
+def identify_user():
+    try:
+        identity = request_identity(request)
+    except AuthError as e:
+        return jsonify({"error": str(e)}), 401
+    if identity is None:
+        return jsonify({"error": "Invalid user or portfolio id"}), 400
+    g.user_id, g.portfolio_id = identity
+    if g.user_id is None and requires_user(request):
+        return jsonify({"error": "Authentication required"}), 401
 
-def save_alerts(alerts):
-    """Save alerts to JSON file."""
+@app.after_request
+def compress_response(response):
+    if response.is_streamed or response.direct_passthrough:
+        return response
+    encoding = choose_encoding(request, response)
+    if encoding is None:
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) >= COMPRESS_MIN_SIZE:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def json_with_etag(build, version=None):
+    """jsonify(build()) under a weak ETag, or an empty 304 if If-None-Match already has it.
+    
+    When version (store state the body is derived from) is given, the ETag
+    comes from it and a matching request skips build() entirely. Otherwise
+    the ETag is a hash of the body, which still saves the transfer.
+    """
+    etag = make_etag(request.full_path, g.user_id, g.portfolio_id, version) if version is not None else None
+    if etag is None or not is_not_modified(request, etag):
+        response = jsonify(build())
+        etag = etag or make_etag(response.get_data())
+    if is_not_modified(request, etag):
+        response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def load_alerts(user_id, status=None):
+    """Load a user's alerts from the store, optionally only those with the given status."""
     try:
-        with open(ALERTS_FILE, 'w') as f:
-            json.dump(alerts, f, indent=2)
+        return store.list_alerts(user_id, status=status)
     except Exception as e:
-        print(f"Error saving alerts: {e}")
+        log.error("Error loading alerts: %s", e)
+        return []
 
-def load_portfolio():
-    """Load user portfolio from JSON file."""
+def load_portfolio(user_id, portfolio_id=DEFAULT_PORTFOLIO_ID):
+    """Load a user's portfolio from the store."""
     try:
-        if os.path.exists(PORTFOLIO_FILE):
-            with open(PORTFOLIO_FILE, 'r') as f:
-                return json.load(f)
-        # Return empty portfolio if none exists
-        return {"holdings": []}
+        return store.load_portfolio(user_id, portfolio_id)
     except Exception as e:
-        print(f"Error loading portfolio: {e}")
+        log.error("Error loading portfolio: %s", e)
         return {"holdings": []}
 
-def save_portfolio(portfolio):
-    """Save user portfolio to JSON file."""
+def save_portfolio(user_id, portfolio, portfolio_id=DEFAULT_PORTFOLIO_ID):
+    """Save a user's portfolio to the store."""
     try:
-        with open(PORTFOLIO_FILE, 'w') as f:
-            json.dump(portfolio, f, indent=2)
+        store.save_portfolio(user_id, portfolio, portfolio_id)
+        valuation_cache.delete((user_id, portfolio_id))
     except Exception as e:
-        print(f"Error saving portfolio: {e}")
+        log.error("Error saving portfolio: %s", e)
 
 
 
-def process_alert(alert):
-    """Process an alert using the logic from main.py"""
+def process_alert(alert, stock_data=None, metrics=None):
+    """Process an alert using the logic from main.py
+    
+    stock_data and metrics may be passed in when the caller has already
+    fetched them for the alert's symbol; otherwise they are computed here.
+    Indicator alerts are checked against the state observe_indicators()
+    last advanced, so the caller observes each symbol first.
+    """
     try:
         symbol = alert['symbol']
         company_name = alert.get('companyName', symbol)
         alert_type = alert['alertType']
         
         # Get current stock data
-        stock_data = get_stock_data(symbol)
+        if stock_data is None:
+            stock_data = get_stock_data(symbol, priority=BACKGROUND)
         if "error" in stock_data or "mock" in stock_data:
             return {"status": "error", "message": "Failed to fetch stock data"}
         
-        metrics = get_stock_metrics(stock_data)
+        if metrics is None:
+            metrics = get_stock_metrics(stock_data)
         current_price = metrics["current_price"]
         price_change = metrics["change_percent"]
         
@@ -82,7 +355,10 @@ def process_alert(alert):
         triggered = False
         trigger_message = ""
         
-        if alert_type in ["price-above", "price-below"]:
+        if alert_type in INDICATOR_TYPES:
+            triggered, trigger_message = indicators.check(alert)
+        
+        elif alert_type in ["price-above", "price-below"]:
             threshold = alert.get('threshold')
             if threshold is not None:
                 if alert_type == "price-above" and current_price >= threshold:
@@ -113,19 +389,25 @@ def process_alert(alert):
             alert['triggeredPrice'] = current_price
             alert['triggeredChange'] = price_change
             
-            # For now, we'll just log it
-            print(f"🚨 ALERT TRIGGERED: {symbol} - {trigger_message}")
+            log.info("🚨 ALERT TRIGGERED: %s - %s", symbol, trigger_message)
+            record_activity(
+                alert_owner(alert), "success", f"{symbol} alert triggered",
+                f"{trigger_message} at ${current_price:.2f}"
+            )
             
             return {"status": "triggered", "message": f"Alert triggered: {symbol} - {trigger_message}"}
         else:
             return {"status": "monitoring", "message": f"Monitoring {symbol}: {price_change:.2f}% change"}
             
     except Exception as e:
-        print(f"Error processing alert: {e}")
+        log.error("Error processing alert: %s", e)
         return {"status": "error", "message": str(e)}
 
-def generate_mock_stock_data(symbol):
-    """Generate realistic mock stock data for development"""
+def generate_mock_stock_data(symbol, rng=random):
+    """Generate realistic mock stock data for development
+    
+    Pass a seeded random.Random as rng to get a reproducible sequence.
+    """
     # Base prices for different stocks
     base_prices = {
         "AAPL": 180.0,
@@ -141,16 +423,16 @@ def generate_mock_stock_data(symbol):
     base_price = base_prices.get(symbol, 100.0)
     
     # Generate realistic price movement
-    price_change_percent = random.uniform(-5.0, 5.0)
+    price_change_percent = rng.uniform(-5.0, 5.0)
     current_price = base_price * (1 + price_change_percent / 100)
     price_change = current_price - base_price
     
     # Generate high/low based on current price
-    day_high = current_price * random.uniform(1.01, 1.05)
-    day_low = current_price * random.uniform(0.95, 0.99)
+    day_high = current_price * rng.uniform(1.01, 1.05)
+    day_low = current_price * rng.uniform(0.95, 0.99)
     
     # Generate volume
-    volume = random.randint(1000000, 50000000)
+    volume = rng.randint(1000000, 50000000)
     
     return {
         "current_price": round(current_price, 2),
@@ -161,54 +443,143 @@ def generate_mock_stock_data(symbol):
         "volume": volume
     }
 
-def get_stock_data(symbol):
-    """Fetches stock data from Finnhub or returns mock data."""
+def fetch_quote(symbol, priority=INTERACTIVE, expires=None):
+    """Fetches the current quote for symbol from Finnhub."""
+    log.debug("🔍 Fetching quote data for %s from Finnhub...", symbol)
+    
+    quote_response = finnhub.get("/quote", params={"symbol": symbol, "token": FINNHUB_API_KEY}, priority=priority, expires=expires)
+    if quote_response.status_code == 429:
+        raise UpstreamError("Finnhub rate limit exceeded, try again shortly")
+    quote_response.raise_for_status()
+    quote_data = quote_response.json()
+    
+    log.debug("📊 Quote response for %s: %s", symbol, quote_data)
+    
+    if "error" in quote_data:
+        raise UpstreamError(quote_data["error"])
+    return quote_data
+
+def fetch_profile(symbol, priority=INTERACTIVE, expires=None):
+    """Fetches the company profile for symbol from Finnhub."""
+    profile_response = finnhub.get("/stock/profile2", params={"symbol": symbol, "token": FINNHUB_API_KEY}, priority=priority, expires=expires)
+    profile_response.raise_for_status()
+    return profile_response.json()
+
+def load_quote(symbol, priority=INTERACTIVE, expires=None):
+    """Returns the cached quote for symbol, fetching it on a miss."""
+    return quote_cache.get_or_load(("quote", symbol), lambda: fetch_quote(symbol, priority, expires), ttl=QUOTE_CACHE_TTL)
+
+def load_profile(symbol, priority=INTERACTIVE, expires=None):
+    """Returns the cached company profile for symbol, fetching it on a miss."""
+    return quote_cache.get_or_load(("profile", symbol), lambda: fetch_profile(symbol, priority, expires), ttl=PROFILE_CACHE_TTL)
+
+def stock_data_error(symbol, error):
+    """Converts an exception raised while fetching symbol into an error payload."""
+    if isinstance(error, DeadlineExceeded):
+        log.warning("⏱️ No Finnhub rate-limit slot for %s before the deadline", symbol)
+        return {"error": "Timed out waiting for the Finnhub rate limit"}
+    if isinstance(error, (UpstreamError, CircuitOpenError)):
+        log.warning("❌ Finnhub error for %s: %s", symbol, error)
+        return {"error": str(error)}
+    if isinstance(error, REQUEST_ERRORS):
+        log.warning("❌ Request error for %s: %s", symbol, error)
+        return {"error": f"Failed to fetch data: {str(error)}"}
+    log.error("❌ Unexpected error for %s: %s", symbol, error)
+    return {"error": f"Unexpected error: {str(error)}"}
+
+def get_stock_data(symbol, priority=INTERACTIVE):
+    """Fetches stock data from Finnhub (through the quote cache) or returns mock data."""
+    return get_stock_data_many([symbol], priority=priority)[symbol]
+
+def fetch_stock_data(symbol):
+    """Loader for stock_swr: stock data with a quote straight from Finnhub.
+    
+    A quote from the quote cache may already be QUOTE_CACHE_TTL old, which
+    stock_swr would take as brand new, so the quote bypasses the cache (and
+    refreshes it); the profile still comes through it. Raises instead of
+    returning an error payload.
+    """
+    if USE_MOCK_DATA or not FINNHUB_API_KEY:
+        stock_data = get_stock_data(symbol)
+        if "error" in stock_data:
+            raise UpstreamError(stock_data["error"])
+        return stock_data
+    
+    expires = time.monotonic() + FETCH_DEADLINE
+    profile_future = fetch_pool.submit(load_profile, symbol, INTERACTIVE, expires)
+    quote_data = fetch_quote(symbol, expires=expires)
+    quote_cache.set(("quote", symbol), quote_data, ttl=QUOTE_CACHE_TTL)
+    
+    # A missing or failed profile only costs us the company name
+    wait([profile_future], timeout=max(0.0, expires - time.monotonic()))
+    profile_ok = profile_future.done() and profile_future.exception() is None
+    return {"quote": quote_data, "profile": profile_future.result() if profile_ok else {}}
+
+def get_stock_data_many(symbols, deadline=None, priority=INTERACTIVE):
+    """Fetches stock data for several symbols concurrently.
+    
+    Quote and profile requests for every symbol run in parallel on the shared
+    fetch pool. Symbols whose quote fails or is not back before the deadline
+    get an error payload, so callers always receive a result for each symbol.
+    
+    Requests still queued for a Finnhub rate-limit token at the deadline are
+    withdrawn, so an abandoned fetch spends neither a token nor a pool worker.
+    Each cold symbol costs two calls, quote first: profiles queue behind every
+    quote and are the first to be dropped when the budget runs short.
+    
+    Background work such as alert evaluation should pass priority=BACKGROUND
+    so the Finnhub rate limiter serves dashboard requests first.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    deadline = FETCH_DEADLINE if deadline is None else deadline
     
     # Use mock data if enabled
     if USE_MOCK_DATA:
-        print(f"🎭 Using mock data for {symbol}")
-        return {"mock": True}
+        log.debug("🎭 Using mock data for %s", symbols)
+        return {symbol: {"mock": True} for symbol in symbols}
     
-    try:
-        # Check if API key exists
-        if not FINNHUB_API_KEY:
-            print(f"❌ No Finnhub API key found for symbol {symbol}")
-            return {"error": "Finnhub API key not configured"}
-        
-        # Get current quote
-        quote_url = f"https://finnhub.io/api/v1/quote?symbol={symbol}&token={FINNHUB_API_KEY}"
-        print(f"🔍 Fetching quote data for {symbol} from Finnhub...")
-        
-        quote_response = requests.get(quote_url)
-        quote_response.raise_for_status()
-        quote_data = quote_response.json()
-        
-        print(f"📊 Quote response for {symbol}: {quote_data}")
-        
-        if "error" in quote_data:
-            print(f"❌ Finnhub error for {symbol}: {quote_data['error']}")
-            return {"error": quote_data['error']}
+    # Check if API key exists
+    if not FINNHUB_API_KEY:
+        log.warning("❌ No Finnhub API key found for symbols %s", symbols)
+        return {symbol: {"error": "Finnhub API key not configured"} for symbol in symbols}
+    
+    expires = time.monotonic() + deadline
+    quote_futures = {symbol: fetch_pool.submit(load_quote, symbol, priority, expires) for symbol in symbols}
+    profile_futures = {symbol: fetch_pool.submit(load_profile, symbol, priority, expires) for symbol in symbols}
+    wait(list(quote_futures.values()) + list(profile_futures.values()), timeout=deadline)
+    return collect_stock_data(symbols, quote_futures, profile_futures, deadline)
+
+def collect_stock_data(symbols, quote_futures, profile_futures, deadline):
+    """Turns finished (or unfinished) quote/profile futures into per-symbol stock data.
+    
+    Works with concurrent.futures and asyncio futures alike.
+    """
+    results = {}
+    for symbol in symbols:
+        quote_future = quote_futures[symbol]
+        if not quote_future.done():
+            log.warning("⏱️ Timed out fetching %s after %ss", symbol, deadline)
+            results[symbol] = {"error": f"Timed out after {deadline}s"}
+            continue
+        if quote_future.exception() is not None:
+            results[symbol] = stock_data_error(symbol, quote_future.exception())
+            continue
         
-        # Get company profile for additional info
-        profile_url = f"https://finnhub.io/api/v1/stock/profile2?symbol={symbol}&token={FINNHUB_API_KEY}"
-        profile_response = requests.get(profile_url)
-        profile_data = profile_response.json() if profile_response.status_code == 200 else {}
+        # A missing or failed profile only costs us the company name
+        profile_future = profile_futures[symbol]
+        if profile_future.done() and profile_future.exception() is None:
+            profile_data = profile_future.result()
+        else:
+            profile_data = {}
         
         # Combine quote and profile data
-        stock_data = {
-            "quote": quote_data,
+        results[symbol] = {
+            "quote": quote_future.result(),
             "profile": profile_data
         }
-        
-        print(f"✅ Successfully fetched data for {symbol}")
-        return stock_data
-        
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Request error for {symbol}: {str(e)}")
-        return {"error": f"Failed to fetch data: {str(e)}"}
-    except Exception as e:
-        print(f"❌ Unexpected error for {symbol}: {str(e)}")
-        return {"error": f"Unexpected error: {str(e)}"}
+    
+    log.debug("✅ Fetched data for %d symbols", len(symbols))
+    return results
 
 def get_stock_metrics(stock_data):
     """Extracts comprehensive stock metrics from Finnhub data or mock data."""
@@ -222,7 +593,7 @@ def get_stock_metrics(stock_data):
         profile_data = stock_data.get("profile", {})
         
         if not quote_data or "c" not in quote_data:
-            print(f"❌ No quote data available")
+            log.warning("❌ No quote data available")
             return {
                 "current_price": 0,
                 "price_change": 0,
@@ -241,9 +612,9 @@ def get_stock_metrics(stock_data):
         
         # Calculate price change
         price_change = current_price - previous_close
-        change_percent = (price_change / previous_close) * 100 if previous_close > 0 else 0
+        change_percent = percent_change(current_price, previous_close)
         
-        print(f"💰 Calculated metrics - Price: ${current_price:.2f}, Change: {change_percent:.2f}%")
+        log.debug("💰 Calculated metrics - Price: $%.2f, Change: %.2f%%", current_price, change_percent)
         
         return {
             "current_price": current_price,
@@ -254,7 +625,7 @@ def get_stock_metrics(stock_data):
             "volume": volume
         }
     except (KeyError, ValueError, IndexError) as e:
-        print(f"❌ Error processing stock data: {e}")
+        log.error("❌ Error processing stock data: %s", e)
         return {
             "current_price": 0,
             "price_change": 0,
@@ -270,6 +641,111 @@ def get_company_name(symbol, profile_data):
         return profile_data["name"]
     return f"{symbol} Corp."
 
+def build_stock_record(symbol, stock_data):
+    """Builds the stock record returned by /api/stocks and /api/stock/<symbol>."""
+    if "error" in stock_data:
+        return {
+            "symbol": symbol,
+            "companyName": f"{symbol} Corp.",
+            "currentPrice": 0,
+            "priceChange": 0,
+            "changePercent": 0,
+            "volume": 0,
+            "dayHigh": 0,
+            "dayLow": 0,
+            "status": "halted",
+            "error": stock_data["error"]
+        }
+    
+    if "mock" in stock_data:
+        # Generate mock data for this specific symbol
+        metrics = generate_mock_stock_data(symbol)
+        company_name = f"{symbol} Corp."
+        status = "active"
+    else:
+        metrics = get_stock_metrics(stock_data)
+        company_name = get_company_name(symbol, stock_data.get("profile", {}))
+        status = "active" if metrics["current_price"] > 0 else "inactive"
+    
+    return {
+        "symbol": symbol,
+        "companyName": company_name,
+        "currentPrice": metrics["current_price"],
+        "priceChange": metrics["price_change"],
+        "changePercent": metrics["change_percent"],
+        "volume": metrics["volume"],
+        "dayHigh": metrics["day_high"],
+        "dayLow": metrics["day_low"],
+        "status": status
+    }
+
+def value_portfolio(user_id, portfolio_id):
+    """Values every holding in one vectorized pass, aggregating lots per symbol."""
+    book = PortfolioBook(load_portfolio(user_id, portfolio_id)["holdings"])
+    return book.value(portfolio_quotes(book.symbols, get_stock_data_many(book.symbols)))
+
+def portfolio_quotes(symbols, all_stock_data):
+    """Maps each symbol to (current_price, change_percent) for PortfolioBook.value."""
+    quotes = {}
+    for symbol in symbols:
+        stock_data = all_stock_data[symbol]
+        if "error" not in stock_data and "mock" not in stock_data:
+            metrics = get_stock_metrics(stock_data)
+        else:
+            # Use mock data if API fails
+            metrics = generate_mock_stock_data(symbol)
+        quotes[symbol] = (metrics["current_price"], metrics["change_percent"])
+    return quotes
+
+def get_portfolio_valuation(user_id, portfolio_id):
+    """Returns the current portfolio valuation, shared by the dashboard endpoints."""
+    return valuation_cache.get_or_load(
+        (user_id, portfolio_id), lambda: value_portfolio(user_id, portfolio_id)
+    )
+
+def portfolio_overview(valuation):
+    """Body of /api/dashboard/portfolio; valuation None gives the empty overview."""
+    if valuation is None:
+        return {
+            "totalValue": 0,
+            "totalChange": 0,
+            "changePercent": 0,
+            "holdings": []
+        }
+    return {
+        "totalValue": round(valuation.total_value, 2),
+        "totalChange": round(valuation.total_change, 2),
+        "changePercent": round(valuation.total_change_percent, 2),
+        "holdings": valuation.positions()
+    }
+
+def market_leaders_overview(valuation):
+    """Body of /api/dashboard/market-leaders; valuation None gives empty leaders."""
+    gainers, losers = valuation.top_movers(1) if valuation is not None else ([], [])
+    
+    if not gainers:
+        # If no holdings, return empty values
+        return {
+            "topGainer": {"symbol": "", "change": "", "price": 0},
+            "topLoser": {"symbol": "", "change": "", "price": 0}
+        }
+    
+    top_gainer = gainers[0]
+    top_loser = losers[0]
+    
+    return {
+        "topGainer": {
+            "symbol": top_gainer["symbol"],
+            "change": f"{top_gainer['changePercent']:+.1f}% today",
+            "price": top_gainer["currentPrice"]
+        },
+        "topLoser": {
+            "symbol": top_loser["symbol"], 
+            "change": f"{top_loser['changePercent']:+.1f}% today",
+            "price": top_loser["currentPrice"]
+        }
+    }
+
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint for testing."""
@@ -286,495 +762,709 @@ def root():
 @app.route('/api/stocks', methods=['GET'])
 def get_stocks():
     """Get stock data for multiple symbols."""
-    symbols = request.args.get('symbols', 'AAPL,GOOGL,TSLA,MSFT,NVDA,AMZN,META,NFLX').split(',')
-    stocks = []
+    symbols = request.args.get('symbols', DEFAULT_SYMBOLS).split(',')
+    symbols = [symbol.strip().upper() for symbol in symbols]
     
-    print(f"🚀 Processing {len(symbols)} symbols: {symbols}")
+    log.debug("🚀 Processing %d symbols: %s", len(symbols), symbols)
     
+    return jsonify(build_stock_records(symbols, get_stock_data_many(symbols)))
+
+def build_stock_records(symbols, all_stock_data):
+    """Builds the /api/stocks response body, one record per requested symbol."""
+    stocks = []
     for symbol in symbols:
-        symbol = symbol.strip().upper()
-        stock_data = get_stock_data(symbol)
-        
+        stock_data = all_stock_data[symbol]
         if "error" in stock_data:
-            print(f"❌ Error for {symbol}: {stock_data['error']}")
-            stocks.append({
-                "symbol": symbol,
-                "companyName": f"{symbol} Corp.",
-                "currentPrice": 0,
-                "priceChange": 0,
-                "changePercent": 0,
-                "volume": 0,
-                "dayHigh": 0,
-                "dayLow": 0,
-                "status": "halted",
-                "error": stock_data["error"]
-            })
-        elif "mock" in stock_data:
-            # Generate mock data for this specific symbol
-            metrics = generate_mock_stock_data(symbol)
-            stocks.append({
-                "symbol": symbol,
-                "companyName": f"{symbol} Corp.",
-                "currentPrice": metrics["current_price"],
-                "priceChange": metrics["price_change"],
-                "changePercent": metrics["change_percent"],
-                "volume": metrics["volume"],
-                "dayHigh": metrics["day_high"],
-                "dayLow": metrics["day_low"],
-                "status": "active"
-            })
-        else:
-            metrics = get_stock_metrics(stock_data)
-            company_name = get_company_name(symbol, stock_data.get("profile", {}))
-            
-            stocks.append({
-                "symbol": symbol,
-                "companyName": company_name,
-                "currentPrice": metrics["current_price"],
-                "priceChange": metrics["price_change"],
-                "changePercent": metrics["change_percent"],
-                "volume": metrics["volume"],
-                "dayHigh": metrics["day_high"],
-                "dayLow": metrics["day_low"],
-                "status": "active" if metrics["current_price"] > 0 else "inactive"
-            })
-    
-    print(f"📈 Returning {len(stocks)} stock results")
-    return jsonify(stocks)
+            log.debug("❌ Error for %s: %s", symbol, stock_data['error'])
+        stocks.append(build_stock_record(symbol, stock_data))
+    
+    log.debug("📈 Returning %d stock results", len(stocks))
+    return stocks
 
 @app.route('/api/stock/<symbol>', methods=['GET'])
 def get_stock(symbol):
     """Get data for a single stock symbol."""
-    symbol = symbol.upper()
-    stock_data = get_stock_data(symbol)
+    return jsonify(stock_record(symbol.upper()))
+
+def stock_record(symbol):
+    """Record for /api/stock/<symbol>; with stale-while-revalidate on, it also carries age and stale."""
+    if STOCK_MAX_STALENESS <= 0:
+        return build_stock_record(symbol, get_stock_data(symbol))
+    try:
+        stock_data, age = stock_swr.get(symbol)
+    except Exception as e:
+        return build_stock_record(symbol, stock_data_error(symbol, e))
+    record = build_stock_record(symbol, stock_data)
+    record["age"] = round(age, 1)
+    record["stale"] = age >= QUOTE_CACHE_TTL
+    return record
+
+@app.route('/api/stock/<symbol>/history', methods=['GET'])
+def get_stock_history(symbol):
+    """Get daily OHLCV bars for a symbol, optionally limited to start/end dates.
     
-    if "error" in stock_data:
-        return jsonify({
-            "symbol": symbol,
-            "companyName": f"{symbol} Corp.",
-            "currentPrice": 0,
-            "priceChange": 0,
-            "changePercent": 0,
-            "volume": 0,
-            "dayHigh": 0,
-            "dayLow": 0,
-            "status": "halted",
-            "error": stock_data["error"]
-        })
+    Each bar carries its day-over-day changePercent; pass window=N to also
+    get the N-day moving average and rolling high/low of the close. The
+    stored bars are served as they are if Alpha Vantage has no rate-limit
+    slot within HISTORY_FETCH_DEADLINE.
+    """
+    symbol = symbol.upper()
+    try:
+        try:
+            refresh_history(symbol, time.monotonic() + HISTORY_FETCH_DEADLINE)
+        except DeadlineExceeded:
+            log.warning("⏱️ No Alpha Vantage rate-limit slot for %s; serving stored history", symbol)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Serve whatever is stored; the next request retries the refresh
+            log.error("❌ Error refreshing history for %s: %s", symbol, e)
+        bars = history.bars(symbol, request.args.get('start'), request.args.get('end'))
+        window = request.args.get('window', type=int)
+        if window is not None and window < 1:
+            raise ValueError("window must be a positive integer")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    if "mock" in stock_data:
-        metrics = generate_mock_stock_data(symbol)
-        return jsonify({
-            "symbol": symbol,
-            "companyName": f"{symbol} Corp.",
-            "currentPrice": metrics["current_price"],
-            "priceChange": metrics["price_change"],
-            "changePercent": metrics["change_percent"],
-            "volume": metrics["volume"],
-            "dayHigh": metrics["day_high"],
-            "dayLow": metrics["day_low"],
-            "status": "active"
+    series = TimeSeries.from_bars(bars)
+    records = [
+        {
+            "date": str(date),
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume
+        }
+        for date, open_, high, low, close, volume in bars.tolist()
+    ]
+    columns = {"changePercent": series.returns(1)}
+    if window:
+        columns.update({
+            "sma": series.sma(window),
+            "rollingHigh": series.rolling_high(window),
+            "rollingLow": series.rolling_low(window)
         })
+    for name, values in columns.items():
+        for record, value in zip(records, values.tolist()):
+            record[name] = None if value != value else value  # NaN -> null
+    return jsonify(records)
+
+@app.route('/api/stream/stocks', methods=['GET'])
+def stream_stocks():
+    """Stream stock records for the requested symbols as server-sent events."""
+    symbols = request.args.get('symbols', DEFAULT_SYMBOLS).split(',')
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols))
+    subscription = price_hub.subscribe(symbols)
     
-    metrics = get_stock_metrics(stock_data)
-    company_name = get_company_name(symbol, stock_data.get("profile", {}))
+    def events():
+        try:
+            while True:
+                records = subscription.next(timeout=PRICE_STREAM_HEARTBEAT)
+                if not records:
+                    yield ": keep-alive\n\n"
+                for record in records:
+                    yield f"event: stock\ndata: {json.dumps(record)}\n\n"
+        finally:
+            price_hub.unsubscribe(subscription)
     
-    return jsonify({
-        "symbol": symbol,
-        "companyName": company_name,
-        "currentPrice": metrics["current_price"],
-        "priceChange": metrics["price_change"],
-        "changePercent": metrics["change_percent"],
-        "volume": metrics["volume"],
-        "dayHigh": metrics["day_high"],
-        "dayLow": metrics["day_low"],
-        "status": "active" if metrics["current_price"] > 0 else "inactive"
-    })
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route('/api/dashboard/portfolio', methods=['GET'])
 def get_portfolio_data():
     """Get portfolio overview data."""
     try:
-        # Load user's actual portfolio
-        portfolio = load_portfolio()
-        portfolio_data = []
-        total_value = 0
-        total_change = 0
-        
-        for holding in portfolio["holdings"]:
-            symbol = holding["symbol"]
-            shares = holding["shares"]
-            purchase_price = holding["purchasePrice"]
-            
-            # Get current stock data
-            stock_data = get_stock_data(symbol)
-            if "error" not in stock_data and "mock" not in stock_data:
-                metrics = get_stock_metrics(stock_data)
-                current_price = metrics["current_price"]
-                position_value = shares * current_price
-                position_change = shares * (current_price - purchase_price)
-                change_percent = ((current_price - purchase_price) / purchase_price) * 100
-                
-                portfolio_data.append({
-                    "symbol": symbol,
-                    "shares": shares,
-                    "currentPrice": current_price,
-                    "purchasePrice": purchase_price,
-                    "positionValue": position_value,
-                    "positionChange": position_change,
-                    "changePercent": change_percent
-                })
-                
-                total_value += position_value
-                total_change += position_change
-            else:
-                # Use mock data if API fails
-                metrics = generate_mock_stock_data(symbol)
-                current_price = metrics["current_price"]
-                position_value = shares * current_price
-                position_change = shares * (current_price - purchase_price)
-                change_percent = ((current_price - purchase_price) / purchase_price) * 100
-                
-                portfolio_data.append({
-                    "symbol": symbol,
-                    "shares": shares,
-                    "currentPrice": current_price,
-                    "purchasePrice": purchase_price,
-                    "positionValue": position_value,
-                    "positionChange": position_change,
-                    "changePercent": change_percent
-                })
-                
-                total_value += position_value
-                total_change += position_change
-        
-        # Calculate portfolio change percentage
-        portfolio_change_percent = (total_change / (total_value - total_change)) * 100 if (total_value - total_change) > 0 else 0
-        
-        return jsonify({
-            "totalValue": round(total_value, 2),
-            "totalChange": round(total_change, 2),
-            "changePercent": round(portfolio_change_percent, 2),
-            "holdings": portfolio_data
-        })
+        valuation = get_portfolio_valuation(g.user_id, g.portfolio_id)
+        return json_with_etag(lambda: portfolio_overview(valuation))
         
     except Exception as e:
-        print(f"❌ Error getting portfolio data: {e}")
-        return jsonify({
-            "totalValue": 0,
-            "totalChange": 0,
-            "changePercent": 0,
-            "holdings": []
-        })
+        log.error("❌ Error getting portfolio data: %s", e)
+        return jsonify(portfolio_overview(None))
 
 @app.route('/api/dashboard/alerts', methods=['GET'])
 def get_alerts_data():
     """Get alerts overview data."""
     try:
-        alerts = load_alerts()
-        
-        # Count active alerts
-        active_alerts = len([alert for alert in alerts if alert['status'] == 'active'])
-        
-        # Count alerts triggered today
-        today = datetime.now().date()
-        triggered_today = len([
-            alert for alert in alerts 
-            if alert.get('lastTriggered') and 
-            datetime.fromisoformat(alert['lastTriggered']).date() == today
-        ])
-        
-        # Get recent alerts (last 5 triggered alerts)
-        recent_alerts = []
-        triggered_alerts = [alert for alert in alerts if alert.get('lastTriggered')]
-        triggered_alerts.sort(key=lambda x: x['lastTriggered'], reverse=True)
-        
-        for alert in triggered_alerts[:5]:
-            # Calculate time ago
-            triggered_time = datetime.fromisoformat(alert['lastTriggered'])
-            time_diff = datetime.now() - triggered_time
-            
-            if time_diff.days > 0:
-                time_ago = f"{time_diff.days} day{'s' if time_diff.days > 1 else ''} ago"
-            elif time_diff.seconds > 3600:
-                hours = time_diff.seconds // 3600
-                time_ago = f"{hours} hour{'s' if hours > 1 else ''} ago"
-            else:
-                minutes = time_diff.seconds // 60
-                time_ago = f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-            
-            recent_alerts.append({
-                "id": alert['id'],
-                "type": "success",
-                "title": f"{alert['symbol']} alert triggered",
-                "time": time_ago,
-                "symbol": alert['symbol'],
-                "price": alert.get('triggeredPrice', 0)
-            })
-        
-        return jsonify({
-            "activeAlerts": active_alerts,
-            "triggeredToday": triggered_today,
-            "recentAlerts": recent_alerts
-        })
+        # "time ago" strings change by the minute, so the minute is part of the version
+        alerts_version = store.alerts_version(g.user_id)
+        version = (alerts_version, int(time.time() // 60))
+        return json_with_etag(lambda: alerts_overview(g.user_id, alerts_version), version)
         
     except Exception as e:
-        print(f"❌ Error getting alerts data: {e}")
+        log.error("❌ Error getting alerts data: %s", e)
         return jsonify({
             "activeAlerts": 0,
             "triggeredToday": 0,
             "recentAlerts": []
         })
 
+def time_ago(timestamp):
+    """"5 minutes ago" style age of a local ISO timestamp."""
+    time_diff = datetime.now() - datetime.fromisoformat(timestamp)
+    
+    if time_diff.days > 0:
+        return f"{time_diff.days} day{'s' if time_diff.days > 1 else ''} ago"
+    elif time_diff.seconds > 3600:
+        hours = time_diff.seconds // 3600
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    else:
+        minutes = time_diff.seconds // 60
+        return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
+
+def alerts_overview(user_id, alerts_version):
+    """Body of /api/dashboard/alerts for the user's alerts.
+    
+    Counts and recent triggers come from alert_stats, which is kept up to
+    date by every alert write, so this doesn't touch the alerts at all.
+    """
+    today = datetime.now().date().isoformat()
+    statuses, triggered_today, triggered_alerts = alert_stats.summary(
+        user_id, alerts_version, today, lambda: store.list_alerts(user_id)
+    )
+    active_alerts = statuses.get('active', 0)
+    
+    # Get recent alerts (last 5 triggered alerts)
+    recent_alerts = []
+    for alert in triggered_alerts:
+        recent_alerts.append({
+            "id": alert['id'],
+            "type": "success",
+            "title": f"{alert['symbol']} alert triggered",
+            "time": time_ago(alert['lastTriggered']),
+            "symbol": alert['symbol'],
+            "price": alert.get('triggeredPrice', 0)
+        })
+    
+    return {
+        "activeAlerts": active_alerts,
+        "triggeredToday": triggered_today,
+        "recentAlerts": recent_alerts
+    }
+
 @app.route('/api/dashboard/market-leaders', methods=['GET'])
 def get_market_leaders():
     """Get top gainers and losers from user's portfolio."""
     try:
-        # Load user's actual portfolio
-        portfolio = load_portfolio()
-        
-        if not portfolio["holdings"]:
-            # If no holdings, return empty values
-            return jsonify({
-                "topGainer": {
-                    "symbol": "",
-                    "change": "",
-                    "price": 0
-                },
-                "topLoser": {
-                    "symbol": "", 
-                    "change": "",
-                    "price": 0
-                }
-            })
-        
-        # Get data for user's holdings
-        holdings_data = []
-        
-        for holding in portfolio["holdings"]:
-            symbol = holding["symbol"]
-            stock_data = get_stock_data(symbol)
-            if "error" not in stock_data and "mock" not in stock_data:
-                metrics = get_stock_metrics(stock_data)
-                holdings_data.append({
-                    "symbol": symbol,
-                    "changePercent": metrics["change_percent"],
-                    "currentPrice": metrics["current_price"]
-                })
-            else:
-                metrics = generate_mock_stock_data(symbol)
-                holdings_data.append({
-                    "symbol": symbol,
-                    "changePercent": metrics["change_percent"],
-                    "currentPrice": metrics["current_price"]
-                })
-        
-        # Sort by change percentage
-        sorted_holdings = sorted(holdings_data, key=lambda x: x["changePercent"], reverse=True)
-        
-        top_gainer = sorted_holdings[0] if sorted_holdings else {"symbol": "AAPL", "changePercent": 5.2, "currentPrice": 185.50}
-        top_loser = sorted_holdings[-1] if sorted_holdings else {"symbol": "TSLA", "changePercent": -2.8, "currentPrice": 245.20}
-        
-        return jsonify({
-            "topGainer": {
-                "symbol": top_gainer["symbol"],
-                "change": f"{top_gainer['changePercent']:+.1f}% today",
-                "price": top_gainer["currentPrice"]
-            },
-            "topLoser": {
-                "symbol": top_loser["symbol"], 
-                "change": f"{top_loser['changePercent']:+.1f}% today",
-                "price": top_loser["currentPrice"]
-            }
-        })
+        valuation = get_portfolio_valuation(g.user_id, g.portfolio_id)
+        return json_with_etag(lambda: market_leaders_overview(valuation))
         
     except Exception as e:
-        print(f"❌ Error getting market leaders: {e}")
-        return jsonify({
-            "topGainer": {"symbol": "", "change": "", "price": 0},
-            "topLoser": {"symbol": "", "change": "", "price": 0}
-        })
+        log.error("❌ Error getting market leaders: %s", e)
+        return jsonify(market_leaders_overview(None))
 
 @app.route('/api/dashboard/activities', methods=['GET'])
 def get_recent_activities():
-    """Get recent user activities."""
+    """Get recent user activities, newest first.
+    
+    Returns the five most recent as a plain array. With limit and/or
+    cursor the response is one page, {"activities": [...], "nextCursor": ...}.
+    """
     try:
+        paged = 'limit' in request.args or 'cursor' in request.args
+        try:
+            limit = int(request.args.get('limit', 5))
+            before = int(request.args['cursor']) if 'cursor' in request.args else None
+        except ValueError:
+            return jsonify({"error": "limit and cursor must be integers"}), 400
+        if not 1 <= limit <= ACTIVITY_PAGE_MAX:
+            return jsonify({"error": f"limit must be between 1 and {ACTIVITY_PAGE_MAX}"}), 400
+        
+        events, cursor = activity_log.read(g.user_id, limit, before)
         activities = [
             {
-                "id": "1",
-                "type": "success",
-                "title": "AAPL price alert triggered",
-                "time": "2 minutes ago",
-                "details": "Stock price reached $185.50"
-            },
-            {
-                "id": "2",
-                "type": "info", 
-                "title": "News alert: Tesla earnings report",
-                "time": "15 minutes ago",
-                "details": "Q4 earnings beat expectations"
-            },
-            {
-                "id": "3",
-                "type": "warning",
-                "title": "Portfolio rebalancing suggestion", 
-                "time": "1 hour ago",
-                "details": "Consider reducing NVDA position"
-            },
-            {
-                "id": "4",
-                "type": "success",
-                "title": "GOOGL alert set successfully",
-                "time": "2 hours ago", 
-                "details": "Price alert at $2800"
-            },
-            {
-                "id": "5",
-                "type": "info",
-                "title": "Market open notification",
-                "time": "3 hours ago",
-                "details": "Trading session started"
+                "id": str(event['seq']),
+                "type": event['type'],
+                "title": event['title'],
+                "time": time_ago(event['ts']),
+                "details": event['details'],
+                "timestamp": event['ts']
             }
+            for event in events
         ]
         
-        return jsonify(activities)
+        if not paged:
+            return jsonify(activities)
+        return jsonify({"activities": activities, "nextCursor": None if cursor is None else str(cursor)})
         
     except Exception as e:
-        print(f"❌ Error getting activities: {e}")
+        log.error("❌ Error getting activities: %s", e)
         return jsonify([])
 
 # Alert Management Endpoints
+
+# GET /api/alerts query parameters that filter on an alert field of the same name
+ALERT_FILTERS = ("symbol", "status", "alertType")
+ALERTS_PAGE_MAX = int(os.getenv("ALERTS_PAGE_MAX", "1000"))
+
 @app.route('/api/alerts', methods=['GET'])
 def get_alerts():
-    """Get all alerts."""
+    """Get the user's alerts.
+    
+    Optional query parameters: symbol, status, alertType and triggeredSince
+    (ISO timestamp) filter; sort is createdAt (default), symbol or
+    lastTriggered, prefixed with "-" for descending; fields=a,b returns only
+    those fields plus id. With limit or cursor the response is one page,
+    {"alerts": [...], "nextCursor": ...}; otherwise it is the plain array.
+    """
     try:
-        alerts = load_alerts()
-        return jsonify(alerts)
+        query, error = alerts_query(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+        return json_with_etag(lambda: alerts_page(g.user_id, query), store.alerts_version(g.user_id))
     except Exception as e:
-        print(f"❌ Error getting alerts: {e}")
+        log.error("❌ Error getting alerts: %s", e)
         return jsonify({"error": "Failed to load alerts"}), 500
 
+def alerts_query(args):
+    """Parse GET /api/alerts parameters; returns (query, None) or (None, error message)."""
+    sort = args.get('sort', 'createdAt')
+    if sort.lstrip('-') not in ALERT_SORTS:
+        return None, f"sort must be one of: {', '.join(ALERT_SORTS)} (prefix '-' for descending)"
+    query = {
+        "filters": {name: args[name] for name in ALERT_FILTERS if name in args},
+        "triggered_since": args.get('triggeredSince'),
+        "sort": sort,
+        "limit": None,
+        "after": None,
+        "fields": [field for field in args.get('fields', '').split(',') if field] or None,
+        "paged": 'limit' in args or 'cursor' in args
+    }
+    if query["triggered_since"] is not None:
+        try:
+            since = datetime.fromisoformat(query["triggered_since"])
+        except ValueError:
+            return None, "triggeredSince must be an ISO 8601 date or datetime"
+        # lastTriggered is stored as naive local time, and compared as a string
+        if since.tzinfo is not None:
+            since = since.astimezone().replace(tzinfo=None)
+        query["triggered_since"] = since.isoformat()
+    if query["paged"]:
+        try:
+            query["limit"] = int(args.get('limit', ALERTS_PAGE_MAX))
+        except ValueError:
+            return None, "limit must be an integer"
+        if not 1 <= query["limit"] <= ALERTS_PAGE_MAX:
+            return None, f"limit must be between 1 and {ALERTS_PAGE_MAX}"
+    if 'cursor' in args:
+        try:
+            cursor_sort, value, position = json.loads(base64.urlsafe_b64decode(args['cursor']))
+        except (ValueError, TypeError):
+            return None, "Invalid cursor"
+        if cursor_sort != sort:
+            return None, "cursor was issued for a different sort"
+        # The key is bound into SQL and compared in Python, so only accept what alerts_page issues:
+        # a rowid/position for createdAt, the sorted field's string (or null) otherwise
+        by_position = ALERT_SORTS[sort.lstrip('-')] is None
+        if not is_row_number(position) or not (is_row_number(value) if by_position else value is None or isinstance(value, str)):
+            return None, "Invalid cursor"
+        query["after"] = (value, position)
+    return query, None
+
+def is_row_number(value):
+    """Whether value is an int that fits a SQLite INTEGER (bools are ints to Python, not here)."""
+    return isinstance(value, int) and not isinstance(value, bool) and -2**63 <= value < 2**63
+
+def alerts_page(user_id, query):
+    """Body of GET /api/alerts for a parsed query."""
+    alerts, after = store.query_alerts(
+        user_id, query["filters"], query["triggered_since"], query["sort"], query["limit"], query["after"]
+    )
+    if query["fields"]:
+        fields = ['id', *query["fields"]]
+        alerts = [{field: alert[field] for field in fields if field in alert} for alert in alerts]
+    if not query["paged"]:
+        return alerts
+    next_cursor = None
+    if after is not None:
+        next_cursor = base64.urlsafe_b64encode(json.dumps([query["sort"], *after]).encode()).decode()
+    return {"alerts": alerts, "nextCursor": next_cursor}
+
 @app.route('/api/alerts', methods=['POST'])
 def create_alert():
     """Create a new alert."""
     try:
         data = request.get_json()
         
-        # Validate required fields
-        if not data.get('symbol') or not data.get('alertType'):
-            return jsonify({"error": "Missing required fields: symbol, alertType"}), 400
-        
-        # Create new alert
-        new_alert = {
-            "id": str(uuid.uuid4()),
-            "symbol": data['symbol'],
-            "companyName": data.get('companyName', data['symbol']),
-            "alertType": data['alertType'],
-            "threshold": data.get('threshold'),
-            "percentage": data.get('percentage'),
-            "status": "active",
-            "createdAt": datetime.now().isoformat(),
-            "emailNotifications": data.get('emailNotifications', True),
-            "inAppNotifications": data.get('inAppNotifications', True),
-            "lastTriggered": None,
-            "triggeredPrice": None,
-            "triggeredChange": None
-        }
+        new_alert, error = build_alert(data, g.user_id)
+        if error:
+            return jsonify({"error": error}), 400
         
-        # Load existing alerts and add new one
-        alerts = load_alerts()
-        alerts.append(new_alert)
-        save_alerts(alerts)
+        _, change = store.insert_alert(g.user_id, new_alert)
+        alerts_changed(g.user_id, change, [new_alert])
+        record_activity(g.user_id, "info", f"{new_alert['symbol']} alert set", alert_condition(new_alert))
         
-        print(f"✅ Created alert for {new_alert['symbol']}")
+        log.info("✅ Created alert for %s", new_alert['symbol'])
         return jsonify(new_alert), 201
         
     except Exception as e:
-        print(f"❌ Error creating alert: {e}")
+        log.error("❌ Error creating alert: %s", e)
         return jsonify({"error": "Failed to create alert"}), 500
 
+def alert_condition(alert):
+    """Short description of what an alert watches for, e.g. "price-above 185.5"."""
+    value = alert.get('threshold') if alert.get('threshold') is not None else alert.get('percentage')
+    return alert['alertType'] if value is None else f"{alert['alertType']} {value}"
+
+# JSON types of the alert fields clients send; numeric fields may also be null
+ALERT_STRING_FIELDS = ('symbol', 'alertType', 'companyName', 'status')
+ALERT_BOOLEAN_FIELDS = ('emailNotifications', 'inAppNotifications')
+ALERT_NUMBER_FIELDS = ('threshold', 'percentage', *INDICATOR_FIELDS)
+
+def alert_type_error(fields):
+    """Error message for the first field with the wrong JSON type, or None.
+    
+    Checked before anything is written, so a bad value is a 400 for its own
+    item rather than a storage error for the whole write.
+    """
+    for field in ALERT_STRING_FIELDS:
+        if fields.get(field) is not None and not isinstance(fields[field], str):
+            return f"{field} must be a string"
+    for field in ALERT_BOOLEAN_FIELDS:
+        if fields.get(field) is not None and not isinstance(fields[field], bool):
+            return f"{field} must be true or false"
+    for field in ALERT_NUMBER_FIELDS:
+        value = fields.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)):
+            return f"{field} must be a number or null"
+    return None
+
+def build_alert(data, user_id):
+    """Validate a create payload; returns (alert, None) or (None, error message)."""
+    # Validate required fields
+    if not isinstance(data, dict) or not data.get('symbol') or not data.get('alertType'):
+        return None, "Missing required fields: symbol, alertType"
+    error = alert_type_error(data)
+    if error:
+        return None, error
+    if data['alertType'] in INDICATOR_TYPES:
+        error = validate_indicator_alert(data)
+        if error:
+            return None, error
+    
+    # Create new alert
+    new_alert = {
+        "id": str(uuid.uuid4()),
+        "userId": user_id,
+        "symbol": data['symbol'],
+        "companyName": data.get('companyName') or data['symbol'],
+        "alertType": data['alertType'],
+        "threshold": data.get('threshold'),
+        "percentage": data.get('percentage'),
+        "status": "active",
+        "createdAt": datetime.now().isoformat(),
+        "emailNotifications": data.get('emailNotifications', True),
+        "inAppNotifications": data.get('inAppNotifications', True),
+        "lastTriggered": None,
+        "triggeredPrice": None,
+        "triggeredChange": None
+    }
+    new_alert.update({field: data[field] for field in INDICATOR_FIELDS if data.get(field) is not None})
+    return new_alert, None
+
+# Fields a client may change on an existing alert
+ALERT_UPDATE_FIELDS = ['threshold', 'percentage', 'status', 'emailNotifications', 'inAppNotifications', *INDICATOR_FIELDS]
+
+def update_error(existing, fields):
+    """Validation error for applying fields to existing, or None."""
+    error = alert_type_error(fields)
+    if error:
+        return error
+    if existing['alertType'] in INDICATOR_TYPES:
+        return validate_indicator_alert(dict(existing, **fields))
+    return None
+
 @app.route('/api/alerts/<alert_id>', methods=['PUT'])
 def update_alert(alert_id):
     """Update an existing alert."""
     try:
-        data = request.get_json()
-        alerts = load_alerts()
-        
-        # Find and update alert
-        for alert in alerts:
-            if alert['id'] == alert_id:
-                # Update allowed fields
-                allowed_fields = ['threshold', 'percentage', 'status', 'emailNotifications', 'inAppNotifications']
-                for field in allowed_fields:
-                    if field in data:
-                        alert[field] = data[field]
-                
-                save_alerts(alerts)
-                print(f"✅ Updated alert {alert_id}")
-                return jsonify(alert)
-        
-        return jsonify({"error": "Alert not found"}), 404
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid alert update"}), 400
+        
+        # Update allowed fields
+        fields = {field: data[field] for field in ALERT_UPDATE_FIELDS if field in data}
+        
+        existing = store.get_alert(g.user_id, alert_id)
+        if existing is None:
+            return jsonify({"error": "Alert not found"}), 404
+        error = update_error(existing, fields)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        alert, change = store.update_alert(g.user_id, alert_id, fields)
+        if alert is None:
+            return jsonify({"error": "Alert not found"}), 404
+        alerts_changed(g.user_id, change, [alert])
+        record_activity(g.user_id, "info", f"{alert['symbol']} alert updated", f"Changed {', '.join(fields) or 'nothing'}")
+        
+        log.info("✅ Updated alert %s", alert_id)
+        return jsonify(alert)
         
     except Exception as e:
-        print(f"❌ Error updating alert: {e}")
+        log.error("❌ Error updating alert: %s", e)
         return jsonify({"error": "Failed to update alert"}), 500
 
 @app.route('/api/alerts/<alert_id>', methods=['DELETE'])
 def delete_alert(alert_id):
     """Delete an alert."""
     try:
-        alerts = load_alerts()
-        
-        # Find and remove alert
-        for i, alert in enumerate(alerts):
-            if alert['id'] == alert_id:
-                deleted_alert = alerts.pop(i)
-                save_alerts(alerts)
-                print(f"✅ Deleted alert {alert_id}")
-                return jsonify({"message": "Alert deleted successfully"})
+        existing = store.get_alert(g.user_id, alert_id)
+        if existing is None:
+            return jsonify({"error": "Alert not found"}), 404
+        deleted, change = store.delete_alert(g.user_id, alert_id)
+        if not deleted:
+            return jsonify({"error": "Alert not found"}), 404
+        alerts_changed(g.user_id, change, removed=[alert_id])
+        record_activity(g.user_id, "warning", f"{existing['symbol']} alert deleted", alert_condition(existing))
         
-        return jsonify({"error": "Alert not found"}), 404
+        log.info("✅ Deleted alert %s", alert_id)
+        return jsonify({"message": "Alert deleted successfully"})
         
     except Exception as e:
-        print(f"❌ Error deleting alert: {e}")
+        log.error("❌ Error deleting alert: %s", e)
         return jsonify({"error": "Failed to delete alert"}), 500
 
-@app.route('/api/alerts/process', methods=['POST'])
-def process_alerts():
-    """Process all active alerts."""
+# Bulk alert writes: items per JSON request, and alerts per transaction for NDJSON imports
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = 100
+
+@app.route('/api/alerts/bulk', methods=['POST'])
+def bulk_alerts():
+    """Create, update and delete many alerts in one transaction.
+    
+    Body: {"create": [alert, ...], "update": [{"id": ..., field: value}, ...],
+    "delete": [id, ...]}. Every item is validated first; if any is invalid
+    nothing is written and the errors are returned with status 400.
+    Otherwise the response has one result per item, in request order.
+    """
     try:
-        alerts = load_alerts()
-        active_alerts = [alert for alert in alerts if alert['status'] == 'active']
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid bulk request"}), 400
+        creates = data.get('create') or []
+        updates = data.get('update') or []
+        deletes = data.get('delete') or []
+        if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+            return jsonify({"error": "create, update and delete must be arrays"}), 400
+        if len(creates) + len(updates) + len(deletes) > BULK_MAX_ITEMS:
+            return jsonify({"error": f"At most {BULK_MAX_ITEMS} items per request; use /api/alerts/import"}), 413
+        
+        errors = []
+        new_alerts = []
+        for i, item in enumerate(creates):
+            new_alert, error = build_alert(item, g.user_id)
+            if error:
+                errors.append({"op": "create", "index": i, "error": error})
+            new_alerts.append(new_alert)
+        
+        changes = {}
+        existing = {alert['id']: alert for alert in store.list_alerts(g.user_id)} if updates else {}
+        for i, item in enumerate(updates):
+            if not isinstance(item, dict) or not item.get('id'):
+                errors.append({"op": "update", "index": i, "error": "Missing required field: id"})
+                continue
+            if not isinstance(item['id'], str):
+                errors.append({"op": "update", "index": i, "error": "Alert ids must be strings"})
+                continue
+            fields = {field: item[field] for field in ALERT_UPDATE_FIELDS if field in item}
+            fields = changes[item['id']] = dict(changes.get(item['id'], {}), **fields)
+            error = update_error(existing[item['id']], fields) if item['id'] in existing else alert_type_error(fields)
+            if error:
+                errors.append({"op": "update", "index": i, "error": error})
         
-        results = []
-        for alert in active_alerts:
-            result = process_alert(alert)
-            results.append({
-                "alertId": alert['id'],
-                "symbol": alert['symbol'],
-                "result": result
-            })
+        for i, alert_id in enumerate(deletes):
+            if not isinstance(alert_id, str):
+                errors.append({"op": "delete", "index": i, "error": "Alert ids must be strings"})
         
-        # Save updated alerts
-        save_alerts(alerts)
+        if errors:
+            return jsonify({"error": "Validation failed, nothing was written", "errors": errors}), 400
         
+        inserted, updated, deleted, change = store.write_alerts(g.user_id, new_alerts, changes, deletes)
+        alerts_changed(g.user_id, change, inserted + list(updated.values()), deleted)
+        if inserted or updated or deleted:
+            record_activity(
+                g.user_id, "info", "Alerts changed in bulk",
+                f"{len(inserted)} created, {len(updated)} updated, {len(deleted)} deleted"
+            )
+        
+        not_found = {"status": 404, "error": "Alert not found"}
+        log.info("✅ Bulk alerts: %d created, %d updated, %d deleted", len(inserted), len(updated), len(deleted))
         return jsonify({
-            "message": f"Processed {len(active_alerts)} alerts",
-            "results": results
+            "create": [{"status": 201, "alert": alert} for alert in inserted],
+            "update": [
+                {"id": item['id'], "status": 200, "alert": updated[item['id']]} if item['id'] in updated
+                else dict(not_found, id=item['id'])
+                for item in updates
+            ],
+            "delete": [
+                {"id": alert_id, "status": 200} if alert_id in deleted else dict(not_found, id=alert_id)
+                for alert_id in deletes
+            ]
         })
         
     except Exception as e:
-        print(f"❌ Error processing alerts: {e}")
+        log.error("❌ Error in bulk alert request: %s", e)
+        return jsonify({"error": "Failed to apply bulk alert changes"}), 500
+
+@app.route('/api/alerts/import', methods=['POST'])
+def import_alerts():
+    """Create alerts from an NDJSON body (one create payload per line).
+    
+    The body is read as a stream and committed every IMPORT_BATCH_SIZE
+    alerts, so imports of any size run in bounded memory. Invalid lines are
+    skipped and reported by line number (the first IMPORT_MAX_ERRORS of them).
+    """
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    
+    def flush():
+        inserted, _, _, change = store.write_alerts(g.user_id, batch)
+        alerts_changed(g.user_id, change, inserted)
+        batch.clear()
+        return len(inserted)
+    
+    try:
+        for line_number, line in enumerate(request.stream, 1):
+            if not line.strip():
+                continue
+            try:
+                new_alert, error = build_alert(json.loads(line), g.user_id)
+            except ValueError:
+                new_alert, error = None, "Invalid JSON"
+            if error:
+                failed += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_number, "error": error})
+                continue
+            batch.append(new_alert)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += flush()
+        if batch:
+            imported += flush()
+        
+        log.info("✅ Imported %d alerts (%d rejected)", imported, failed)
+        record_activity(g.user_id, "warning" if failed else "info", f"Imported {imported} alerts", f"{failed} lines rejected")
+        return jsonify({"imported": imported, "failed": failed, "errors": errors})
+        
+    except Exception as e:
+        log.error("❌ Error importing alerts: %s", e)
+        return jsonify({"error": "Failed to import alerts", "imported": imported}), 500
+
+alert_cycle_lock = threading.Lock()
+
+def evaluate_active_alerts(blocking=True):
+    """Evaluate every user's active alerts, fetching each distinct symbol only once.
+    
+    Alerts from all users are grouped by symbol, so a symbol watched by
+    thousands of users costs one quote fetch. All symbols are fetched concurrently at
+    background priority, and each group is evaluated against the shared
+    metrics. Triggered alerts are saved in one batch. Cycles are serialized so a
+    manual run and a scheduled one never evaluate the same alerts twice; with
+    blocking=False, returns None instead of waiting for a cycle in progress.
+    """
+    if not alert_cycle_lock.acquire(blocking=blocking):
+        return None
+    try:
+        return _evaluate_active_alerts()
+    finally:
+        alert_cycle_lock.release()
+
+def _evaluate_active_alerts():
+    started = time.perf_counter()
+    active_alerts = store.list_alerts(None, status='active')
+    
+    symbols = list(dict.fromkeys(alert['symbol'] for alert in active_alerts))
+    
+    fetch_started = time.perf_counter()
+    all_stock_data = get_stock_data_many(symbols, priority=BACKGROUND)
+    fetch_ms = (time.perf_counter() - fetch_started) * 1000
+    
+    # Compute metrics once per symbol and find crossed thresholds by binary search
+    alert_index.sync(active_alerts)
+    metrics_by_symbol = {}
+    crossed = set()
+    for symbol, stock_data in all_stock_data.items():
+        if "error" not in stock_data and "mock" not in stock_data:
+            metrics = metrics_by_symbol[symbol] = get_stock_metrics(stock_data)
+            crossed.update(alert_index.match(symbol, metrics["current_price"], metrics["change_percent"]))
+    
+    # Advance indicator state once per symbol, bounding the history refreshes as a whole
+    history_expires = time.monotonic() + HISTORY_FETCH_DEADLINE
+    for symbol in dict.fromkeys(alert['symbol'] for alert in active_alerts if alert['alertType'] in INDICATOR_TYPES):
+        if symbol in metrics_by_symbol:
+            observe_indicators(symbol, metrics_by_symbol[symbol], history_expires)
+    
+    results = []
+    triggered = {}  # user_id -> {alert_id: fields}
+    for alert in active_alerts:
+        symbol = alert['symbol']
+        metrics = metrics_by_symbol.get(symbol)
+        if metrics is not None and alert['id'] in alert_index and alert['id'] not in crossed:
+            result = {"status": "monitoring", "message": f"Monitoring {symbol}: {metrics['change_percent']:.2f}% change"}
+        else:
+            result = process_alert(alert, all_stock_data[symbol], metrics)
+        results.append({
+            "alertId": alert['id'],
+            "symbol": symbol,
+            "result": result
+        })
+        if result["status"] == "triggered":
+            triggered.setdefault(alert_owner(alert), {})[alert['id']] = {
+                field: alert[field] for field in ('status', 'lastTriggered', 'triggeredPrice', 'triggeredChange')
+            }
+    
+    # Save triggered alerts in one batch per user; being no longer active drops them from the index
+    for user_id, updates in triggered.items():
+        updated, change = store.update_alerts(user_id, updates)
+        alerts_changed(user_id, change, updated.values())
+    
+    return {
+        "message": f"Processed {len(active_alerts)} alerts",
+        "results": results,
+        "stats": {
+            "alerts": len(active_alerts),
+            "users": len({alert_owner(alert) for alert in active_alerts}),
+            "symbols": len(symbols),
+            "triggered": sum(len(updates) for updates in triggered.values()),
+            "upstreamFetchesSaved": len(active_alerts) - len(symbols),
+            "fetchMs": round(fetch_ms, 2),
+            "totalMs": round((time.perf_counter() - started) * 1000, 2)
+        }
+    }
+
+@app.route('/api/alerts/process', methods=['POST'])
+def process_alerts():
+    """Process all active alerts, unless a cycle is already running."""
+    try:
+        # Don't hold a request thread for the length of a scheduled cycle
+        result = evaluate_active_alerts(blocking=False)
+        if result is None:
+            return jsonify({"error": "Alert cycle already running"}), 409
+        return jsonify(result)
+    except Exception as e:
+        log.error("❌ Error processing alerts: %s", e)
         return jsonify({"error": "Failed to process alerts"}), 500
 
+@app.route('/api/alerts/scheduler', methods=['GET'])
+def get_alert_scheduler_status():
+    """Get background alert scheduler status."""
+    return jsonify(dict(alert_scheduler.status(), enabled=ALERT_SCHEDULER_ENABLED))
+
 @app.route('/api/portfolio', methods=['GET'])
 def get_portfolio():
     """Get user portfolio holdings."""
     try:
-        portfolio = load_portfolio()
-        return jsonify(portfolio)
+        return json_with_etag(
+            lambda: store.load_portfolio(g.user_id, g.portfolio_id),
+            store.portfolio_version(g.user_id, g.portfolio_id)
+        )
     except Exception as e:
-        print(f"❌ Error getting portfolio: {e}")
+        log.error("❌ Error getting portfolio: %s", e)
         return jsonify({"holdings": []})
 
 @app.route('/api/portfolio', methods=['POST'])
@@ -790,13 +1480,32 @@ def update_portfolio():
             if not all(key in holding for key in ['symbol', 'shares', 'purchasePrice']):
                 return jsonify({"error": "Invalid holding data"}), 400
         
-        save_portfolio(data)
+        save_portfolio(g.user_id, data, g.portfolio_id)
+        count = len(data['holdings'])
+        details = f"{count} holding{'s' if count != 1 else ''}"
+        if g.portfolio_id != DEFAULT_PORTFOLIO_ID:
+            details += f" in {g.portfolio_id}"
+        record_activity(g.user_id, "info", "Portfolio updated", details)
         return jsonify({"message": "Portfolio updated successfully"}), 200
         
     except Exception as e:
-        print(f"❌ Error updating portfolio: {e}")
+        log.error("❌ Error updating portfolio: %s", e)
         return jsonify({"error": "Failed to update portfolio"}), 500
 
+@app.route('/api/portfolios', methods=['GET'])
+def get_portfolios():
+    """List the ids of the user's portfolios."""
+    try:
+        return jsonify(store.list_portfolios(g.user_id))
+    except Exception as e:
+        log.error("❌ Error listing portfolios: %s", e)
+        return jsonify([])
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, upstream and storage timings in Prometheus text format."""
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -807,8 +1516,38 @@ def health_check():
         "message": "API is running",
         "finnhub_api_key": finnhub_status,
         "news_api_key": news_status,
-        "mock_data_enabled": USE_MOCK_DATA
+        "mock_data_enabled": USE_MOCK_DATA,
+        "quote_cache": quote_cache.stats(),
+        "stock_swr": stock_swr.stats(),
+        "alert_stats": alert_stats.stats(),
+        "activity_log": activity_log.stats(),
+        "upstream": upstream_stats(),
+        "price_stream": price_hub.stats()
     })
 
+def snapshot_stock_records(symbols):
+    """Current stock records used to seed the price stream for new symbols."""
+    all_stock_data = get_stock_data_many(symbols)
+    return {symbol: build_stock_record(symbol, all_stock_data[symbol]) for symbol in symbols}
+
+price_feed = None
+if PRICE_STREAM_SOURCE == "finnhub":
+    try:
+        price_feed = FinnhubTradeFeed(FINNHUB_API_KEY)
+    except RuntimeError as e:
+        log.warning("❌ %s; falling back to the mock price stream", e)
+if price_feed is None:
+    price_feed = MockTradeFeed(generate_mock_stock_data, interval=PRICE_STREAM_MOCK_INTERVAL, seed=PRICE_STREAM_MOCK_SEED)
+price_hub = PriceHub(price_feed, snapshot_stock_records)
+
+alert_scheduler = AlertScheduler(
+    evaluate_active_alerts,
+    interval=ALERT_SCHEDULER_INTERVAL,
+    market_hours_only=ALERT_SCHEDULER_MARKET_HOURS_ONLY,
+    lock_file=ALERT_SCHEDULER_LOCK_FILE
+)
+if ALERT_SCHEDULER_ENABLED:
+    alert_scheduler.start()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
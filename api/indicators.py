@@ -0,0 +1,337 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+from timeseries import percent_change
+
+# Alert types evaluated from indicator state instead of a single threshold
+CROSS_TYPES = ("sma-cross-above", "sma-cross-below", "ema-cross-above", "ema-cross-below")
+RSI_TYPES = ("rsi-above", "rsi-below")
+INDICATOR_TYPES = CROSS_TYPES + RSI_TYPES + ("volatility-breakout", "volume-spike")
+
+# Optional alert fields that configure indicator alerts
+INDICATOR_FIELDS = ("fastPeriod", "slowPeriod", "period", "sigma", "multiplier")
+
+DEFAULTS = {
+    "fastPeriod": 50,
+    "slowPeriod": 200,
+    "rsiPeriod": 14,
+    "period": 20,
+    "sigma": 2.0,
+    "multiplier": 2.0,
+}
+
+# Committed daily values kept per symbol for warming up newly requested indicators
+MAX_LOOKBACK = 500
+
+
+class SMA:
+    """Simple moving average over the last n values, from a running sum."""
+
+    def __init__(self, n):
+        self.n = n
+        self._window = deque()
+        self._sum = 0.0
+
+    def push(self, x):
+        self._window.append(x)
+        self._sum += x
+        if len(self._window) > self.n:
+            self._sum -= self._window.popleft()
+
+    def current(self):
+        return self._sum / self.n if len(self._window) == self.n else None
+
+    def peek(self, x):
+        """The average if x were pushed next, without pushing it."""
+        if len(self._window) + 1 < self.n:
+            return None
+        dropped = self._window[0] if len(self._window) == self.n else 0.0
+        return (self._sum + x - dropped) / self.n
+
+
+class EMA:
+    """Exponential moving average with smoothing 2 / (n + 1), ready after n values."""
+
+    def __init__(self, n):
+        self.n = n
+        self.alpha = 2.0 / (n + 1)
+        self._value = None
+        self._count = 0
+
+    def push(self, x):
+        self._value = x if self._value is None else self._value + self.alpha * (x - self._value)
+        self._count += 1
+
+    def current(self):
+        return self._value if self._count >= self.n else None
+
+    def peek(self, x):
+        if self._count + 1 < self.n:
+            return None
+        return x if self._value is None else self._value + self.alpha * (x - self._value)
+
+
+class RSI:
+    """Wilder's relative strength index over n close-to-close changes."""
+
+    def __init__(self, n):
+        self.n = n
+        self._last = None
+        self._count = 0
+        self._gain = 0.0
+        self._loss = 0.0
+
+    def push(self, x):
+        if self._last is not None:
+            self._count, self._gain, self._loss = self._advance(x)
+        self._last = x
+
+    def peek(self, x):
+        if self._last is None:
+            return None
+        count, gain, loss = self._advance(x)
+        if count < self.n:
+            return None
+        return 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def _advance(self, x):
+        change = x - self._last
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        count = self._count + 1
+        if count <= self.n:
+            # Seed with the simple average of the first n changes
+            return count, self._gain + (gain - self._gain) / count, self._loss + (loss - self._loss) / count
+        return count, (self._gain * (self.n - 1) + gain) / self.n, (self._loss * (self.n - 1) + loss) / self.n
+
+
+class ReturnVolatility:
+    """Standard deviation of the last n daily percentage returns, from running sums."""
+
+    def __init__(self, n):
+        self.n = n
+        self._last = None
+        self._returns = deque()
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    def push(self, x):
+        if self._last is not None:
+            r = percent_change(x, self._last)
+            self._returns.append(r)
+            self._sum += r
+            self._sumsq += r * r
+            if len(self._returns) > self.n:
+                old = self._returns.popleft()
+                self._sum -= old
+                self._sumsq -= old * old
+        self._last = x
+
+    def peek(self, x):
+        """(return of x versus the last close, volatility of the window), or None."""
+        if self._last is None or len(self._returns) < self.n:
+            return None
+        mean = self._sum / self.n
+        variance = max(self._sumsq / self.n - mean * mean, 0.0)
+        return percent_change(x, self._last), variance ** 0.5
+
+
+class SymbolIndicators:
+    """Indicator state for one symbol, advanced one trading day at a time.
+
+    Closed days are pushed into every indicator once, from the stored daily
+    bars where they have arrived. Intraday observations only replace today's
+    provisional close and volume; checks peek at what the indicators would
+    read with that value, so each tick is O(1).
+    """
+
+    def __init__(self):
+        self.closes = deque(maxlen=MAX_LOOKBACK)
+        self.volumes = deque(maxlen=MAX_LOOKBACK)
+        self.committed_date = None
+        self.date = None
+        self.price = None
+        self.volume = None
+        self._close_indicators = {}
+        self._volume_indicators = {}
+
+    def seed(self, bars, before):
+        """Commit stored daily bars dated after the last committed day and before the given day."""
+        if self.committed_date is not None:
+            bars = bars[bars["date"] > self.committed_date]
+        for bar in bars[bars["date"] < before]:
+            self.commit(bar["date"], float(bar["close"]), float(bar["volume"]))
+
+    def commit(self, date, close, volume=None):
+        self.closes.append(close)
+        for indicator in self._close_indicators.values():
+            indicator.push(close)
+        if volume is not None:
+            self.volumes.append(volume)
+            for indicator in self._volume_indicators.values():
+                indicator.push(volume)
+        self.committed_date = date
+
+    def rolls_over(self, date):
+        """Whether an observation on date closes the day observed last."""
+        return self.date is not None and date > self.date
+
+    def observe(self, date, price, volume, bars=None):
+        """Take an observation; bars (the stored daily bars) close the previous day on rollover."""
+        if self.rolls_over(date):
+            if bars is not None:
+                self.seed(bars, date)
+            # Without a stored bar, the last observation of a weekday session stands
+            # in for its close; its volume is only provisional, so none is recorded
+            if (self.committed_date is None or self.date > self.committed_date) and np.is_busday(self.date):
+                self.commit(self.date, self.price)
+        self.date, self.price, self.volume = date, price, volume
+
+    def close_indicator(self, cls, n):
+        return self._indicator(self._close_indicators, self.closes, cls, n)
+
+    def volume_average(self, n):
+        return self._indicator(self._volume_indicators, self.volumes, SMA, n)
+
+    def _indicator(self, indicators, values, cls, n):
+        key = (cls, n)
+        indicator = indicators.get(key)
+        if indicator is None:
+            # First use: warm up from the retained history, then stay incremental
+            indicator = indicators[key] = cls(n)
+            for value in values:
+                indicator.push(value)
+        return indicator
+
+
+class IndicatorBook:
+    """Indicator state per symbol, shared by every alert on that symbol.
+
+    seed(symbol) returns stored daily bars. They warm up a symbol the first
+    time it is observed and close each day as the next one starts; seed may
+    fetch from upstream, so it is never called under the book's lock.
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self._symbols = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def observe(self, symbol, date, price, volume=None, previous_close=None):
+        date = np.datetime64(date, "D")
+        with self._lock:
+            state = self._symbols.get(symbol)
+            rollover = state is not None and state.rolls_over(date)
+        if state is None:
+            state = SymbolIndicators()
+            if self.seed is not None:
+                state.seed(self.seed(symbol), date)
+            if not state.closes and previous_close:
+                # No stored history: at least start from the previous session's close
+                state.commit(np.busday_offset(date, -1, roll="forward"), previous_close)
+            with self._lock:
+                # Another thread may have seeded the symbol meanwhile; keep the first
+                state = self._symbols.setdefault(symbol, state)
+                state.observe(date, price, volume)
+            return
+        bars = self.seed(symbol) if rollover and self.seed is not None else None
+        with self._lock:
+            state.observe(date, price, volume, bars)
+
+    def check(self, alert):
+        """Return (triggered, message) for an indicator alert on an observed symbol."""
+        with self._lock:
+            state = self._symbols.get(alert["symbol"])
+            if state is None or state.price is None:
+                return False, "No observations yet"
+            return _CHECKS[alert["alertType"]](state, alert)
+
+
+def validate_indicator_alert(alert):
+    """Return an error message for bad indicator parameters, else None."""
+    alert_type = alert["alertType"]
+    try:
+        if alert_type in CROSS_TYPES:
+            fast, slow = _param(alert, "fastPeriod", int), _param(alert, "slowPeriod", int)
+            if not 1 <= fast < slow <= MAX_LOOKBACK:
+                return f"fastPeriod and slowPeriod must satisfy 1 <= fastPeriod < slowPeriod <= {MAX_LOOKBACK}"
+        elif alert_type in RSI_TYPES:
+            if alert.get("threshold") is None or not 0 <= float(alert["threshold"]) <= 100:
+                return "RSI alerts need a threshold between 0 and 100"
+            period = _param(alert, "period", int, DEFAULTS["rsiPeriod"])
+            if not 1 <= period <= MAX_LOOKBACK:
+                return f"period must be between 1 and {MAX_LOOKBACK}"
+        else:
+            period = _param(alert, "period", int)
+            if not 2 <= period <= MAX_LOOKBACK:
+                return f"period must be between 2 and {MAX_LOOKBACK}"
+            field = "sigma" if alert_type == "volatility-breakout" else "multiplier"
+            if _param(alert, field, float) <= 0:
+                return f"{field} must be positive"
+    except (TypeError, ValueError):
+        return "Indicator parameters must be numbers"
+    return None
+
+
+def _param(alert, field, cast, default=None):
+    value = alert.get(field)
+    return cast(DEFAULTS[field] if default is None else default) if value is None else cast(value)
+
+
+def _check_cross(state, alert):
+    kind, _, direction = alert["alertType"].split("-")
+    cls = SMA if kind == "sma" else EMA
+    fast_n, slow_n = _param(alert, "fastPeriod", int), _param(alert, "slowPeriod", int)
+    fast, slow = state.close_indicator(cls, fast_n), state.close_indicator(cls, slow_n)
+    before = (fast.current(), slow.current())
+    now = (fast.peek(state.price), slow.peek(state.price))
+    if None in before or None in now:
+        return False, f"Not enough history for {kind.upper()}({slow_n})"
+    was, spread = before[0] - before[1], now[0] - now[1]
+    crossed = was <= 0 < spread if direction == "above" else was >= 0 > spread
+    label = f"{kind.upper()}({fast_n}) crossed {direction} {kind.upper()}({slow_n})"
+    return crossed, label if crossed else f"{kind.upper()}({fast_n}) {now[0]:.2f} vs {kind.upper()}({slow_n}) {now[1]:.2f}"
+
+
+def _check_rsi(state, alert):
+    period = _param(alert, "period", int, DEFAULTS["rsiPeriod"])
+    threshold = float(alert["threshold"])
+    value = state.close_indicator(RSI, period).peek(state.price)
+    if value is None:
+        return False, f"Not enough history for RSI({period})"
+    crossed = value >= threshold if alert["alertType"] == "rsi-above" else value <= threshold
+    return crossed, f"RSI({period}) at {value:.1f} (threshold: {threshold})"
+
+
+def _check_volatility(state, alert):
+    period, sigma = _param(alert, "period", int), _param(alert, "sigma", float)
+    reading = state.close_indicator(ReturnVolatility, period).peek(state.price)
+    if reading is None:
+        return False, f"Not enough history for {period}-day volatility"
+    move, volatility = reading
+    crossed = volatility > 0 and abs(move) >= sigma * volatility
+    deviations = abs(move) / volatility if volatility > 0 else 0.0
+    return crossed, f"Moved {move:+.2f}% ({deviations:.1f} sigma vs {period}-day volatility, threshold: {sigma})"
+
+
+def _check_volume(state, alert):
+    period, multiplier = _param(alert, "period", int), _param(alert, "multiplier", float)
+    if state.volume is None:
+        return False, "No volume for today's session yet"
+    average = state.volume_average(period).current()
+    if not average:
+        return False, f"Not enough history for {period}-day average volume"
+    ratio = state.volume / average
+    return ratio >= multiplier, f"Volume {ratio:.1f}x its {period}-day average (threshold: {multiplier}x)"
+
+
+_CHECKS = {
+    **{alert_type: _check_cross for alert_type in CROSS_TYPES},
+    **{alert_type: _check_rsi for alert_type in RSI_TYPES},
+    "volatility-breakout": _check_volatility,
+    "volume-spike": _check_volume,
+}
@@ -0,0 +1,171 @@
+"""In-process counters and latency histograms, exposed in Prometheus text format.
+
+Routes, upstream calls and storage operations record into the module-level
+metrics below; render() produces the body served at /metrics. Values are
+per process, so with several gunicorn workers each scrape sees one worker.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a warm cache hit up to a retried upstream call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+    def _labels(self, key, **extra):
+        return dict(zip(self.labelnames, key), **extra)
+
+
+class Histogram(Counter):
+    """Cumulative-bucket histogram, as Prometheus expects."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in sorted(self._values.items())]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", self._labels(key, le=_format_value(bound)), cumulative
+            yield f"{self.name}_sum", self._labels(key), total
+            yield f"{self.name}_count", self._labels(key), count
+
+
+class Instrumented:
+    """Proxy that times every method call on target into histogram by method name."""
+
+    def __init__(self, target, histogram):
+        self._target = target
+        self._histogram = histogram
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        histogram = self._histogram
+
+        def timed(*args, **kwargs):
+            with histogram.time(operation=name):
+                return attribute(*args, **kwargs)
+        return timed
+
+
+def render():
+    """Return every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{label}="{_escape(label_value)}"' for label, label_value in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _label_key(metric, labels):
+    return tuple(str(labels[name]) for name in metric.labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+http_requests = Counter(
+    "foresight_http_requests_total", "HTTP requests handled, by route and status.",
+    ("method", "route", "status"),
+)
+http_request_duration = Histogram(
+    "foresight_http_request_duration_seconds", "Time spent in route handlers.",
+    ("method", "route"),
+)
+upstream_requests = Counter(
+    "foresight_upstream_requests_total", "Upstream HTTP attempts, by provider, endpoint and status.",
+    ("provider", "endpoint", "status"),
+)
+upstream_request_duration = Histogram(
+    "foresight_upstream_request_duration_seconds", "Latency of each upstream HTTP attempt.",
+    ("provider", "endpoint"),
+)
+upstream_retries = Counter(
+    "foresight_upstream_retries_total", "Upstream attempts retried after an error, 429 or 5xx.",
+    ("provider",),
+)
+storage_operation_duration = Histogram(
+    "foresight_storage_operation_duration_seconds", "Time spent in alert and portfolio storage calls.",
+    ("operation",),
+)
+
+
+def record_request(method, route, status, seconds):
+    http_requests.inc(method=method, route=route, status=status)
+    http_request_duration.observe(seconds, method=method, route=route)
+
+
+def record_upstream(provider, endpoint, status, seconds):
+    upstream_requests.inc(provider=provider, endpoint=endpoint, status=status)
+    upstream_request_duration.observe(seconds, provider=provider, endpoint=endpoint)
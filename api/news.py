@@ -0,0 +1,107 @@
+"""Cached, deduplicated company news from NewsAPI.
+
+Results are cached per (query, page size) for NEWS_CACHE_TTL seconds, and
+only a page slightly larger than the caller needs is downloaded. Syndicated
+copies of a story (same headline up to case, punctuation and a trailing
+" - <source name>" naming the article's own source) are collapsed by
+headline hash.
+"""
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from ttl_cache import TTLCache
+from upstream import REQUEST_ERRORS, newsapi
+
+log = logging.getLogger("foresight.news")
+
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "900"))
+NEWS_CACHE_SIZE = int(os.getenv("NEWS_CACHE_SIZE", "256"))
+NEWS_MAX_WORKERS = int(os.getenv("NEWS_MAX_WORKERS", "8"))
+
+# NewsAPI's largest page; we ask for twice what's needed to leave room for duplicates
+MAX_PAGE_SIZE = 100
+
+news_cache = TTLCache(maxsize=NEWS_CACHE_SIZE, default_ttl=NEWS_CACHE_TTL)
+news_pool = ThreadPoolExecutor(max_workers=NEWS_MAX_WORKERS, thread_name_prefix="news")
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def headline_key(title, source=None):
+    """Hash of a headline normalized for near-duplicate detection.
+
+    A trailing " - source" or " | source" is dropped only when it names the
+    article's own source, so a headline that merely ends in a dash clause
+    still tells distinct stories apart.
+    """
+    normalized = title or ""
+    if source:
+        suffix = re.compile(r"\s+[-|]\s+" + re.escape(source.strip()) + r"\s*$", re.IGNORECASE)
+        normalized = suffix.sub("", normalized)
+    normalized = _NON_WORD.sub(" ", normalized.lower()).strip()
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def dedupe(articles):
+    """Drop malformed and removed articles and repeats of an earlier headline, keeping order."""
+    seen = set()
+    unique = []
+    for article in articles:
+        if not isinstance(article, dict):
+            continue
+        title = article.get("title")
+        if not isinstance(title, str) or not title or title == "[Removed]":
+            continue
+        source = article.get("source")
+        name = source.get("name") if isinstance(source, dict) else None
+        key = headline_key(title, name if isinstance(name, str) else None)
+        if key not in seen:
+            seen.add(key)
+            unique.append(article)
+    return unique
+
+
+def fetch_news(query, page_size, api_key):
+    """Fetches up to page_size articles for query from NewsAPI /everything, deduplicated."""
+    response = newsapi.get("/everything", params={"q": query, "pageSize": page_size, "apiKey": api_key})
+    response.raise_for_status()
+    data = response.json()
+    if "articles" not in data:
+        raise ValueError(f"NewsAPI response did not contain articles: {data}")
+    return dedupe(data["articles"])
+
+
+def get_news(query, num_articles, api_key):
+    """Returns up to num_articles distinct articles for query, or [] on error."""
+    page_size = min(MAX_PAGE_SIZE, max(1, num_articles) * 2)
+    try:
+        articles = news_cache.get_or_load(
+            (query.lower(), page_size), lambda: fetch_news(query, page_size, api_key)
+        )
+    except REQUEST_ERRORS as e:
+        log.error("Error fetching news from NewsAPI: %s", e)
+        return []
+    except ValueError as e:
+        log.error("Error reading NewsAPI response: %s", e)
+        return []
+    return articles[:num_articles]
+
+
+def get_news_many(queries, num_articles, api_key):
+    """get_news for several queries concurrently; returns {query: articles}.
+
+    A query that fails unexpectedly gets [] instead of failing the others.
+    """
+    queries = list(dict.fromkeys(queries))
+    futures = {query: news_pool.submit(get_news, query, num_articles, api_key) for query in queries}
+    results = {}
+    for query, future in futures.items():
+        try:
+            results[query] = future.result()
+        except Exception as e:
+            log.error("Error fetching news for %r: %s", query, e)
+            results[query] = []
+    return results
@@ -0,0 +1,243 @@
+"""Queued email delivery over a small pool of persistent SMTP connections.
+
+Notifier.send() only enqueues. A background worker holds each recipient's
+messages for digest_window seconds and sends them as one digest email, so a
+burst of alerts becomes one message per recipient. Delivery reuses logged-in
+connections from SMTPPool and retries transient failures (disconnects,
+timeouts, 4xx replies) with exponential backoff.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+log = logging.getLogger("foresight.notifications")
+
+# Connections idle longer than this are checked with NOOP before reuse
+IDLE_CHECK_AFTER = 30
+
+
+class SMTPPool:
+    """Up to size logged-in SMTP connections, handed out one caller at a time."""
+
+    def __init__(self, host, port, use_ssl=True, username=None, password=None, size=2, timeout=30):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []  # (connection, last used)
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    @contextmanager
+    def connection(self):
+        """Yield a connected, authenticated SMTP client.
+
+        The client goes back to the pool afterwards, unless the block raised
+        anything other than an SMTP error reply (smtplib resets the session
+        after those); then it is closed rather than reused in an unknown state.
+        """
+        with self._slots:
+            smtp = self._checkout()
+            try:
+                yield smtp
+            except smtplib.SMTPResponseException:
+                self._release(smtp)
+                raise
+            except BaseException:
+                _quietly_close(smtp)
+                raise
+            self._release(smtp)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            _quietly_close(smtp)
+
+    def _release(self, smtp):
+        with self._lock:
+            self._idle.append((smtp, time.monotonic()))
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, last_used = self._idle.pop()
+            if time.monotonic() - last_used < IDLE_CHECK_AFTER:
+                return smtp
+            try:
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            _quietly_close(smtp)
+        return self._connect()
+
+    def _connect(self):
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            smtp.ehlo()
+            if smtp.has_extn("starttls"):
+                smtp.starttls()
+                smtp.ehlo()
+        try:
+            if self.username:
+                smtp.login(self.username, self.password)
+        except BaseException:
+            _quietly_close(smtp)
+            raise
+        with self._lock:
+            self.opened += 1
+        return smtp
+
+
+class Notifier:
+    """Background sender with per-recipient digest batching and retries.
+
+    digest_window is how long the first message for a recipient waits for
+    more; 0 sends every message on its own as soon as the worker sees it.
+    """
+
+    def __init__(self, pool, sender, digest_window=60, max_retries=3, backoff_base=1.0, backoff_max=30):
+        self.pool = pool
+        self.sender = sender
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = queue.Queue()
+        self._delivery = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="smtp")
+        self._outstanding = 0  # messages queued or being delivered
+        self._done = threading.Condition()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats = {"queued": 0, "emails": 0, "digests": 0, "retries": 0, "failed": 0}
+
+    def send(self, recipient, subject, body):
+        """Queue a plain-text email; returns immediately."""
+        self._ensure_worker()
+        with self._done:
+            self._outstanding += 1
+            self._stats["queued"] += 1
+        self._queue.put((recipient, subject, body))
+
+    def flush(self, timeout=None):
+        """Send everything queued now, ignoring digest windows, and wait for delivery.
+
+        Returns False if timeout expired first.
+        """
+        self._queue.put(_FLUSH)
+        with self._done:
+            return self._done.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def stats(self):
+        with self._done:
+            return dict(self._stats, outstanding=self._outstanding, connections_opened=self.pool.opened)
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        pending = {}  # recipient -> (send at, [(subject, body)])
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0, min(due for due, _ in pending.values()) - time.monotonic())
+            flush = False
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _FLUSH:
+                flush = True
+            elif item is not None:
+                recipient, subject, body = item
+                due, messages = pending.setdefault(recipient, (time.monotonic() + self.digest_window, []))
+                messages.append((subject, body))
+
+            now = time.monotonic()
+            for recipient in [r for r, (due, _) in pending.items() if flush or due <= now]:
+                _, messages = pending.pop(recipient)
+                self._delivery.submit(self._deliver, recipient, messages)
+
+    def _deliver(self, recipient, messages):
+        message = self._compose(recipient, messages)
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with self.pool.connection() as smtp:
+                        smtp.send_message(message)
+                except Exception as e:
+                    if not is_transient(e) or attempt == self.max_retries:
+                        log.error("❌ Failed to email %s (%d alerts): %s", recipient, len(messages), e)
+                        self._count("failed", len(messages))
+                        return
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                    log.warning("🔁 Email to %s failed (%s), retrying in %.1fs", recipient, e, delay)
+                    self._count("retries")
+                    time.sleep(delay)
+                else:
+                    self._count("emails")
+                    if len(messages) > 1:
+                        self._count("digests")
+                    log.info("📧 Emailed %s (%d alerts)", recipient, len(messages))
+                    return
+        finally:
+            with self._done:
+                self._outstanding -= len(messages)
+                self._done.notify_all()
+
+    def _compose(self, recipient, messages):
+        if len(messages) == 1:
+            subject, body = messages[0]
+        else:
+            subject = f"{len(messages)} stock alerts"
+            body = "\n\n".join(f"{subject_line}\n{'-' * len(subject_line)}\n{text}" for subject_line, text in messages)
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+    def _count(self, name, amount=1):
+        with self._done:
+            self._stats[name] += amount
+
+
+def is_transient(error):
+    """True for failures worth retrying: lost connections, timeouts and 4xx replies."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # Socket errors and timeouts; other SMTPExceptions (also OSErrors) are permanent
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _quietly_close(smtp):
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        smtp.close()
+
+
+_FLUSH = object()
@@ -0,0 +1,120 @@
+import numpy as np
+
+
+class PortfolioBook:
+    """Portfolio lots held as columnar NumPy arrays.
+
+    Symbols are mapped to dense integer ids in order of first appearance, so
+    lots of the same symbol can be aggregated with ``np.bincount``.
+    """
+
+    def __init__(self, holdings):
+        ids = {}
+        self.symbol_ids = np.fromiter(
+            (ids.setdefault(holding["symbol"], len(ids)) for holding in holdings),
+            dtype=np.int64, count=len(holdings),
+        )
+        self.symbols = list(ids)
+        self.shares = np.fromiter((holding["shares"] for holding in holdings), dtype=np.float64, count=len(holdings))
+        self.purchase_prices = np.fromiter(
+            (holding["purchasePrice"] for holding in holdings), dtype=np.float64, count=len(holdings)
+        )
+
+    def __len__(self):
+        return len(self.shares)
+
+    def value(self, quotes):
+        """Value every position at once.
+
+        quotes maps symbol -> (current_price, day_change_percent) and must
+        cover every symbol in the book.
+        """
+        k = len(self.symbols)
+        prices = np.fromiter((quotes[symbol][0] for symbol in self.symbols), dtype=np.float64, count=k)
+        day_change = np.fromiter((quotes[symbol][1] for symbol in self.symbols), dtype=np.float64, count=k)
+
+        # Aggregate lots per symbol: total shares and total cost basis
+        shares = np.bincount(self.symbol_ids, weights=self.shares, minlength=k)
+        cost = np.bincount(self.symbol_ids, weights=self.shares * self.purchase_prices, minlength=k)
+        lots = np.bincount(self.symbol_ids, minlength=k)
+
+        position_value = shares * prices
+        position_change = position_value - cost
+        with np.errstate(divide="ignore", invalid="ignore"):
+            average_cost = np.where(shares > 0, cost / shares, 0.0)
+            change_percent = np.where(cost > 0, position_change / cost * 100, 0.0)
+
+        return PortfolioValuation(
+            symbols=self.symbols,
+            shares=shares,
+            lots=lots,
+            prices=prices,
+            day_change=day_change,
+            average_cost=average_cost,
+            position_value=position_value,
+            position_change=position_change,
+            change_percent=change_percent,
+        )
+
+
+class PortfolioValuation:
+    """Per-symbol position arrays and portfolio totals from one valuation pass."""
+
+    def __init__(self, symbols, shares, lots, prices, day_change, average_cost,
+                 position_value, position_change, change_percent):
+        self.symbols = symbols
+        self.shares = shares
+        self.lots = lots
+        self.prices = prices
+        self.day_change = day_change
+        self.average_cost = average_cost
+        self.position_value = position_value
+        self.position_change = position_change
+        self.change_percent = change_percent
+
+        self.total_value = float(position_value.sum())
+        self.total_change = float(position_change.sum())
+        cost = self.total_value - self.total_change
+        self.total_change_percent = self.total_change / cost * 100 if cost > 0 else 0.0
+
+    def positions(self):
+        """Positions as JSON-ready dicts, one per symbol."""
+        columns = zip(
+            self.symbols, self.shares.tolist(), self.lots.tolist(), self.prices.tolist(),
+            self.average_cost.tolist(), self.position_value.tolist(), self.position_change.tolist(),
+            self.change_percent.tolist(),
+        )
+        return [
+            {
+                "symbol": symbol,
+                "shares": shares,
+                "lots": lots,
+                "currentPrice": price,
+                "purchasePrice": average_cost,
+                "positionValue": position_value,
+                "positionChange": position_change,
+                "changePercent": change_percent,
+            }
+            for symbol, shares, lots, price, average_cost, position_value, position_change, change_percent in columns
+        ]
+
+    def top_movers(self, k=1):
+        """Return (gainers, losers): the k symbols with the best and worst day change."""
+        k = min(k, len(self.symbols))
+        if k == 0:
+            return [], []
+        if k < len(self.symbols):
+            top = np.argpartition(-self.day_change, k - 1)[:k]
+            bottom = np.argpartition(self.day_change, k - 1)[:k]
+        else:
+            top = bottom = np.arange(len(self.symbols))
+        top = top[np.argsort(-self.day_change[top], kind="stable")]
+        bottom = bottom[np.argsort(self.day_change[bottom], kind="stable")]
+        return [self._mover(i) for i in top], [self._mover(i) for i in bottom]
+
+    def _mover(self, i):
+        return {
+            "symbol": self.symbols[i],
+            "changePercent": float(self.day_change[i]),
+            "currentPrice": float(self.prices[i]),
+        }
@@ -0,0 +1,265 @@
+import json
+import logging
+import random
+import threading
+import time
+
+from timeseries import percent_change
+
+try:
+    import websocket  # websocket-client, only needed for the live Finnhub feed
+except ImportError:  # pragma: no cover - optional dependency
+    websocket = None
+
+log = logging.getLogger("foresight.stream")
+
+FINNHUB_WS_URL = "wss://ws.finnhub.io"
+
+
+class Subscription:
+    """One connected client's view of the hub.
+
+    Updates are coalesced per symbol, so a slow client only ever has the
+    latest record for each symbol waiting instead of an unbounded backlog.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.on_push = None  # optional callable run after each push, e.g. to wake an event loop
+        self._pending = {}
+        self._cond = threading.Condition()
+
+    def push(self, record):
+        with self._cond:
+            self._pending[record["symbol"]] = record
+            self._cond.notify()
+        if self.on_push is not None:
+            self.on_push()
+
+    def next(self, timeout):
+        """Wait up to timeout seconds and return the pending records (maybe none)."""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            records = list(self._pending.values())
+            self._pending.clear()
+            return records
+
+
+class PriceHub:
+    """Fans upstream price updates out to every subscribed client.
+
+    The hub keeps one upstream feed subscription per symbol, reference
+    counted across clients, and the latest record per symbol in the same
+    shape /api/stocks returns. New subscribers receive that record at once.
+    """
+
+    def __init__(self, feed, snapshot):
+        self.feed = feed
+        self.snapshot = snapshot  # callable(symbols) -> {symbol: record}
+        self._records = {}
+        self._subscribers = {}  # symbol -> set of Subscription
+        self._lock = threading.Lock()
+        self.updates = 0
+        feed.attach(self)
+
+    def subscribe(self, symbols):
+        subscription = Subscription(symbols)
+        new_symbols = []
+        with self._lock:
+            for symbol in symbols:
+                subscribers = self._subscribers.setdefault(symbol, set())
+                if not subscribers:
+                    new_symbols.append(symbol)
+                subscribers.add(subscription)
+                if symbol in self._records:
+                    subscription.push(self._records[symbol])
+
+        # Seed records for symbols nobody was watching, then start their feeds
+        missing = [symbol for symbol in symbols if symbol not in self._records]
+        if missing:
+            for symbol, record in self.snapshot(missing).items():
+                self._publish(symbol, lambda current, record=record: current or record)
+        for symbol in new_symbols:
+            self.feed.subscribe(symbol)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            released = []
+            for symbol in subscription.symbols:
+                subscribers = self._subscribers.get(symbol)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[symbol]
+                    self._records.pop(symbol, None)
+                    released.append(symbol)
+        for symbol in released:
+            self.feed.unsubscribe(symbol)
+
+    def on_trade(self, symbol, price, volume=0):
+        """Merge a single trade into the symbol's record."""
+        def merge(record):
+            if record is None:
+                return None
+            previous_close = record["currentPrice"] - record["priceChange"]
+            price_change = price - previous_close
+            return dict(
+                record,
+                currentPrice=price,
+                priceChange=price_change,
+                changePercent=percent_change(price, previous_close),
+                dayHigh=max(record["dayHigh"], price),
+                dayLow=min(record["dayLow"], price) if record["dayLow"] else price,
+                volume=record["volume"] + volume,
+                status="active",
+            )
+        self._publish(symbol, merge)
+
+    def on_metrics(self, symbol, metrics):
+        """Merge a full metrics snapshot (get_stock_metrics shape) into the record."""
+        def merge(record):
+            return dict(
+                record or {"symbol": symbol, "companyName": f"{symbol} Corp."},
+                currentPrice=metrics["current_price"],
+                priceChange=metrics["price_change"],
+                changePercent=metrics["change_percent"],
+                volume=metrics["volume"],
+                dayHigh=metrics["day_high"],
+                dayLow=metrics["day_low"],
+                status="active",
+            )
+        self._publish(symbol, merge)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "symbols": len(self._subscribers),
+                "clients": len({s for subscribers in self._subscribers.values() for s in subscribers}),
+                "updates": self.updates,
+                "feed": type(self.feed).__name__,
+            }
+
+    def _publish(self, symbol, merge):
+        with self._lock:
+            subscribers = self._subscribers.get(symbol)
+            if not subscribers:
+                return
+            record = merge(self._records.get(symbol))
+            if record is None:
+                return
+            self._records[symbol] = record
+            self.updates += 1
+            for subscription in subscribers:
+                subscription.push(record)
+
+
+class MockTradeFeed:
+    """Offline feed that replays seeded mock ticks for each subscribed symbol.
+
+    Each symbol gets its own random generator seeded from (seed, symbol), so a
+    given seed always produces the same sequence of ticks per symbol no matter
+    when or in which order symbols are subscribed.
+    """
+
+    def __init__(self, generate, interval=1.0, seed=0):
+        self.generate = generate  # callable(symbol, rng) -> metrics
+        self.interval = interval
+        self.seed = seed
+        self._rngs = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.hub = None
+
+    def attach(self, hub):
+        self.hub = hub
+
+    def subscribe(self, symbol):
+        with self._lock:
+            self._rngs[symbol] = random.Random(f"{self.seed}:{symbol}")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mock-trade-feed", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, symbol):
+        with self._lock:
+            self._rngs.pop(symbol, None)
+
+    def ticks(self, symbol, count):
+        """Return the first count ticks for symbol, for replaying in tests."""
+        rng = random.Random(f"{self.seed}:{symbol}")
+        return [self.generate(symbol, rng) for _ in range(count)]
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                ticks = [(symbol, self.generate(symbol, rng)) for symbol, rng in self._rngs.items()]
+            for symbol, metrics in ticks:
+                self.hub.on_metrics(symbol, metrics)
+
+
+class FinnhubTradeFeed:
+    """Live trades from Finnhub's WebSocket API, reconnecting on failure."""
+
+    def __init__(self, token, url=FINNHUB_WS_URL, reconnect_delay=5.0):
+        if websocket is None:
+            raise RuntimeError("websocket-client is required for the Finnhub trade stream")
+        self.token = token
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self._symbols = set()
+        self._lock = threading.Lock()
+        self._ws = None
+        self._thread = None
+        self.hub = None
+
+    def attach(self, hub):
+        self.hub = hub
+
+    def subscribe(self, symbol):
+        with self._lock:
+            self._symbols.add(symbol)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="finnhub-trade-feed", daemon=True)
+                self._thread.start()
+        self._send({"type": "subscribe", "symbol": symbol})
+
+    def unsubscribe(self, symbol):
+        with self._lock:
+            self._symbols.discard(symbol)
+        self._send({"type": "unsubscribe", "symbol": symbol})
+
+    def _send(self, message):
+        ws = self._ws
+        if ws is not None and ws.sock is not None and ws.sock.connected:
+            try:
+                ws.send(json.dumps(message))
+            except Exception as e:
+                log.warning("❌ Finnhub stream send failed: %s", e)
+
+    def _on_open(self, ws):
+        with self._lock:
+            symbols = list(self._symbols)
+        for symbol in symbols:
+            ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+
+    def _on_message(self, ws, message):
+        payload = json.loads(message)
+        if payload.get("type") != "trade":
+            return
+        for trade in payload.get("data", []):
+            self.hub.on_trade(trade["s"], float(trade["p"]), int(trade.get("v", 0)))
+
+    def _run(self):
+        while True:
+            self._ws = websocket.WebSocketApp(
+                f"{self.url}?token={self.token}",
+                on_open=self._on_open,
+                on_message=self._on_message,
+            )
+            self._ws.run_forever(ping_interval=30, ping_timeout=10)
+            log.warning("🔌 Finnhub trade stream disconnected, reconnecting in %ss", self.reconnect_delay)
+            time.sleep(self.reconnect_delay)
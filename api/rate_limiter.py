@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+# Request priorities: lower values are dispatched first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a queued request is not granted a call before it expires."""
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_take(self):
+        """Take a token if one is available, otherwise return seconds to wait."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimitScheduler:
+    """Process-wide request queue in front of a rate-limited upstream.
+
+    Callers are released one at a time as tokens become available, highest
+    priority first and FIFO within a priority. Identical keyed requests that
+    are still waiting in the queue are deduplicated: later callers share the
+    first caller's result instead of spending another token.
+
+    Every wait takes an optional expires (a time.monotonic() value): a
+    request still queued by then leaves the queue without spending a token
+    and its caller gets DeadlineExceeded.
+    """
+
+    def __init__(self, name, calls_per_minute, burst=None):
+        self.name = name
+        self.calls_per_minute = calls_per_minute
+        self.bucket = TokenBucket(calls_per_minute / 60.0, burst or max(1, calls_per_minute // 6))
+        self._heap = []
+        self._queued = {}  # key -> _Ticket still waiting in the heap
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {}
+        self.deduplicated = 0
+        self.expired = 0
+        self._dispatcher = threading.Thread(target=self._dispatch, name=f"{name}-rate-limiter", daemon=True)
+        self._dispatcher.start()
+
+    def acquire(self, priority=INTERACTIVE, expires=None):
+        """Block until the scheduler grants this caller one upstream call."""
+        ticket = _Ticket(priority, expires=expires)
+        with self._cond:
+            self._push(ticket)
+        self._wait_granted(ticket)
+        self._record(ticket)
+
+    async def acquire_async(self, priority=INTERACTIVE, expires=None):
+        """Wait on the event loop until the scheduler grants one upstream call."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        ticket = _Ticket(priority, on_grant=lambda: _wake(loop, granted))
+        with self._cond:
+            self._push(ticket)
+        try:
+            await asyncio.wait_for(granted, None if expires is None else max(0.0, expires - time.monotonic()))
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            with self._cond:
+                if not ticket.granted.is_set():
+                    # Orphan the heap entry so the dispatcher skips it
+                    ticket.priority = None
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.expired += 1
+                        raise DeadlineExceeded(f"{self.name}: no rate-limit slot before the deadline") from None
+                    raise
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            # Granted just as the deadline passed; the token is spent, so use it
+        self._record(ticket)
+
+    def run(self, key, fn, priority=INTERACTIVE, expires=None):
+        """Queue fn() under key and return its result once it has been dispatched.
+
+        If a request with the same key is already waiting, the caller joins it
+        (raising its priority and extending its expiry if needed) instead of
+        queueing a duplicate.
+        """
+        with self._cond:
+            ticket = self._queued.get(key)
+            if ticket is not None:
+                self.deduplicated += 1
+                if priority < ticket.priority:
+                    # Re-queue at the higher priority; the old heap entry goes stale
+                    ticket.priority = priority
+                    self._push(ticket)
+                if ticket.expires is not None:
+                    ticket.expires = None if expires is None else max(ticket.expires, expires)
+                leader = False
+            else:
+                ticket = self._queued[key] = _Ticket(priority, key, expires=expires)
+                self._push(ticket)
+                leader = True
+
+        if not leader:
+            return ticket.wait_result(expires)
+
+        try:
+            self._wait_granted(ticket)
+        except DeadlineExceeded as e:
+            ticket.fail(e)
+            raise
+        self._record(ticket)
+        try:
+            result = fn()
+        except BaseException as e:
+            ticket.fail(e)
+            raise
+        ticket.finish(result)
+        return result
+
+    def stats(self):
+        """Return queue depth and wait-time counters per priority."""
+        with self._cond:
+            depth = {}
+            for priority, _, ticket in self._heap:
+                if priority == ticket.priority:
+                    name = PRIORITY_NAMES.get(ticket.priority, str(ticket.priority))
+                    depth[name] = depth.get(name, 0) + 1
+            by_priority = {}
+            for name, stat in self._stats.items():
+                by_priority[name] = {
+                    "dispatched": stat["dispatched"],
+                    "avg_wait_ms": round(stat["total_wait"] / stat["dispatched"] * 1000, 2),
+                    "max_wait_ms": round(stat["max_wait"] * 1000, 2),
+                }
+            return {
+                "calls_per_minute": self.calls_per_minute,
+                "queue_depth": sum(depth.values()),
+                "queue_depth_by_priority": depth,
+                "deduplicated": self.deduplicated,
+                "expired": self.expired,
+                "by_priority": by_priority,
+            }
+
+    def _push(self, ticket):
+        heapq.heappush(self._heap, (ticket.priority, next(self._seq), ticket))
+        self._cond.notify()
+
+    def _wait_granted(self, ticket):
+        """Wait for ticket's grant; past its expiry, withdraw it and raise DeadlineExceeded."""
+        while True:
+            expires = ticket.expires  # followers may extend it while we wait
+            timeout = None if expires is None else expires - time.monotonic()
+            if ticket.granted.wait(timeout if timeout is None else max(0.0, timeout)):
+                return
+            with self._cond:
+                if ticket.granted.is_set():
+                    return
+                if ticket.expires is None or ticket.expires > time.monotonic():
+                    continue
+                # Orphan the heap entry so the dispatcher skips it
+                ticket.priority = None
+                if ticket.key is not None and self._queued.get(ticket.key) is ticket:
+                    del self._queued[ticket.key]
+                self.expired += 1
+            raise DeadlineExceeded(f"{self.name}: no rate-limit slot before the deadline")
+
+    def _record(self, ticket):
+        waited = ticket.granted_at - ticket.queued_at
+        name = PRIORITY_NAMES.get(ticket.priority, str(ticket.priority))
+        with self._cond:
+            stat = self._stats.setdefault(name, {"dispatched": 0, "total_wait": 0.0, "max_wait": 0.0})
+            stat["dispatched"] += 1
+            stat["total_wait"] += waited
+            stat["max_wait"] = max(stat["max_wait"], waited)
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                delay = self.bucket.try_take()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                ticket = None
+                while self._heap and ticket is None:
+                    priority, _, candidate = heapq.heappop(self._heap)
+                    if priority == candidate.priority and not candidate.granted.is_set():
+                        ticket = candidate
+                if ticket is None:
+                    # Only stale entries were left; hand the token back
+                    self.bucket.tokens += 1
+                    continue
+                if ticket.key is not None and self._queued.get(ticket.key) is ticket:
+                    del self._queued[ticket.key]
+            ticket.grant()
+
+
+class _Ticket:
+    """One queued request and, for keyed requests, its shared result."""
+
+    def __init__(self, priority, key=None, on_grant=None, expires=None):
+        self.priority = priority
+        self.key = key
+        self.expires = expires
+        self.on_grant = on_grant
+        self.queued_at = time.monotonic()
+        self.granted_at = None
+        self.granted = threading.Event()
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def grant(self):
+        self.granted_at = time.monotonic()
+        self.granted.set()
+        if self.on_grant is not None:
+            self.on_grant()
+
+    def finish(self, value):
+        self._value = value
+        self._done.set()
+
+    def fail(self, error):
+        self._error = error
+        self._done.set()
+
+    def wait_result(self, expires=None):
+        timeout = None if expires is None else max(0.0, expires - time.monotonic())
+        if not self._done.wait(timeout):
+            raise DeadlineExceeded("no result before the deadline")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+def _wake(loop, future):
+    """Resolve an acquire_async() future from the dispatcher thread."""
+    def resolve():
+        if not future.done():
+            future.set_result(None)
+    try:
+        loop.call_soon_threadsafe(resolve)
+    except RuntimeError:
+        pass  # the event loop has shut down
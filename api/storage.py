@@ -0,0 +1,636 @@
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+
+log = logging.getLogger("foresight.storage")
+
+# Owner of data created before the API was user-aware
+DEFAULT_USER_ID = "default"
+DEFAULT_PORTFOLIO_ID = "default"
+
+# User and portfolio ids double as file and shard names, so keep them tame
+ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Alert fields mirrored into indexed SQLite columns
+ALERT_COLUMNS = {
+    "symbol": "symbol",
+    "status": "status",
+    "alertType": "alert_type",
+    "lastTriggered": "last_triggered",
+}
+
+# Sort orders for query_alerts: alert field, or None for creation (insertion) order
+ALERT_SORTS = {
+    "createdAt": None,
+    "symbol": "symbol",
+    "lastTriggered": "lastTriggered",
+}
+
+
+def is_valid_id(value):
+    return bool(value) and ID_PATTERN.match(value) is not None
+
+
+def alert_owner(alert):
+    return alert.get("userId") or DEFAULT_USER_ID
+
+
+class JSONStore:
+    """Alerts and portfolios kept in JSON files (development backend).
+
+    Each user gets a directory under data_dir holding alerts.json and one
+    portfolio-<id>.json per portfolio. The default user keeps using the
+    original alerts.json / portfolio.json files. Every call re-reads and
+    rewrites a whole file, so it is only suitable for small datasets. A
+    process-wide lock prevents lost updates between request threads.
+
+    Alert writes also return their version change: the user's alerts version
+    (previous, new) around that write, or None if nothing was written.
+    """
+
+    def __init__(self, alerts_file, portfolio_file, data_dir):
+        self.alerts_file = alerts_file
+        self.portfolio_file = portfolio_file
+        self.data_dir = data_dir
+        self._lock = threading.RLock()
+
+    def list_alerts(self, user_id=None, status=None, symbol=None):
+        """List alerts for user_id, or for every user when user_id is None."""
+        if user_id is None:
+            paths = [self.alerts_file] + sorted(glob.glob(os.path.join(self.data_dir, "*", "alerts.json")))
+        else:
+            paths = [self._alerts_path(user_id)]
+        alerts = []
+        for path in paths:
+            alerts.extend(self._read(path, []))
+        return [
+            alert for alert in alerts
+            if (status is None or alert.get("status") == status)
+            and (symbol is None or alert.get("symbol") == symbol)
+        ]
+
+    def query_alerts(self, user_id, filters=None, triggered_since=None, sort="createdAt", limit=None, after=None):
+        """One page of a user's alerts; see SQLiteStore.query_alerts."""
+        field = ALERT_SORTS[sort.lstrip("-")]
+        descending = sort.startswith("-")
+
+        def key(value, position):
+            # None sorts first, as NULL does in SQLite
+            return (value is not None, "" if value is None else value, position)
+
+        rows = []
+        for position, alert in enumerate(self._read(self._alerts_path(user_id), [])):
+            if any(alert.get(name) != value for name, value in (filters or {}).items()):
+                continue
+            if triggered_since is not None and (alert.get("lastTriggered") or "") < triggered_since:
+                continue
+            value = position if field is None else alert.get(field)
+            rows.append((key(value, position), alert))
+        if after is not None:
+            start = key(*after)
+            rows = [row for row in rows if (row[0] < start if descending else row[0] > start)]
+        rows.sort(key=lambda row: row[0], reverse=descending)
+        return _page([(row_key[1] if row_key[0] else None, row_key[2], alert) for row_key, alert in rows], limit)
+
+    def count_alerts(self, user_id, status=None, triggered_since=None):
+        return len(self.query_alerts(user_id, {"status": status} if status else None, triggered_since)[0])
+
+    def get_alert(self, user_id, alert_id):
+        for alert in self._read(self._alerts_path(user_id), []):
+            if alert["id"] == alert_id:
+                return alert
+        return None
+
+    def insert_alert(self, user_id, alert):
+        """Returns (alert, version change)."""
+        with self._lock:
+            path = self._alerts_path(user_id)
+            alerts = self._read(path, [])
+            alerts.append(alert)
+            return alert, self._write_alerts(path, alerts)
+
+    def update_alert(self, user_id, alert_id, fields):
+        """Returns (updated alert or None, version change)."""
+        updated, change = self.update_alerts(user_id, {alert_id: fields})
+        return updated.get(alert_id), change
+
+    def update_alerts(self, user_id, updates):
+        """Apply {alert_id: fields} in one write; returns (updated alerts by id, version change)."""
+        updated = {}
+        with self._lock:
+            path = self._alerts_path(user_id)
+            alerts = self._read(path, [])
+            for alert in alerts:
+                fields = updates.get(alert["id"])
+                if fields is not None:
+                    alert.update(fields)
+                    updated[alert["id"]] = alert
+            change = self._write_alerts(path, alerts) if updated else None
+        return updated, change
+
+    def delete_alert(self, user_id, alert_id):
+        """Returns (whether the alert existed, version change)."""
+        with self._lock:
+            path = self._alerts_path(user_id)
+            alerts = self._read(path, [])
+            remaining = [alert for alert in alerts if alert["id"] != alert_id]
+            if len(remaining) == len(alerts):
+                return False, None
+            return True, self._write_alerts(path, remaining)
+
+    def write_alerts(self, user_id, inserts=(), updates=None, deletes=()):
+        """Insert, update ({alert_id: fields}) and delete alerts in one write.
+
+        Returns (inserted alerts, updated alerts by id, set of deleted ids, version change).
+        """
+        updates = updates or {}
+        deletes = set(deletes)
+        with self._lock:
+            path = self._alerts_path(user_id)
+            alerts = self._read(path, [])
+            updated, deleted, remaining = {}, set(), []
+            for alert in alerts:
+                if alert["id"] in deletes:
+                    deleted.add(alert["id"])
+                    continue
+                fields = updates.get(alert["id"])
+                if fields is not None:
+                    alert.update(fields)
+                    updated[alert["id"]] = alert
+                remaining.append(alert)
+            remaining.extend(inserts)
+            change = self._write_alerts(path, remaining) if inserts or updated or deleted else None
+        return list(inserts), updated, deleted, change
+
+    def load_portfolio(self, user_id, portfolio_id=DEFAULT_PORTFOLIO_ID):
+        return self._read(self._portfolio_path(user_id, portfolio_id), {"holdings": []})
+
+    def save_portfolio(self, user_id, portfolio, portfolio_id=DEFAULT_PORTFOLIO_ID):
+        with self._lock:
+            self._write(self._portfolio_path(user_id, portfolio_id), portfolio)
+
+    def alerts_version(self, user_id):
+        """Token that changes whenever the user's alerts are written."""
+        return self._file_version(self._alerts_path(user_id))
+
+    def portfolio_version(self, user_id, portfolio_id=DEFAULT_PORTFOLIO_ID):
+        """Token that changes whenever the portfolio is saved."""
+        return self._file_version(self._portfolio_path(user_id, portfolio_id))
+
+    def list_portfolios(self, user_id):
+        portfolio_ids = set()
+        if user_id == DEFAULT_USER_ID and os.path.exists(self.portfolio_file):
+            portfolio_ids.add(DEFAULT_PORTFOLIO_ID)
+        for path in glob.glob(os.path.join(self.data_dir, user_id, "portfolio-*.json")):
+            portfolio_ids.add(os.path.basename(path)[len("portfolio-"):-len(".json")])
+        return sorted(portfolio_ids)
+
+    def _alerts_path(self, user_id):
+        if user_id == DEFAULT_USER_ID:
+            return self.alerts_file
+        return os.path.join(self.data_dir, user_id, "alerts.json")
+
+    def _portfolio_path(self, user_id, portfolio_id):
+        if user_id == DEFAULT_USER_ID and portfolio_id == DEFAULT_PORTFOLIO_ID:
+            return self.portfolio_file
+        return os.path.join(self.data_dir, user_id, f"portfolio-{portfolio_id}.json")
+
+    def _file_version(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return "0"
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def _write_alerts(self, path, alerts):
+        # Called under the lock, so no other thread's write falls between the two versions
+        previous = self._file_version(path)
+        self._write(path, alerts)
+        return previous, self._file_version(path)
+
+    def _read(self, path, default):
+        with self._lock:
+            if not os.path.exists(path):
+                return default
+            with open(path, "r") as f:
+                return json.load(f)
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+class SQLiteStore:
+    """Alerts and portfolios in an SQLite database running in WAL mode.
+
+    Each alert is stored as a JSON document next to indexed copies of the
+    fields we filter and sort on, so lookups by id, user, symbol, status and
+    lastTriggered never scan the table and updates touch a single row.
+    Every write also bumps a per-user version counter in the same
+    transaction, which the API turns into ETags; alert writes return that
+    version change, (previous, new), or None if nothing was written.
+    """
+
+    SCHEMA_VERSION = 2
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS alerts (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL DEFAULT 'default',
+            symbol TEXT NOT NULL,
+            status TEXT NOT NULL,
+            alert_type TEXT,
+            last_triggered TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS holdings (
+            user_id TEXT NOT NULL,
+            portfolio_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (user_id, portfolio_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS versions (
+            user_id TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (user_id, scope)
+        );
+    """
+
+    INDEXES = """
+        CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts (symbol);
+        CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts (status);
+        CREATE INDEX IF NOT EXISTS idx_alerts_last_triggered ON alerts (last_triggered);
+        CREATE INDEX IF NOT EXISTS idx_alerts_user_status ON alerts (user_id, status);
+        CREATE INDEX IF NOT EXISTS idx_alerts_user_symbol ON alerts (user_id, symbol);
+        CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts (user_id);
+        CREATE INDEX IF NOT EXISTS idx_alerts_user_alert_type ON alerts (user_id, alert_type);
+        CREATE INDEX IF NOT EXISTS idx_alerts_user_last_triggered ON alerts (user_id, last_triggered);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._migrate_schema()
+
+    def list_alerts(self, user_id=None, status=None, symbol=None):
+        """List alerts for user_id, or for every user when user_id is None."""
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if symbol is not None:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(f"SELECT data FROM alerts {where} ORDER BY rowid", params)
+        return [json.loads(data) for (data,) in rows]
+
+    def query_alerts(self, user_id, filters=None, triggered_since=None, sort="createdAt", limit=None, after=None):
+        """One page of a user's alerts.
+
+        filters maps symbol, status or alertType to a required value, and
+        triggered_since keeps alerts with lastTriggered >= it. sort is a key
+        of ALERT_SORTS, prefixed with "-" for descending. Pages are keyset
+        paginated on (sort value, rowid) so every page is an index range scan:
+        pass the key returned with one page as after to get the next.
+        Returns (alerts, key of the last alert, or None on the last page).
+        """
+        field = ALERT_SORTS[sort.lstrip("-")]
+        column = ALERT_COLUMNS[field] if field else "rowid"
+        descending = sort.startswith("-")
+        clauses, params = ["user_id = ?"], [user_id]
+        for name, value in (filters or {}).items():
+            clauses.append(f"{ALERT_COLUMNS[name]} = ?")
+            params.append(value)
+        if triggered_since is not None:
+            clauses.append("last_triggered >= ?")
+            params.append(triggered_since)
+        direction = "DESC" if descending else "ASC"
+        order = f"{column} {direction}" if column == "rowid" else f"{column} {direction}, rowid {direction}"
+        segments = [([], [])] if after is None else [([clause], extra) for clause, extra in _after_segments(column, descending, *after)]
+        rows = []
+        for extra_clauses, extra_params in segments:
+            where = " AND ".join(clauses + extra_clauses)
+            sql = f"SELECT {column}, rowid, data FROM alerts WHERE {where} ORDER BY {order} LIMIT ?"
+            # One row past the page tells us whether there is a next one
+            wanted = -1 if limit is None else limit + 1 - len(rows)
+            rows += self._conn().execute(sql, params + extra_params + [wanted]).fetchall()
+            if limit is not None and len(rows) > limit:
+                break
+        return _page([(value, rowid, json.loads(data)) for value, rowid, data in rows], limit)
+
+    def count_alerts(self, user_id, status=None, triggered_since=None):
+        clauses, params = ["user_id = ?"], [user_id]
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if triggered_since is not None:
+            clauses.append("last_triggered >= ?")
+            params.append(triggered_since)
+        return self._conn().execute(f"SELECT COUNT(*) FROM alerts WHERE {' AND '.join(clauses)}", params).fetchone()[0]
+
+    def get_alert(self, user_id, alert_id):
+        row = self._conn().execute(
+            "SELECT data FROM alerts WHERE id = ? AND user_id = ?", (alert_id, user_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def insert_alert(self, user_id, alert):
+        """Returns (alert, version change)."""
+        with self._transaction() as conn:
+            self._insert(conn, user_id, alert)
+            change = self._bump(conn, user_id, "alerts")
+        return alert, change
+
+    def update_alert(self, user_id, alert_id, fields):
+        """Returns (updated alert or None, version change)."""
+        updated, change = self.update_alerts(user_id, {alert_id: fields})
+        return updated.get(alert_id), change
+
+    def update_alerts(self, user_id, updates):
+        """Apply {alert_id: fields} in one transaction; returns (updated alerts by id, version change)."""
+        change = None
+        with self._transaction() as conn:
+            updated = self._update(conn, user_id, updates)
+            if updated:
+                change = self._bump(conn, user_id, "alerts")
+        return updated, change
+
+    def delete_alert(self, user_id, alert_id):
+        """Returns (whether the alert existed, version change)."""
+        change = None
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM alerts WHERE id = ? AND user_id = ?", (alert_id, user_id))
+            if cursor.rowcount:
+                change = self._bump(conn, user_id, "alerts")
+        return change is not None, change
+
+    def write_alerts(self, user_id, inserts=(), updates=None, deletes=()):
+        """Insert, update ({alert_id: fields}) and delete alerts in one transaction.
+
+        Returns (inserted alerts, updated alerts by id, set of deleted ids, version change).
+        """
+        deleted = set()
+        change = None
+        with self._transaction() as conn:
+            for alert in inserts:
+                self._insert(conn, user_id, alert)
+            for alert_id in set(deletes):
+                if conn.execute("DELETE FROM alerts WHERE id = ? AND user_id = ?", (alert_id, user_id)).rowcount:
+                    deleted.add(alert_id)
+            updated = self._update(conn, user_id, updates or {})
+            if inserts or updated or deleted:
+                change = self._bump(conn, user_id, "alerts")
+        return list(inserts), updated, deleted, change
+
+    def load_portfolio(self, user_id, portfolio_id=DEFAULT_PORTFOLIO_ID):
+        rows = self._conn().execute(
+            "SELECT data FROM holdings WHERE user_id = ? AND portfolio_id = ? ORDER BY position",
+            (user_id, portfolio_id),
+        )
+        return {"holdings": [json.loads(data) for (data,) in rows]}
+
+    def save_portfolio(self, user_id, portfolio, portfolio_id=DEFAULT_PORTFOLIO_ID):
+        with self._transaction() as conn:
+            self._replace_holdings(conn, user_id, portfolio_id, portfolio["holdings"])
+
+    def alerts_version(self, user_id):
+        """Token that changes whenever the user's alerts are written."""
+        return self._version(user_id, "alerts")
+
+    def portfolio_version(self, user_id, portfolio_id=DEFAULT_PORTFOLIO_ID):
+        """Token that changes whenever the portfolio is saved."""
+        return self._version(user_id, f"portfolio:{portfolio_id}")
+
+    def list_portfolios(self, user_id):
+        rows = self._conn().execute(
+            "SELECT DISTINCT portfolio_id FROM holdings WHERE user_id = ? ORDER BY portfolio_id", (user_id,)
+        )
+        return [portfolio_id for (portfolio_id,) in rows]
+
+    def migrate_from(self, json_store):
+        """One-shot import of the default user's JSON data; later calls are no-ops."""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+                return False
+            alerts = json_store.list_alerts(DEFAULT_USER_ID)
+            for alert in alerts:
+                self._insert(conn, DEFAULT_USER_ID, alert, replace=True)
+            self._bump(conn, DEFAULT_USER_ID, "alerts")
+            holdings = json_store.load_portfolio(DEFAULT_USER_ID).get("holdings", [])
+            if holdings:
+                self._replace_holdings(conn, DEFAULT_USER_ID, DEFAULT_PORTFOLIO_ID, holdings)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                         (json.dumps({"alerts": len(alerts), "holdings": len(holdings)}),))
+        log.info("📦 Migrated %d alerts and %d holdings from JSON to %s", len(alerts), len(holdings), self.path)
+        return True
+
+    def _migrate_schema(self):
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        with self._transaction() as conn:
+            # Versions are only comparable within one database; a recreated one gets a new instance id
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('instance', ?)", (uuid.uuid4().hex,))
+            self.instance = conn.execute("SELECT value FROM meta WHERE key = 'instance'").fetchone()[0]
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            version = int(row[0]) if row else 1
+            if version < 2:
+                # v1 had no owners: give existing alerts and holdings to the default user
+                alert_columns = [column[1] for column in conn.execute("PRAGMA table_info(alerts)")]
+                if "user_id" not in alert_columns:
+                    conn.execute("ALTER TABLE alerts ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default'")
+                holding_columns = [column[1] for column in conn.execute("PRAGMA table_info(holdings)")]
+                if "user_id" not in holding_columns:
+                    conn.execute("ALTER TABLE holdings RENAME TO holdings_v1")
+                    conn.execute("""
+                        CREATE TABLE holdings (
+                            user_id TEXT NOT NULL,
+                            portfolio_id TEXT NOT NULL,
+                            position INTEGER NOT NULL,
+                            symbol TEXT NOT NULL,
+                            data TEXT NOT NULL,
+                            PRIMARY KEY (user_id, portfolio_id, position)
+                        )
+                    """)
+                    conn.execute(
+                        "INSERT INTO holdings (user_id, portfolio_id, position, symbol, data) "
+                        "SELECT ?, ?, position, symbol, data FROM holdings_v1",
+                        (DEFAULT_USER_ID, DEFAULT_PORTFOLIO_ID),
+                    )
+                    conn.execute("DROP TABLE holdings_v1")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                         (str(self.SCHEMA_VERSION),))
+        self._conn().executescript(self.INDEXES)
+
+    def _insert(self, conn, user_id, alert, replace=False):
+        verb = "INSERT OR REPLACE" if replace else "INSERT"
+        conn.execute(
+            f"{verb} INTO alerts (id, user_id, symbol, status, alert_type, last_triggered, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (alert["id"], user_id, *self._columns(alert), json.dumps(alert)),
+        )
+
+    def _update(self, conn, user_id, updates):
+        updated = {}
+        for alert_id, fields in updates.items():
+            row = conn.execute(
+                "SELECT data FROM alerts WHERE id = ? AND user_id = ?", (alert_id, user_id)
+            ).fetchone()
+            if row is None:
+                continue
+            alert = json.loads(row[0])
+            alert.update(fields)
+            conn.execute(
+                "UPDATE alerts SET symbol = ?, status = ?, alert_type = ?, last_triggered = ?, data = ? WHERE id = ?",
+                (*self._columns(alert), json.dumps(alert), alert_id),
+            )
+            updated[alert_id] = alert
+        return updated
+
+    def _bump(self, conn, user_id, scope):
+        """Advance the scope's version in conn's transaction; returns (previous, new) tokens."""
+        conn.execute(
+            "INSERT INTO versions (user_id, scope, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (user_id, scope) DO UPDATE SET version = version + 1",
+            (user_id, scope),
+        )
+        (version,) = conn.execute(
+            "SELECT version FROM versions WHERE user_id = ? AND scope = ?", (user_id, scope)
+        ).fetchone()
+        return f"{self.instance}-{version - 1}", f"{self.instance}-{version}"
+
+    def _version(self, user_id, scope):
+        row = self._conn().execute(
+            "SELECT version FROM versions WHERE user_id = ? AND scope = ?", (user_id, scope)
+        ).fetchone()
+        return f"{self.instance}-{row[0] if row else 0}"
+
+    def _replace_holdings(self, conn, user_id, portfolio_id, holdings):
+        self._bump(conn, user_id, f"portfolio:{portfolio_id}")
+        conn.execute("DELETE FROM holdings WHERE user_id = ? AND portfolio_id = ?", (user_id, portfolio_id))
+        conn.executemany(
+            "INSERT INTO holdings (user_id, portfolio_id, position, symbol, data) VALUES (?, ?, ?, ?, ?)",
+            [(user_id, portfolio_id, i, holding["symbol"], json.dumps(holding)) for i, holding in enumerate(holdings)],
+        )
+
+    def _columns(self, alert):
+        return tuple(alert.get(field) for field in ALERT_COLUMNS)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front so read-modify-write is atomic
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def _page(rows, limit):
+    """Split (sort value, position, alert) rows into (alerts, key to continue after)."""
+    if limit is None or len(rows) <= limit:
+        return [alert for _, _, alert in rows], None
+    value, position, _ = rows[limit - 1]
+    return [alert for _, _, alert in rows[:limit]], (value, position)
+
+
+def _after_segments(column, descending, value, rowid):
+    """WHERE clauses that select, in sort order, the rows after (value, rowid).
+
+    Each clause is a single index range, so a deep page costs the same as
+    the first. NULLs sort first, so they get a segment of their own.
+    """
+    op = "<" if descending else ">"
+    if column == "rowid":
+        return [(f"rowid {op} ?", [rowid])]
+    if value is None:
+        if descending:
+            return [(f"{column} IS NULL AND rowid < ?", [rowid])]
+        return [(f"{column} IS NULL AND rowid > ?", [rowid]), (f"{column} IS NOT NULL", [])]
+    bound = "<=" if descending else ">="
+    after = (f"{column} {bound} ? AND ({column} {op} ? OR rowid {op} ?)", [value, value, rowid])
+    return [after, (f"{column} IS NULL", [])] if descending else [after]
+
+
+class ShardedStore:
+    """Spreads users across several stores by a stable hash of the user id.
+
+    All of a user's rows live in one shard, so per-user requests touch a
+    single database; cross-user reads (user_id=None) visit every shard.
+    """
+
+    def __init__(self, shards):
+        self.shards = shards
+
+    def shard_for(self, user_id):
+        return self.shards[zlib.crc32(user_id.encode()) % len(self.shards)]
+
+    def list_alerts(self, user_id=None, status=None, symbol=None):
+        if user_id is not None:
+            return self.shard_for(user_id).list_alerts(user_id, status=status, symbol=symbol)
+        alerts = []
+        for shard in self.shards:
+            alerts.extend(shard.list_alerts(None, status=status, symbol=symbol))
+        return alerts
+
+    def __getattr__(self, name):
+        # Every other operation is scoped to one user: route it to that user's shard
+        def route(user_id, *args, **kwargs):
+            return getattr(self.shard_for(user_id), name)(user_id, *args, **kwargs)
+        return route
+
+
+def make_store(backend, alerts_file, portfolio_file, data_dir, database_path, shards=1):
+    """Build the configured storage backend ("sqlite" or "json").
+
+    With shards > 1 the SQLite backend is split across database_path-<n>
+    files by user. The default user's shard imports the legacy JSON files
+    once, the first time it opens.
+    """
+    json_store = JSONStore(alerts_file, portfolio_file, data_dir)
+    if backend == "json":
+        return json_store
+    if backend != "sqlite":
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if shards <= 1:
+        store = SQLiteStore(database_path)
+        store.migrate_from(json_store)
+        return store
+    root, ext = os.path.splitext(database_path)
+    store = ShardedStore([SQLiteStore(f"{root}-{n}{ext}") for n in range(shards)])
+    store.shard_for(DEFAULT_USER_ID).migrate_from(json_store)
+    return store
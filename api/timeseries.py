@@ -0,0 +1,85 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def percent_change(current, previous):
+    """Percentage change from previous to current; 0 when previous is not positive."""
+    return (current - previous) / previous * 100 if previous > 0 else 0
+
+
+class TimeSeries:
+    """Daily closes indexed by date, kept sorted oldest first.
+
+    Latest and previous values are plain array lookups, and the windowed
+    helpers return one value per date computed over whole arrays. Windowed
+    results are NaN until enough history is available.
+    """
+
+    def __init__(self, dates, closes):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        closes = np.asarray(closes, dtype=np.float64)
+        if len(dates) > 1 and not np.all(dates[1:] > dates[:-1]):
+            order = np.argsort(dates, kind="stable")
+            dates, closes = dates[order], closes[order]
+        self.dates = dates
+        self.closes = closes
+
+    @classmethod
+    def from_alpha_vantage(cls, series):
+        """Build from an Alpha Vantage "Time Series (Daily)" mapping (any key order)."""
+        dates = np.fromiter(series.keys(), dtype="datetime64[D]", count=len(series))
+        closes = np.fromiter((float(bar["4. close"]) for bar in series.values()), dtype=np.float64, count=len(series))
+        return cls(dates, closes)
+
+    @classmethod
+    def from_bars(cls, bars):
+        """Build from history_store bars, which are already sorted."""
+        return cls(bars["date"], bars["close"])
+
+    def __len__(self):
+        return len(self.closes)
+
+    @property
+    def latest(self):
+        """(date, close) of the most recent day."""
+        return self.dates[-1], float(self.closes[-1])
+
+    @property
+    def previous(self):
+        """(date, close) of the day before the most recent one."""
+        return self.dates[-2], float(self.closes[-2])
+
+    def change_percent(self, days=1):
+        """Percentage change of the latest close versus the close days earlier."""
+        if len(self) <= days:
+            raise ValueError(f"Need more than {days} closes, have {len(self)}")
+        return percent_change(float(self.closes[-1]), float(self.closes[-1 - days]))
+
+    def returns(self, days=1):
+        """Percentage return over days for every date (NaN for the first days)."""
+        out = np.full(len(self), np.nan)
+        if len(self) > days:
+            previous = self.closes[:-days]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[days:] = np.where(previous > 0, (self.closes[days:] - previous) / previous * 100, 0.0)
+        return out
+
+    def rolling_high(self, window):
+        return self._rolling(window, np.max)
+
+    def rolling_low(self, window):
+        return self._rolling(window, np.min)
+
+    def sma(self, window):
+        """Simple moving average, from a cumulative sum."""
+        out = np.full(len(self), np.nan)
+        if len(self) >= window:
+            sums = np.cumsum(np.concatenate(([0.0], self.closes)))
+            out[window - 1:] = (sums[window:] - sums[:-window]) / window
+        return out
+
+    def _rolling(self, window, reduce):
+        out = np.full(len(self), np.nan)
+        if len(self) >= window:
+            out[window - 1:] = reduce(sliding_window_view(self.closes, window), axis=1)
+        return out
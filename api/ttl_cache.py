@@ -0,0 +1,284 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from circuit_breaker import CircuitOpenError
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL.
+
+    Concurrent ``get_or_load`` calls for the same key are coalesced so that
+    only one loader runs at a time; the other callers wait for its result.
+    ``get_or_load_async`` does the same for coroutines on an event loop and
+    shares the cached entries with the threaded callers.
+    """
+
+    def __init__(self, maxsize=1024, default_ttl=60):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> _Call
+        self._inflight_async = {}  # key -> asyncio.Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            return self._get_locked(key, default)
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (default_ttl if omitted)."""
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def delete(self, key):
+        """Drop key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.coalesced = self.evictions = 0
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value for key, calling loader() on a miss.
+
+        Only successful loads are cached; if loader raises, the exception is
+        propagated to the caller and to every request coalesced onto it.
+        """
+        with self._lock:
+            value = self._get_locked(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            call = self._inflight.get(key)
+            if call is None:
+                call = self._inflight[key] = _Call()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            return call.wait()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            call.fail(e)
+            raise
+        else:
+            call.finish(value)
+            with self._lock:
+                self._set_locked(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_load_async(self, key, loader, ttl=None):
+        """Async get_or_load: loader is a coroutine function, awaited on a miss."""
+        with self._lock:
+            value = self._get_locked(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            future = self._inflight_async.get(key)
+            if future is not None:
+                self.coalesced += 1
+
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(value)
+            with self._lock:
+                self._set_locked(key, value, ttl)
+            return value
+        finally:
+            self._inflight_async.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _get_locked(self, key, default):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _set_locked(self, key, value, ttl):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+class StaleWhileRevalidate:
+    """Serves the last good value for a key, refreshing it in the background.
+
+    Values younger than ``fresh_for`` seconds are returned as is. Older ones,
+    up to ``max_stale`` seconds, are still returned immediately while a single
+    background refresh per key runs on ``executor``. Only a missing or
+    too-old value makes the caller wait for ``loader(key)``.
+
+    With a circuit breaker attached, loads are skipped while it is open:
+    stale values keep being served and callers with nothing usable get
+    CircuitOpenError straight away.
+    """
+
+    def __init__(self, loader, fresh_for, max_stale, executor, breaker=None, maxsize=4096):
+        self.loader = loader
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.executor = executor
+        self.breaker = breaker
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (loaded_at, value)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.fresh = 0
+        self.stale = 0
+        self.loads = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    def get(self, key):
+        """Return (value, age in seconds), loading synchronously only when nothing usable is cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                loaded_at, value = entry
+                age = time.monotonic() - loaded_at
+                if age < self.fresh_for:
+                    self.fresh += 1
+                    return value, age
+                if age < self.max_stale:
+                    self.stale += 1
+                    refresh = key not in self._refreshing
+                    if refresh:
+                        self._refreshing.add(key)
+                else:
+                    entry = None
+            if entry is None:
+                self.loads += 1
+
+        if entry is None:
+            self._allow()
+            return self._load(key), 0.0
+        if refresh:
+            self.executor.submit(self._refresh, key)
+        return value, age
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "size": len(self._entries),
+                "fresh": self.fresh,
+                "stale": self.stale,
+                "loads": self.loads,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "refreshing": len(self._refreshing),
+            }
+        if self.breaker is not None:
+            stats["circuit"] = self.breaker.stats()
+        return stats
+
+    def _allow(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} is unavailable, not retrying for now")
+
+    def _load(self, key):
+        try:
+            value = self.loader(key)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        if self.breaker is not None:
+            self.breaker.record_success()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def _refresh(self, key):
+        try:
+            self._allow()
+            with self._lock:
+                self.refreshes += 1
+            self._load(key)
+        except Exception:
+            pass  # keep serving the stale value; failures are counted in stats
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+class _Call:
+    """A single in-flight load that other callers can wait on."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+
+    def finish(self, value):
+        self._value = value
+        self._event.set()
+
+    def fail(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+_MISSING = object()
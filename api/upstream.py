@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx  # only needed for the async (ASGI) serving mode
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+from metrics import record_upstream, upstream_retries
+from rate_limiter import INTERACTIVE, RateLimitScheduler
+
+log = logging.getLogger("foresight.upstream")
+
+# Pool, timeout and retry tuning shared by every upstream provider
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "20"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "30"))
+
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+NEWS_API_BASE_URL = os.getenv("NEWS_API_BASE_URL", "https://newsapi.org/v2")
+ALPHA_VANTAGE_BASE_URL = os.getenv("ALPHA_VANTAGE_BASE_URL", "https://www.alphavantage.co")
+
+# Provider rate limits (calls per minute, 0 disables the scheduler)
+FINNHUB_CALLS_PER_MINUTE = int(os.getenv("FINNHUB_CALLS_PER_MINUTE", "60"))
+FINNHUB_BURST = int(os.getenv("FINNHUB_BURST", "10"))
+NEWS_API_CALLS_PER_MINUTE = int(os.getenv("NEWS_API_CALLS_PER_MINUTE", "0"))
+ALPHA_VANTAGE_CALLS_PER_MINUTE = int(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Transport and HTTP errors raised by either the sync or the async client
+REQUEST_ERRORS = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+
+class UpstreamClient:
+    """A pooled keep-alive HTTP session for one upstream provider.
+
+    GET requests are retried with jittered exponential backoff on connection
+    errors, timeouts, 429 and 5xx responses. A ``Retry-After`` header on the
+    response takes precedence over the computed backoff.
+
+    When a scheduler is attached, every attempt waits for a rate-limit token
+    and identical requests still waiting in its queue are deduplicated. A
+    request given expires (a time.monotonic() value) that is still queued by
+    then raises DeadlineExceeded instead of spending a token late, and one
+    whose next backoff would end after expires stops retrying there.
+    """
+
+    def __init__(self, name, base_url, pool_size=UPSTREAM_POOL_SIZE,
+                 timeout=(UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT),
+                 max_retries=UPSTREAM_MAX_RETRIES, backoff_base=UPSTREAM_BACKOFF_BASE,
+                 backoff_max=UPSTREAM_BACKOFF_MAX, scheduler=None):
+        self.name = name
+        self.scheduler = scheduler
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def get(self, path, params=None, priority=INTERACTIVE, expires=None):
+        """GET base_url + path, retrying transient failures.
+
+        Returns the final response, which may still carry a 429/5xx status once
+        the retries are exhausted or the deadline leaves no time for another.
+        Connection errors and timeouts are re-raised after the last attempt.
+        """
+        if self.scheduler is None:
+            return self._get(path, params, priority, expires)
+        key = (path, tuple(sorted((params or {}).items())))
+        return self.scheduler.run(key, lambda: self._get(path, params, priority, expires), priority, expires)
+
+    def _get(self, path, params, priority, expires=None):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempt = 0
+        while True:
+            if attempt and self.scheduler is not None:
+                # The first attempt was admitted by scheduler.run(); retries queue again
+                self.scheduler.acquire(priority, expires)
+            self._count("requests")
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                record_upstream(self.name, path, "error", time.perf_counter() - started)
+                delay = self._backoff(attempt)
+                if self._give_up(path, attempt, delay, expires):
+                    raise
+            else:
+                record_upstream(self.name, path, response.status_code, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if self._give_up(path, attempt, delay, expires):
+                    return response
+                response.close()
+
+            attempt += 1
+            self._count("retries")
+            upstream_retries.inc(provider=self.name)
+            log.warning("🔁 %s: retrying %s in %.2fs (attempt %d/%d)", self.name, path, delay, attempt, self.max_retries)
+            time.sleep(delay)
+
+    def stats(self):
+        """Return request/retry counters and connection reuse for this provider."""
+        opened = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "connections_opened": opened,
+                "connection_reuse": round(1 - opened / self.requests, 4) if self.requests else 0.0,
+            }
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _give_up(self, path, attempt, delay, expires):
+        """Whether to stop after a failed attempt: retries are used up, or delay ends past expires."""
+        if attempt < self.max_retries and not _outlives(expires, delay):
+            return False
+        if attempt < self.max_retries:
+            log.warning("⏱️ %s: not retrying %s, its deadline is before the %.2fs backoff", self.name, path, delay)
+        self._count("failures")
+        return True
+
+    def _backoff(self, attempt):
+        # Full jitter: sleep a random amount up to the exponential ceiling
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0.0), self.backoff_max)
+
+
+class AsyncUpstreamClient:
+    """asyncio counterpart of UpstreamClient built on httpx.
+
+    It takes its base URL, timeouts, retry policy and rate-limit scheduler
+    from the sync client, so both serving modes draw on one provider budget.
+    Identical requests already in flight on the event loop share a response.
+    The httpx client is created lazily on the running loop.
+    """
+
+    def __init__(self, client, pool_size=UPSTREAM_POOL_SIZE):
+        if httpx is None:
+            raise RuntimeError("httpx is required for the async upstream client")
+        self.client = client
+        self.name = client.name
+        self.pool_size = pool_size
+        self._session = None
+        self._inflight = {}
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def get(self, path, params=None, priority=INTERACTIVE, expires=None):
+        """GET base_url + path with the same retry semantics as UpstreamClient.get."""
+        key = (path, tuple(sorted((params or {}).items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._get(path, params, priority, expires))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    def stats(self):
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+
+    async def _get(self, path, params, priority, expires=None):
+        client = self.client
+        session = self._get_session()
+        attempt = 0
+        while True:
+            if client.scheduler is not None:
+                await client.scheduler.acquire_async(priority, expires)
+            self.requests += 1
+            started = time.perf_counter()
+            try:
+                response = await session.get(f"/{path.lstrip('/')}", params=params)
+            except httpx.TransportError:
+                record_upstream(self.name, path, "error", time.perf_counter() - started)
+                delay = client._backoff(attempt)
+                if self._give_up(path, attempt, delay, expires):
+                    raise
+            else:
+                record_upstream(self.name, path, response.status_code, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                delay = client._retry_after(response)
+                if delay is None:
+                    delay = client._backoff(attempt)
+                if self._give_up(path, attempt, delay, expires):
+                    return response
+
+            attempt += 1
+            self.retries += 1
+            upstream_retries.inc(provider=self.name)
+            log.warning("🔁 %s: retrying %s in %.2fs (attempt %d/%d)", self.name, path, delay, attempt, client.max_retries)
+            await asyncio.sleep(delay)
+
+    def _give_up(self, path, attempt, delay, expires):
+        if attempt < self.client.max_retries and not _outlives(expires, delay):
+            return False
+        if attempt < self.client.max_retries:
+            log.warning("⏱️ %s: not retrying %s, its deadline is before the %.2fs backoff", self.name, path, delay)
+        self.failures += 1
+        return True
+
+    def _get_session(self):
+        if self._session is None:
+            connect, read = self.client.timeout
+            self._session = httpx.AsyncClient(
+                base_url=self.client.base_url,
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+        return self._session
+
+
+def _outlives(expires, delay):
+    """Whether sleeping delay seconds from now would run past expires (a time.monotonic() value)."""
+    return expires is not None and time.monotonic() + delay > expires
+
+
+def make_scheduler(name, calls_per_minute, burst=None):
+    """Return a RateLimitScheduler for the provider, or None when unlimited."""
+    if calls_per_minute <= 0:
+        return None
+    return RateLimitScheduler(name, calls_per_minute, burst)
+
+
+finnhub = UpstreamClient("finnhub", FINNHUB_BASE_URL,
+                         scheduler=make_scheduler("finnhub", FINNHUB_CALLS_PER_MINUTE, FINNHUB_BURST))
+newsapi = UpstreamClient("newsapi", NEWS_API_BASE_URL,
+                         scheduler=make_scheduler("newsapi", NEWS_API_CALLS_PER_MINUTE))
+alphavantage = UpstreamClient("alphavantage", ALPHA_VANTAGE_BASE_URL,
+                              scheduler=make_scheduler("alphavantage", ALPHA_VANTAGE_CALLS_PER_MINUTE))
+
+
+def upstream_stats():
+    """Return stats for every provider, keyed by provider name."""
+    stats = {}
+    for client in (finnhub, newsapi, alphavantage):
+        stats[client.name] = client.stats()
+        if client.scheduler is not None:
+            stats[client.name]["rate_limit"] = client.scheduler.stats()
+    return stats
@@ -1,70 +1,77 @@
 import os
-import requests
+import sys
 import argparse
+import logging
 from dotenv import load_dotenv
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 load_dotenv()
 
+# Shared upstream client layer lives next to the Flask API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from history_store import HistoryStore, fetch_alpha_vantage_daily
+from notifications import Notifier, SMTPPool
+import news
+
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 RECIPIENT_EMAIL = os.getenv("RECIPIENT_EMAIL")
 
+# Outgoing mail: pooled SMTP connections; alerts to one recipient within
+# EMAIL_DIGEST_WINDOW seconds are sent as a single digest
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+EMAIL_DIGEST_WINDOW = float(os.getenv("EMAIL_DIGEST_WINDOW", "60"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+
+notifier = Notifier(
+    SMTPPool(SMTP_HOST, SMTP_PORT, use_ssl=SMTP_USE_SSL, username=EMAIL_ADDRESS, password=EMAIL_PASSWORD, size=SMTP_POOL_SIZE),
+    sender=EMAIL_ADDRESS,
+    digest_window=EMAIL_DIGEST_WINDOW,
+    max_retries=EMAIL_MAX_RETRIES
+)
+
+# Local daily OHLCV history, shared with the Flask API
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+HISTORY_MAX_AGE = float(os.getenv("HISTORY_MAX_AGE", str(6 * 60 * 60)))
+
+history = HistoryStore(HISTORY_DIR)
+
 def get_stock_data(symbol):
-    """Fetches stock data from Alpha Vantage."""
-    url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}"
-    response = requests.get(url)
-    data = response.json()
-    return data["Time Series (Daily)"]
+    """Returns the daily closes for symbol as a TimeSeries from the history store.
+
+    Only bars newer than the last stored date are fetched from Alpha
+    Vantage, and not at all if the symbol was refreshed within
+    HISTORY_MAX_AGE. If the refresh fails, the stored bars are used.
+    """
+    try:
+        history.refresh(symbol, lambda full: fetch_alpha_vantage_daily(symbol, ALPHA_VANTAGE_API_KEY, full), HISTORY_MAX_AGE)
+    except Exception as e:
+        if not len(history.bars(symbol)):
+            raise
+        print(f"Error refreshing history for {symbol}, using stored bars: {e}")
+    return history.series(symbol)
 
 def get_price_change(stock_data):
     """Calculates the percentage change in price between the last two days."""
-    dates = list(stock_data.keys())
-    latest_date = dates[0]
-    previous_date = dates[1]
-    latest_close = float(stock_data[latest_date]["4. close"])
-    previous_close = float(stock_data[previous_date]["4. close"])
-    return ((latest_close - previous_close) / previous_close) * 100
+    return stock_data.change_percent()
 
 def get_news(company_name, num_articles):
-    """Fetches news articles from NewsAPI."""
-    url = f"https://newsapi.org/v2/everything?q={company_name}&apiKey={NEWS_API_KEY}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        data = response.json()
-        if data.get("articles"):
-            return data["articles"][:num_articles]
-        else:
-            print(f"NewsAPI response did not contain articles: {data}")
-            return []
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching news from NewsAPI: {e}")
-        return []
-    except ValueError:
-        print(f"Error decoding JSON from NewsAPI response: {response.text}")
-        return []
+    """Fetches up to num_articles distinct news articles from NewsAPI (cached)."""
+    return news.get_news(company_name, num_articles, NEWS_API_KEY)
 
 def send_email(subject, body):
-    """Sends an email using SMTP."""
-    msg = MIMEMultipart()
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = RECIPIENT_EMAIL
-    msg['Subject'] = subject
-
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            smtp.send_message(msg)
-        print("Email sent successfully!")
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    """Queues an email to RECIPIENT_EMAIL; the notifier's worker delivers it."""
+    notifier.send(RECIPIENT_EMAIL, subject, body)
+
+def flush_email():
+    """Delivers any queued email now and reports failures."""
+    notifier.flush()
+    if notifier.stats()["failed"]:
+        print("Error sending email.")
         print("Please check your EMAIL_ADDRESS, EMAIL_PASSWORD, and RECIPIENT_EMAIL in the .env file.")
         print("If using Gmail, ensure 'Less secure app access' is enabled or use an App Password.")
 
@@ -75,36 +82,60 @@ app = Flask(__name__)
 CORS(app)
 
 def process_stock_alert(symbol, company_name, threshold, num_articles):
-    try:
-        stock_data = get_stock_data(symbol)
-        price_change = get_price_change(stock_data)
+    return process_stock_alerts([(symbol, company_name, threshold, num_articles)])[0]
+
+def process_stock_alerts(alerts):
+    """Processes (symbol, company_name, threshold, num_articles) alerts in order.
+
+    News for every triggered alert is fetched concurrently before the
+    emails are queued.
+    """
+    results = [None] * len(alerts)
+    triggered = []
+    for i, (symbol, company_name, threshold, num_articles) in enumerate(alerts):
+        try:
+            stock_data = get_stock_data(symbol)
+            price_change = get_price_change(stock_data)
+        except Exception as e:
+            results[i] = {"status": "error", "message": f"An error occurred: {e}"}
+            continue
 
         if abs(price_change) >= threshold:
-            news = get_news(company_name, num_articles)
+            triggered.append((i, symbol, company_name, price_change, num_articles))
+        else:
+            results[i] = {"status": "success", "message": f"{symbol}: {price_change:.2f}% change. No alert sent."}
+
+    most_articles = max((num_articles for *_, num_articles in triggered), default=0)
+    news_by_company = news.get_news_many([company_name for _, _, company_name, _, _ in triggered], most_articles, NEWS_API_KEY)
+    for i, symbol, company_name, price_change, num_articles in triggered:
+        # One bad article or email must not fail the rest of the batch
+        try:
             message = f"{symbol}: {price_change:.2f}% change.\n"
-            for article in news:
+            for article in news_by_company[company_name][:num_articles]:
                 message += f"\nHeadline: {article['title']}\n"
             send_email(subject=f"{symbol} Stock Alert", body=message)
-            return {"status": "success", "message": "Email alert sent."}
-        else:
-            return {"status": "success", "message": f"{symbol}: {price_change:.2f}% change. No alert sent."}
-
-    except Exception as e:
-        return {"status": "error", "message": f"An error occurred: {e}"}
+        except Exception as e:
+            results[i] = {"status": "error", "message": f"An error occurred: {e}"}
+            continue
+        results[i] = {"status": "success", "message": "Email alert queued."}
+    return results
 
 @app.route('/alert', methods=['POST'])
 def alert():
+    """Check one alert object, or a JSON array of them (results in the same order)."""
     data = request.get_json()
-    symbol = data.get('symbol')
-    company_name = data.get('companyName')
-    threshold = data.get('threshold', 5.0)
-    num_articles = data.get('numArticles', 3)
+    items = data if isinstance(data, list) else [data]
 
-    if not symbol or not company_name:
-        return jsonify({"status": "error", "message": "Missing symbol or companyName"}), 400
+    alerts = []
+    for item in items:
+        symbol = item.get('symbol')
+        company_name = item.get('companyName')
+        if not symbol or not company_name:
+            return jsonify({"status": "error", "message": "Missing symbol or companyName"}), 400
+        alerts.append((symbol, company_name, item.get('threshold', 5.0), item.get('numArticles', 3)))
 
-    result = process_stock_alert(symbol, company_name, threshold, num_articles)
-    return jsonify(result)
+    results = process_stock_alerts(alerts)
+    return jsonify(results if isinstance(data, list) else results[0])
 
 def main_cli():
     parser = argparse.ArgumentParser(description="Stock News Alert CLI")
@@ -113,9 +144,12 @@ def main_cli():
     parser.add_argument("--threshold", type=float, default=5.0, help="Price change threshold (in percent)")
     parser.add_argument("--numArticles", type=int, default=3, help="Number of news articles to fetch")
     args = parser.parse_args()
+    # The shared api modules report progress through logging
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     company_name_str = " ".join(args.companyName)
     result = process_stock_alert(args.symbol, company_name_str, args.threshold, args.numArticles)
+    flush_email()
     print(result["message"])
 
 if __name__ == "__main__":
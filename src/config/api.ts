@@ -1,3 +1,5 @@
+import { supabase } from '@/lib/supabase'
+
 // API Configuration
 const isDevelopment = process.env.NODE_ENV === 'development';
 
@@ -19,4 +21,10 @@ export const API_ENDPOINTS = {
   processAlerts: `${API_BASE_URL}/api/alerts/process`,
   // Portfolio management endpoints
   portfolio: `${API_BASE_URL}/api/portfolio`,
-}; 
\ No newline at end of file
+}; 
+
+// The API identifies the caller by their Supabase access token
+export async function authHeaders(): Promise<Record<string, string>> {
+  const { data: { session } } = await supabase.auth.getSession()
+  return session ? { Authorization: `Bearer ${session.access_token}` } : {}
+}
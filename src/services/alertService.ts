@@ -1,4 +1,4 @@
-import { API_ENDPOINTS } from "../config/api"
+import { API_ENDPOINTS, authHeaders } from "../config/api"
 
 export interface Alert {
   id: string
@@ -37,7 +37,9 @@ export interface UpdateAlertData {
 // Get all alerts
 export async function fetchAlerts(): Promise<Alert[]> {
   try {
-    const response = await fetch(API_ENDPOINTS.alertManagement)
+    const response = await fetch(API_ENDPOINTS.alertManagement, {
+      headers: await authHeaders(),
+    })
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
@@ -57,6 +59,7 @@ export async function createAlert(alertData: CreateAlertData): Promise<Alert> {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...(await authHeaders()),
       },
       body: JSON.stringify(alertData),
     })
@@ -80,6 +83,7 @@ export async function updateAlert(alertId: string, updateData: UpdateAlertData):
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
+        ...(await authHeaders()),
       },
       body: JSON.stringify(updateData),
     })
@@ -101,6 +105,7 @@ export async function deleteAlert(alertId: string): Promise<void> {
   try {
     const response = await fetch(API_ENDPOINTS.alert(alertId), {
       method: 'DELETE',
+      headers: await authHeaders(),
     })
     
     if (!response.ok) {
@@ -1,5 +1,5 @@
 import type { Stock } from "../types/stock"
-import { API_ENDPOINTS } from "../config/api"
+import { API_ENDPOINTS, authHeaders } from "../config/api"
 
 export async function fetchStockData(): Promise<Stock[]> {
   try {
@@ -82,7 +82,7 @@ export interface Activity {
 
 export async function fetchPortfolioData(): Promise<PortfolioData> {
   try {
-    const response = await fetch(API_ENDPOINTS.dashboardPortfolio)
+    const response = await fetch(API_ENDPOINTS.dashboardPortfolio, { headers: await authHeaders() })
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
@@ -100,7 +100,7 @@ export async function fetchPortfolioData(): Promise<PortfolioData> {
 
 export async function fetchAlertsData(): Promise<AlertsData> {
   try {
-    const response = await fetch(API_ENDPOINTS.alerts)
+    const response = await fetch(API_ENDPOINTS.alerts, { headers: await authHeaders() })
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
@@ -118,7 +118,7 @@ export async function fetchAlertsData(): Promise<AlertsData> {
 
 export async function fetchMarketLeaders(): Promise<MarketLeaders> {
   try {
-    const response = await fetch(API_ENDPOINTS.marketLeaders)
+    const response = await fetch(API_ENDPOINTS.marketLeaders, { headers: await authHeaders() })
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
@@ -136,7 +136,7 @@ export async function fetchMarketLeaders(): Promise<MarketLeaders> {
 
 export async function fetchRecentActivities(): Promise<Activity[]> {
   try {
-    const response = await fetch(API_ENDPOINTS.activities)
+    const response = await fetch(API_ENDPOINTS.activities, { headers: await authHeaders() })
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
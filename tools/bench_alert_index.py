@@ -0,0 +1,91 @@
+"""Benchmark AlertIndex.match against a linear scan of the alert conditions.
+
+Usage: python tools/bench_alert_index.py [--alerts 100000] [--ticks 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from alert_index import AlertIndex, INDEXED_TYPES
+
+
+def make_alerts(count, symbols):
+    alerts = []
+    for i in range(count):
+        alert_type = random.choice(INDEXED_TYPES)
+        alerts.append({
+            "id": f"alert-{i}",
+            "symbol": random.choice(symbols),
+            "alertType": alert_type,
+            "threshold": round(random.uniform(50, 150), 2),
+            "percentage": round(random.uniform(0.5, 10), 2),
+            "status": "active",
+        })
+    return alerts
+
+
+def linear_match(alerts, symbol, price, change):
+    """The per-alert checks from process_alert, applied to every alert."""
+    crossed = []
+    for alert in alerts:
+        if alert["symbol"] != symbol:
+            continue
+        alert_type = alert["alertType"]
+        threshold, percentage = alert["threshold"], alert["percentage"]
+        if ((alert_type == "price-above" and price >= threshold)
+                or (alert_type == "price-below" and price <= threshold)
+                or (alert_type == "percentage-gain" and change >= percentage)
+                or (alert_type == "percentage-loss" and change <= -percentage)
+                or (alert_type == "percentage-change" and abs(change) >= percentage)):
+            crossed.append(alert["id"])
+    return crossed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=100_000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    alerts = make_alerts(args.alerts, symbols)
+    # Ticks barely move the price, so only a handful of alerts are crossed each time
+    ticks = [(random.choice(symbols), random.uniform(49, 51), random.uniform(-0.4, 0.4)) for _ in range(args.ticks)]
+
+    started = time.perf_counter()
+    index = AlertIndex()
+    index.rebuild(alerts)
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = [sorted(linear_match(alerts, *tick)) for tick in ticks]
+    linear_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = [sorted(index.match(*tick)) for tick in ticks]
+    index_s = time.perf_counter() - started
+
+    assert actual == expected, "index and linear scan disagree"
+
+    started = time.perf_counter()
+    for alert in alerts[:1000]:
+        alert["threshold"] += 1
+        index.upsert(alert)
+    update_us = (time.perf_counter() - started) / 1000 * 1e6
+
+    print(f"alerts={args.alerts} symbols={args.symbols} ticks={args.ticks}")
+    print(f"index build:      {build_s * 1000:10.1f} ms")
+    print(f"linear scan:      {linear_s / args.ticks * 1e6:10.1f} us/tick")
+    print(f"index match:      {index_s / args.ticks * 1e6:10.1f} us/tick")
+    print(f"speedup:          {linear_s / index_s:10.1f}x")
+    print(f"incremental upsert: {update_us:8.1f} us/alert")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark PortfolioBook valuation against the per-holding Python loop.
+
+Usage: python tools/bench_portfolio_engine.py [--lots 100000] [--symbols 500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from portfolio_engine import PortfolioBook
+
+
+def loop_valuation(holdings, quotes):
+    """The dict-per-holding computation the dashboard endpoints used to do."""
+    positions = []
+    total_value = total_change = 0
+    for holding in holdings:
+        price = quotes[holding["symbol"]][0]
+        position_value = holding["shares"] * price
+        position_change = holding["shares"] * (price - holding["purchasePrice"])
+        positions.append({
+            "symbol": holding["symbol"],
+            "positionValue": position_value,
+            "positionChange": position_change,
+            "changePercent": (price - holding["purchasePrice"]) / holding["purchasePrice"] * 100,
+        })
+        total_value += position_value
+        total_change += position_change
+    leaders = sorted(quotes.items(), key=lambda item: item[1][1], reverse=True)
+    return total_value, total_change, positions, leaders[0], leaders[-1]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lots", type=int, default=100_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    holdings = [
+        {"symbol": random.choice(symbols), "shares": random.randint(1, 500),
+         "purchasePrice": round(random.uniform(5, 500), 2)}
+        for _ in range(args.lots)
+    ]
+    quotes = {symbol: (round(random.uniform(5, 500), 2), random.uniform(-5, 5)) for symbol in symbols}
+
+    build_ms, book = timed(lambda: PortfolioBook(holdings), args.repeat)
+    value_ms, valuation = timed(lambda: book.value(quotes), args.repeat)
+    movers_ms, _ = timed(lambda: valuation.top_movers(5), args.repeat)
+    loop_ms, (total_value, total_change, *_) = timed(lambda: loop_valuation(holdings, quotes), args.repeat)
+
+    assert abs(valuation.total_value - total_value) < 1e-6 * abs(total_value)
+    assert abs(valuation.total_change - total_change) < 1e-6 * max(1.0, abs(total_change))
+
+    print(f"lots={args.lots} symbols={args.symbols} (best of {args.repeat})")
+    print(f"columnar build:   {build_ms:8.2f} ms")
+    print(f"vectorized value: {value_ms:8.2f} ms")
+    print(f"top-5 movers:     {movers_ms:8.2f} ms")
+    print(f"python loop:      {loop_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare the Flask (gunicorn sync workers) and ASGI (uvicorn) serving modes.
+
+Both servers are started against tools/mock_upstream.py with the quote cache
+disabled, so every request pays the upstream round trips. Each is then driven
+at the same concurrency, and latency percentiles and throughput are printed
+as JSON.
+
+Usage: python tools/bench_serving.py [--concurrency 200] [--requests 2000]
+           [--latency 0.1] [--flask-workers 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import auth_headers, run_scenarios, seed, start_api
+from mock_upstream import MockUpstream
+
+SCENARIOS = ["stocks", "dashboard-portfolio", "dashboard-market-leaders"]
+NO_CACHE = {"QUOTE_CACHE_TTL": "0", "PROFILE_CACHE_TTL": "0", "PORTFOLIO_VALUATION_TTL": "0"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--latency", type=float, default=0.1, help="mock upstream latency in seconds")
+    parser.add_argument("--flask-workers", type=int, default=4)
+    parser.add_argument("--modes", default="flask,asgi")
+    args = parser.parse_args()
+
+    upstream = MockUpstream(latency=args.latency).start()
+    results = {"config": vars(args)}
+    for mode in args.modes.split(","):
+        with tempfile.TemporaryDirectory() as workdir:
+            process, base_url = start_api(mode, upstream.url, workdir, args.flask_workers, NO_CACHE)
+            try:
+                headers = auth_headers()
+                seed(base_url, 0, headers)
+                before = upstream.requests
+                results[mode] = run_scenarios(base_url, SCENARIOS, args.concurrency, args.requests, headers)
+                results[mode]["upstream_requests"] = upstream.requests - before
+            finally:
+                process.terminate()
+                process.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
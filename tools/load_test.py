@@ -0,0 +1,277 @@
+"""Load-test the API and report latency percentiles and throughput as JSON.
+
+Drives each scenario at a fixed concurrency and prints (or writes) one JSON
+document with p50/p95/p99, throughput, errors and status counts per
+scenario. Either target a running server with --base-url, or pass --start
+flask|asgi to launch the API against tools/mock_upstream.py in a scratch
+directory. Requests carry an access token for the load-test user, signed
+with --jwt-secret (a started server is given the same secret); against a
+server in SINGLE_USER_MODE, pass --jwt-secret "" to send none.
+
+With --baseline, the run is compared against an earlier result file. The
+exit status is 1 if any scenario's p95 latency grew, or its throughput fell,
+by more than --tolerance.
+
+Usage: python tools/load_test.py --start asgi [--scenarios stocks,dashboard-portfolio]
+           [--concurrency 50] [--requests 500] [--latency 0.05] [--error-rate 0.0]
+           [--throttle-rate 0.0] [--output results.json] [--baseline old.json]
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(TOOLS_DIR, "..", "api")
+sys.path.insert(0, TOOLS_DIR)
+from mock_upstream import MockUpstream
+
+SYMBOLS = ["AAPL", "GOOGL", "TSLA", "MSFT", "NVDA", "AMZN", "META", "NFLX"]
+USER_ID = "loadtest"
+JWT_SECRET = "loadtest-secret"
+
+# name -> (method, path)
+SCENARIOS = {
+    "stocks": ("GET", f"/api/stocks?symbols={','.join(SYMBOLS)}"),
+    "stock": ("GET", "/api/stock/AAPL"),
+    "dashboard-portfolio": ("GET", "/api/dashboard/portfolio"),
+    "dashboard-market-leaders": ("GET", "/api/dashboard/market-leaders"),
+    "dashboard-alerts": ("GET", "/api/dashboard/alerts"),
+    "dashboard-activities": ("GET", "/api/dashboard/activities"),
+    "alerts-process": ("POST", "/api/alerts/process"),
+}
+
+# Statuses besides 200 that are a correct answer, not an error, for a scenario
+EXPECTED_STATUSES = {
+    "alerts-process": {"409"},  # a cycle is already running in this process
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def auth_headers(secret=JWT_SECRET, user_id=USER_ID, lifetime=3600):
+    """Headers carrying an HS256 access token for user_id, shaped like Supabase's; {} without a secret."""
+    if not secret:
+        return {}
+
+    def encode(part):
+        raw = part if isinstance(part, bytes) else json.dumps(part, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+    claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + lifetime}
+    signing_input = f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return {"Authorization": f"Bearer {signing_input}.{encode(signature)}"}
+
+
+def start_api(mode, upstream_url, workdir, flask_workers=4, extra_env=None):
+    """Start the API in mode "flask" (gunicorn) or "asgi" (uvicorn); returns (process, base_url).
+
+    The server verifies tokens signed with JWT_SECRET, so use auth_headers() with the default secret.
+    """
+    port = free_port()
+    env = dict(
+        os.environ,
+        SUPABASE_JWT_SECRET=JWT_SECRET,
+        SINGLE_USER_MODE="false",
+        FINNHUB_BASE_URL=upstream_url,
+        NEWS_API_BASE_URL=upstream_url,
+        FINNHUB_API_KEY="loadtest",
+        NEWS_API_KEY="loadtest",
+        FINNHUB_CALLS_PER_MINUTE="0",
+        USE_MOCK_DATA="false",
+        PRICE_STREAM_SOURCE="mock",
+        ALERT_SCHEDULER_ENABLED="false",
+        **(extra_env or {}),
+    )
+    if mode == "flask":
+        command = [sys.executable, "-m", "gunicorn", "--pythonpath", API_DIR, "-w", str(flask_workers),
+                   "-b", f"127.0.0.1:{port}", "--log-level", "warning", "index:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "--app-dir", API_DIR, "--port", str(port),
+                   "--log-level", "warning", "asgi:app"]
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base_url}/api/health", timeout=1)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def seed(base_url, alerts, headers):
+    """Give the load-test user a portfolio and some active alerts; raises if any write fails."""
+    holdings = [{"symbol": symbol, "shares": 10, "purchasePrice": 100} for symbol in SYMBOLS]
+    requests.post(f"{base_url}/api/portfolio", json={"holdings": holdings},
+                  headers=headers, timeout=30).raise_for_status()
+    for i in range(alerts):
+        requests.post(f"{base_url}/api/alerts", headers=headers, timeout=30, json={
+            "symbol": SYMBOLS[i % len(SYMBOLS)],
+            "alertType": "price-above",
+            "threshold": 10_000 + i,
+        }).raise_for_status()
+
+
+def drive(base_url, method, path, concurrency, total, headers):
+    """Issue total requests from concurrency threads; returns (latencies, statuses, elapsed)."""
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            status = str(session.request(method, base_url + path, headers=headers, timeout=120).status_code)
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def summarize(latencies, statuses, elapsed, expected=()):
+    ordered = sorted(latencies)
+
+    def ms(seconds):
+        return round(seconds * 1000, 2)
+
+    def percentile(p):
+        return ms(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))])
+
+    return {
+        "requests": len(ordered),
+        "errors": sum(count for status, count in statuses.items() if status != "200" and status not in expected),
+        "status_counts": dict(statuses),
+        "throughput_rps": round(len(ordered) / elapsed, 2),
+        "mean_ms": ms(sum(ordered) / len(ordered)),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ms(ordered[-1]),
+    }
+
+
+def run_scenarios(base_url, scenarios, concurrency, total, headers, warmup=20):
+    results = {}
+    for name in scenarios:
+        method, path = SCENARIOS[name]
+        if warmup:
+            drive(base_url, method, path, min(concurrency, warmup), warmup, headers)
+        results[name] = summarize(*drive(base_url, method, path, concurrency, total, headers),
+                                  EXPECTED_STATUSES.get(name, ()))
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """List scenarios whose p95 or throughput got worse than baseline by more than tolerance."""
+    found = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            found.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--start", choices=["flask", "asgi"], help="launch the API against a mock upstream")
+    parser.add_argument("--flask-workers", type=int, default=4)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--alerts", type=int, default=200, help="alerts to seed for the load-test user")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock upstream latency (with --start)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock upstream 503 rate (with --start)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="mock upstream 429 rate (with --start)")
+    parser.add_argument("--jwt-secret", default=os.getenv("SUPABASE_JWT_SECRET", JWT_SECRET),
+                        help="secret to sign the load-test user's token with (without --start)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the quote cache (with --start)")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    upstream = process = None
+    workdir = tempfile.TemporaryDirectory()
+    try:
+        base_url = args.base_url
+        secret = args.jwt_secret
+        if args.start:
+            upstream = MockUpstream(latency=args.latency, error_rate=args.error_rate,
+                                    throttle_rate=args.throttle_rate).start()
+            extra_env = {"QUOTE_CACHE_TTL": "0", "PROFILE_CACHE_TTL": "0", "PORTFOLIO_VALUATION_TTL": "0"} if args.no_cache else {}
+            process, base_url = start_api(args.start, upstream.url, workdir.name, args.flask_workers, extra_env)
+            secret = JWT_SECRET
+        headers = auth_headers(secret)
+        seed(base_url, args.alerts, headers)
+        results = {
+            "config": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "baseline", "jwt_secret")},
+            "scenarios": run_scenarios(base_url, scenarios, args.concurrency, args.requests, headers),
+        }
+        if upstream is not None:
+            results["upstream"] = upstream.stats()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if upstream is not None:
+            upstream.stop()
+        workdir.cleanup()
+
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+    print(document)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Local stand-in for the Finnhub and NewsAPI endpoints the API calls.
+
+Serves Finnhub /quote and /stock/profile2 and NewsAPI /everything with
+configurable latency, random 5xx errors and 429 throttling, so benchmarks
+exercise the real HTTP, retry, parsing and metrics code paths. Point the
+API at it with:
+
+    FINNHUB_BASE_URL=http://127.0.0.1:8900 NEWS_API_BASE_URL=http://127.0.0.1:8900
+    FINNHUB_API_KEY=anything NEWS_API_KEY=anything
+
+GET /__stats returns request counts by path and status.
+
+Usage: python tools/mock_upstream.py [--port 8900] [--latency 0.1] [--jitter 0.02]
+           [--error-rate 0.0] [--throttle-rate 0.0] [--rate-limit 0] [--seed 0]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def quote(symbol, rng):
+    base = 20 + zlib.crc32(symbol.encode()) % 480
+    previous_close = round(base, 2)
+    current = round(base * (1 + rng.uniform(-0.05, 0.05)), 2)
+    return {
+        "c": current,
+        "pc": previous_close,
+        "h": round(max(current, previous_close) * 1.01, 2),
+        "l": round(min(current, previous_close) * 0.99, 2),
+        "o": previous_close,
+        "v": rng.randint(1_000_000, 50_000_000),
+        "t": int(time.time()),
+    }
+
+
+def profile(symbol):
+    return {"ticker": symbol, "name": f"{symbol} Inc.", "exchange": "MOCK"}
+
+
+def articles(query, page_size, rng):
+    now = int(time.time())
+    return {
+        "status": "ok",
+        "totalResults": 100,
+        "articles": [
+            {
+                "source": {"id": None, "name": "Mock Wire"},
+                "title": f"{query} headline {rng.randint(1, 20)}",
+                "description": f"Mock coverage of {query}.",
+                "url": f"https://example.com/{zlib.crc32(query.encode())}/{i}",
+                "publishedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now - i * 600)),
+            }
+            for i in range(page_size)
+        ],
+    }
+
+
+class MockUpstream:
+    """Threaded HTTP server answering Finnhub- and NewsAPI-shaped requests.
+
+    error_rate and throttle_rate are the fractions of requests answered with
+    a 503 or a 429 (with Retry-After). rate_limit, when set, is a hard cap in
+    requests per second across all clients; requests over it get a 429.
+    """
+
+    def __init__(self, port=0, latency=0.1, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 rate_limit=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.counts = Counter()  # (path, status) -> requests
+        self._window = (0, 0)  # (second, requests in that second)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="mock-upstream", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def stats(self):
+        with self._lock:
+            by_status = Counter()
+            for (_, status), count in self.counts.items():
+                by_status[str(status)] += count
+            return {
+                "requests": self.requests,
+                "by_status": dict(by_status),
+                "by_path": {f"{path} {status}": count for (path, status), count in sorted(self.counts.items())},
+            }
+
+    def respond(self, path, params):
+        """Return (status, headers, body) for a request."""
+        with self._lock:
+            self.requests += 1
+            roll = self.rng.random()
+            second = int(time.monotonic())
+            window_second, window_count = self._window
+            window_count = window_count + 1 if window_second == second else 1
+            self._window = (second, window_count)
+            over_limit = self.rate_limit and window_count > self.rate_limit
+
+            if over_limit or roll < self.throttle_rate:
+                return 429, {"Retry-After": "1"}, {"error": "API limit reached. Please try again later."}
+            if roll < self.throttle_rate + self.error_rate:
+                return 503, {}, {"error": "Service temporarily unavailable"}
+
+            symbol = params.get("symbol", ["AAPL"])[0].upper()
+            if path.endswith("/quote"):
+                return 200, {}, quote(symbol, self.rng)
+            if path.endswith("/stock/profile2"):
+                return 200, {}, profile(symbol)
+            if path.endswith("/everything"):
+                page_size = min(int(params.get("pageSize", ["20"])[0]), 100)
+                return 200, {}, articles(params.get("q", ["market"])[0], page_size, self.rng)
+        return 404, {}, {"error": f"Unknown path {path}"}
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/__stats":
+                    self._send(200, {}, upstream.stats())
+                    return
+                delay = upstream.latency + (upstream.rng.uniform(-upstream.jitter, upstream.jitter) if upstream.jitter else 0)
+                if delay > 0:
+                    time.sleep(delay)
+                status, headers, body = upstream.respond(url.path, parse_qs(url.query))
+                with upstream._lock:
+                    upstream.counts[(url.path, status)] += 1
+                self._send(status, headers, body)
+
+            def _send(self, status, headers, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before 429s (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    upstream = MockUpstream(args.port, args.latency, args.jitter, args.error_rate, args.throttle_rate,
+                            args.rate_limit, args.seed)
+    print(f"Mock upstream listening on {upstream.url} (latency {args.latency}s)")
+    upstream.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
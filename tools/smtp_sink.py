@@ -0,0 +1,146 @@
+"""Local SMTP server that accepts and records mail, for testing email alerts.
+
+Speaks enough SMTP for smtplib (EHLO/HELO, AUTH PLAIN/LOGIN accepting any
+credentials, MAIL, RCPT, DATA, RSET, NOOP, QUIT) over plain TCP, so point
+main.py at it with:
+
+    SMTP_HOST=127.0.0.1 SMTP_PORT=8925 SMTP_USE_SSL=false
+
+--fail-rate answers that fraction of DATA commands with a transient 451 to
+exercise retries. Each accepted message is printed, and with --maildir also
+written to a .eml file.
+
+Usage: python tools/smtp_sink.py [--port 8925] [--fail-rate 0.0] [--maildir DIR]
+"""
+import argparse
+import os
+import random
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+
+
+class SMTPSink:
+    """Threaded SMTP server keeping every accepted message in .messages."""
+
+    def __init__(self, port=0, fail_rate=0.0, maildir=None, seed=0, on_message=None):
+        self.fail_rate = fail_rate
+        self.maildir = maildir
+        self.on_message = on_message
+        self.rng = random.Random(seed)
+        self.messages = []  # (envelope from, [recipients], email.message.Message)
+        self.connections = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def accept(self, sender, recipients, data):
+        """Store one message; returns False if it should be rejected as a transient failure."""
+        with self._lock:
+            if self.rng.random() < self.fail_rate:
+                self.rejected += 1
+                return False
+            message = message_from_bytes(data)
+            self.messages.append((sender, recipients, message))
+            count = len(self.messages)
+        if self.maildir:
+            os.makedirs(self.maildir, exist_ok=True)
+            with open(os.path.join(self.maildir, f"{time.time():.6f}-{count}.eml"), "wb") as f:
+                f.write(data)
+        if self.on_message is not None:
+            self.on_message(sender, recipients, message)
+        return True
+
+    def _handler(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                self.reply("220 smtp-sink ready")
+                sender, recipients = None, []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+                    command = command.upper()
+                    if command == "EHLO":
+                        self.reply("250-smtp-sink")
+                        self.reply("250-AUTH PLAIN LOGIN")
+                        self.reply("250 8BITMIME")
+                    elif command == "HELO":
+                        self.reply("250 smtp-sink")
+                    elif command == "AUTH":
+                        mechanism, _, initial = argument.partition(" ")
+                        # Read whatever credentials are still to come, then accept them
+                        steps = {"PLAIN": 0 if initial else 1, "LOGIN": 1 if initial else 2}.get(mechanism.upper(), 0)
+                        for _ in range(steps):
+                            self.reply("334 ")
+                            self.rfile.readline()
+                        self.reply("235 Authentication successful")
+                    elif command == "MAIL":
+                        sender, recipients = argument.partition(":")[2].strip(), []
+                        self.reply("250 OK")
+                    elif command == "RCPT":
+                        recipients.append(argument.partition(":")[2].strip())
+                        self.reply("250 OK")
+                    elif command == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        lines = []
+                        while True:
+                            data_line = self.rfile.readline()
+                            if not data_line or data_line in (b".\r\n", b".\n"):
+                                break
+                            lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                        if sink.accept(sender, recipients, b"".join(lines)):
+                            self.reply("250 OK: queued")
+                        else:
+                            self.reply("451 Temporary failure, try again later")
+                        sender, recipients = None, []
+                    elif command == "RSET":
+                        sender, recipients = None, []
+                        self.reply("250 OK")
+                    elif command == "NOOP":
+                        self.reply("250 OK")
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8925)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of messages rejected with 451")
+    parser.add_argument("--maildir", help="also write each message to DIR/<timestamp>.eml")
+    args = parser.parse_args()
+
+    def show(sender, recipients, message):
+        print(f"📨 {sender} -> {', '.join(recipients)}: {message['Subject']}")
+
+    sink = SMTPSink(args.port, args.fail_rate, args.maildir, on_message=show)
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port}")
+    sink.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()